@@ -0,0 +1,26 @@
+import random
+import time
+
+import click
+
+import benchmarks.synthetic as synthetic
+import utils.extractor as extractor
+
+
+@click.command()
+@click.option("-n", "--n_posts", type=int, default=50_000, show_default=True)
+def main(n_posts):
+    rnd = random.Random(0)
+    bodies = [synthetic.make_post_body(rnd, "python") for _ in range(n_posts)]
+
+    for engine in extractor.CODE_EXTRACTION_ENGINES:
+        t0 = time.perf_counter()
+        n_snippets = 0
+        for post_id, body in enumerate(bodies):
+            n_snippets += len(extractor.extract_code_snippets(body, str(post_id), engine))
+        elapsed = time.perf_counter() - t0
+        print(f"{engine}: {n_posts / elapsed:.0f} posts/sec ({n_snippets} snippets)")
+
+
+if __name__ == "__main__":
+    main()
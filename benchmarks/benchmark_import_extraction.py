@@ -0,0 +1,50 @@
+import random
+import time
+
+import click
+
+import benchmarks.synthetic as synthetic
+import utils.extractor as extractor
+
+
+@click.command()
+@click.option("-n", "--n_posts", type=int, default=20_000, show_default=True)
+@click.option("-r", "--import_ratio", type=float, default=0.2, show_default=True,
+              help="Share of the snippets that contain imports.")
+@click.option("-k", "--repeat", type=int, default=3, show_default=True,
+              help="Best of this many runs is reported.")
+def main(n_posts, import_ratio, repeat):
+    for language in sorted(extractor.IMPORT_EXTRACTORS_BY_LANGUAGE):
+        rnd = random.Random(0)
+        posts = [
+            [
+                synthetic.make_code_snippet(rnd, language, import_ratio)
+                for _ in range(rnd.randint(1, 3))
+            ]
+            for _ in range(n_posts)
+        ]
+
+        per_snippet_elapsed = batched_elapsed = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            per_snippet = []
+            for snippets in posts:
+                libs = set()
+                for snippet in snippets:
+                    libs |= extractor.extract_import_statements_from_code(snippet, language)
+                per_snippet.append(libs)
+            per_snippet_elapsed = min(per_snippet_elapsed, time.perf_counter() - t0)
+
+            t0 = time.perf_counter()
+            batched = extractor.extract_import_statements_from_posts(posts, language)
+            batched_elapsed = min(batched_elapsed, time.perf_counter() - t0)
+
+        assert batched == per_snippet
+        print(
+            f"{language:>10}: per snippet {n_posts / per_snippet_elapsed:>8.0f} posts/sec, "
+            f"batch {n_posts / batched_elapsed:>8.0f} posts/sec"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import io
+import json
+import random
+import time
+
+import click
+
+import benchmarks.synthetic as synthetic
+import generate_indiv_and_pair_lib_stats as lib_stats_script
+import utils.lib_stats as lib_stats
+
+
+@click.command()
+@click.option("-n", "--n_posts", type=int, default=100_000, show_default=True)
+@click.option("--n_libs", type=int, default=5000, show_default=True)
+@click.option("--max_imports", type=int, default=12, show_default=True,
+              help="Imports per post are drawn from 1..max_imports.")
+def main(n_posts, n_libs, max_imports):
+    payloads = synthetic.make_post_payloads(random.Random(0), n_posts, n_libs, max_imports)
+
+    # counting plus rendering the JSON outputs, as the script does
+    t0 = time.perf_counter()
+    results = lib_stats_script.find_first_appearances_and_count_appearances(payloads, "python")
+    python_outputs = {}
+    for name, result in zip(
+        ["libs_count", "pairs_count", "user_to_posts", "all_libs_dates",
+         "all_pairs_dates", "libs_first_dates", "pairs_first_dates"],
+        results,
+    ):
+        handle = io.StringIO()
+        json.dump(result, handle, default=str)
+        python_outputs[name] = handle.getvalue()
+    python_elapsed = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    numpy_outputs = lib_stats.Appearances(payloads).json_outputs()
+    numpy_elapsed = time.perf_counter() - t0
+
+    assert numpy_outputs == python_outputs
+    print(f"{len(results[1])} pairs")
+    for engine, elapsed in [("python", python_elapsed), ("numpy", numpy_elapsed)]:
+        print(f"{engine:>6}: {elapsed:.2f} s ({n_posts / elapsed:.0f} posts/sec)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import random
+import time
+
+import click
+
+import benchmarks.synthetic as synthetic
+import utils.extractor as extractor
+import utils.regex_patterns as regex_patterns
+
+
+def _classify_line_with_regexes(line):
+    return (
+        regex_patterns.code_block_regex.match(line) is not None,
+        regex_patterns.whitespace_line_regex.fullmatch(line) is not None,
+        regex_patterns.snippet_language_regex.fullmatch(line) is not None,
+        regex_patterns.snippet_divider_regex.fullmatch(line) is not None,
+        regex_patterns.inline_code_line_regex.fullmatch(line) is not None,
+    )
+
+
+@click.command()
+@click.option("-n", "--n_lines", type=int, default=200_000, show_default=True)
+def main(n_lines):
+    text = synthetic.make_markdown_lines(random.Random(0), n_lines)
+    lines = text.split("\n")
+
+    for name, classify in [
+        ("regexes", _classify_line_with_regexes),
+        ("classify_line", extractor.classify_line),
+    ]:
+        t0 = time.perf_counter()
+        for line in lines:
+            classify(line)
+        elapsed = time.perf_counter() - t0
+        print(f"{name}: {elapsed / n_lines * 1e9:.0f} ns/line")
+
+    t0 = time.perf_counter()
+    extractor.extract_text_blocks(text, "1")
+    elapsed = time.perf_counter() - t0
+    print(f"extract_text_blocks: {elapsed / n_lines * 1e9:.0f} ns/line")
+
+
+if __name__ == "__main__":
+    main()
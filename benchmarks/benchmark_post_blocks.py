@@ -0,0 +1,44 @@
+import random
+import time
+import tracemalloc
+
+import click
+
+import utils.extractor as extractor
+
+
+def _make_long_code_post(rnd: random.Random, n_code_lines: int) -> str:
+    code = "\n".join(
+        f"value_{i} = compute({rnd.randint(0, 1000)}, 'x' * {i % 80})"
+        for i in range(n_code_lines)
+    )
+    return (
+        f"<p>Why is this slow?</p>\n\n<pre><code>{code}\n</code></pre>\n\n"
+        f"<pre><code>}}\n</code></pre>\n\n<p>Thanks!</p>\n"
+    )
+
+
+@click.command()
+@click.option("-n", "--n_posts", type=int, default=20, show_default=True)
+@click.option("-l", "--n_code_lines", type=int, default=20_000, show_default=True)
+def main(n_posts, n_code_lines):
+    rnd = random.Random(0)
+    bodies = [_make_long_code_post(rnd, n_code_lines) for _ in range(n_posts)]
+
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    for post_id, body in enumerate(bodies):
+        extractor.extract_code_snippets(body, str(post_id))
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(
+        f"{n_posts} posts x {n_code_lines} code lines: "
+        f"{elapsed / n_posts * 1e3:.1f} ms/post, "
+        f"peak {peak / (1 << 20):.1f} MiB above the inputs"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import collections
+import os
+import tempfile
+import time
+
+import click
+import lxml.etree
+
+import benchmarks.synthetic as synthetic
+import utils.xml_parser as xml_parser
+
+
+def _noop(row):
+    row.attrib.get("Id")
+
+
+@click.command()
+@click.option("-n", "--n_rows", type=int, default=200_000, show_default=True)
+@click.option("-i", "--xml_path", type=str, default=None,
+              help="Benchmark on an existing Posts.xml instead of a synthetic one.")
+def main(n_rows, xml_path):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if xml_path is None:
+            xml_path = os.path.join(tmp_dir, "Posts.xml")
+            synthetic.write_synthetic_posts_xml(xml_path, n_rows)
+
+        t0 = time.perf_counter()
+        xml_parser.fast_iter(lxml.etree.iterparse(xml_path), _noop)
+        fast_iter_seconds = time.perf_counter() - t0
+
+        stats = collections.defaultdict(float)
+        for row in xml_parser.iter_rows(xml_path, stats):
+            _noop(row)
+
+    print(f"fast_iter: {fast_iter_seconds:.2f}s")
+    print(
+        f"iter_rows: {stats['seconds']:.2f}s, {stats['rows/sec']:.0f} rows/sec, "
+        f"peak RSS {stats['peak_rss_mb']:.0f} MB"
+    )
+
+
+if __name__ == "__main__":
+    main()
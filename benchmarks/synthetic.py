@@ -0,0 +1,147 @@
+import datetime
+import random
+import typing
+import xml.sax.saxutils
+
+import utils.models as models
+
+_LANGUAGE_TAGS = sorted(models.LANGUAGES)
+_OTHER_TAGS = ["django", "numpy", "rails", "pandas", "regex", "linux", "sql"]
+
+_BODY_TEMPLATE = (
+    "<p>How do I do this with {tag}?</p>\n\n"
+    "<pre><code>import os\nimport sys\n\nfor i in range({n}):\n    print(i)\n</code></pre>\n\n"
+    "<p>Thanks &amp; regards</p>\n"
+)
+
+
+def _attr(value: str) -> str:
+    return xml.sax.saxutils.quoteattr(value, {"\n": "&#xA;", "\r": "&#xD;"})
+
+
+def make_post_body(rnd: random.Random, tag: str) -> str:
+    """
+    Rendered HTML body of a post (as in the Body attribute, unescaped).
+    """
+    return _BODY_TEMPLATE.format(tag=tag, n=rnd.randint(1, 100))
+
+
+_MARKDOWN_LINES = [
+    "How do I read a file line by line?",
+    "I tried the following:",
+    "    import os",
+    "    for line in open(path):",
+    "\t    print(line)",
+    "   ",
+    "<!-- language: lang-py -->",
+    "<!-- -->",
+    "`pip install requests`",
+    "It fails with `KeyError` <b>sometimes</b>.",
+    "<pre><code>x = 1</code></pre>",
+    "```",
+    "Thanks!",
+]
+
+
+def make_markdown_lines(rnd: random.Random, n_lines: int) -> str:
+    """
+    Markdown source mixing prose, indented code, whitespace lines, snippet
+    comments, inline code and the alternative code block styles.
+    """
+    return "\n".join(rnd.choice(_MARKDOWN_LINES) for _ in range(n_lines))
+
+
+_IMPORT_LINES_BY_LANGUAGE = {
+    "python": ["import numpy as np", "from os import path", "import os, sys"],
+    "php": ["require_once 'vendor/autoload.php';", "include('config.php');"],
+    "ruby": ["require 'rubygems'", "require \"nokogiri/xml\""],
+    "rust": ["use std::io;", "use serde::{Serialize, Deserialize};"],
+    "javascript": ["const fs = require('fs');", "import React from 'react';"],
+    "java": ["import java.util.List;", "import static org.junit.Assert.assertEquals;"],
+    "c": ["#include <stdio.h>", "#include \"mylib.h\""],
+    "r": ["library(ggplot2)", "require(\"dplyr\")"],
+    "cpp": ["#include <vector>", "#include \"boost/asio.hpp\""],
+    "perl": ["use strict;", "use LWP::Simple;"],
+    "swift": ["import UIKit", "import Foundation.NSString"],
+    "matlab": ["import matlab.io.*"],
+    "objectivec": ["#import <Foundation/Foundation.h>", "#import \"AppDelegate.h\""],
+    "c#": ["using System;", "using System.Collections.Generic;"],
+}
+
+_CODE_LINES = [
+    "x = compute(values[i], 42)",
+    "for (int i = 0; i < n; i++) {",
+    "    total += items[i];",
+    "}",
+    "print(result)",
+    "return self.value",
+]
+
+
+def make_code_snippet(rnd: random.Random, language: str, import_ratio: float = 0.2) -> str:
+    """
+    A few lines of code, starting with import lines of the language in
+    import_ratio of the cases.
+    """
+    lines = []
+    if rnd.random() < import_ratio:
+        lines.extend(rnd.sample(
+            _IMPORT_LINES_BY_LANGUAGE[language],
+            rnd.randint(1, len(_IMPORT_LINES_BY_LANGUAGE[language])),
+        ))
+    lines.extend(rnd.choice(_CODE_LINES) for _ in range(rnd.randint(3, 12)))
+    return "\n".join(lines)
+
+
+def make_post_payloads(
+    rnd: random.Random, n_posts: int, n_libs: int = 5000, max_imports: int = 12,
+) -> typing.List[typing.Dict]:
+    """
+    Post stats payloads importing libs with a skewed popularity (a few libs
+    are in most posts, as in the real corpora), dated 2008-2023.
+    """
+    libs = [f"lib{i}" for i in range(n_libs)]
+    weights = [1 / (rank + 1) for rank in range(n_libs)]
+    first_day = datetime.date(2008, 8, 1).toordinal()
+    payloads = []
+    for post_id in range(1, n_posts + 1):
+        day = datetime.date.fromordinal(first_day + rnd.randrange(15 * 365))
+        payloads.append({
+            "id": str(post_id),
+            "post_type": rnd.choice(["1", "2"]),
+            "imports": sorted(set(rnd.choices(libs, weights, k=rnd.randint(1, max_imports)))),
+            "date": f"{day.isoformat()}T{rnd.randrange(24):02d}:00:00.000",
+            "poster_id": str(rnd.randint(1, n_posts // 10 + 1)),
+            "score": str(rnd.randint(-3, 50)),
+        })
+    return payloads
+
+
+def write_synthetic_posts_xml(path: str, n_rows: int, seed: int = 0) -> None:
+    """
+    Writes a Posts.xml look-alike (one <row/> per line) with a mix of
+    questions and answers pointing to earlier questions.
+    """
+    rnd = random.Random(seed)
+    question_ids = []
+    with open(path, "w") as handle:
+        handle.write('<?xml version="1.0" encoding="utf-8"?>\n<posts>\n')
+        for post_id in range(1, n_rows + 1):
+            tag = rnd.choice(_LANGUAGE_TAGS)
+            body = make_post_body(rnd, tag)
+            common = (
+                f'Id="{post_id}" CreationDate="2010-01-01T00:00:00.000" '
+                f'Score="{rnd.randint(-3, 50)}" Body={_attr(body)} '
+                f'OwnerUserId="{rnd.randint(1, 1000)}" '
+                f'LastActivityDate="2010-01-02T00:00:00.000" CommentCount="0"'
+            )
+            if not question_ids or rnd.random() < 0.4:
+                tags = f"<{tag}><{rnd.choice(_OTHER_TAGS)}>"
+                handle.write(
+                    f'  <row PostTypeId="1" {common} Tags={_attr(tags)} AnswerCount="1" />\n'
+                )
+                question_ids.append(post_id)
+            else:
+                parent_id = rnd.choice(question_ids[-1000:])
+                handle.write(f'  <row PostTypeId="2" ParentId="{parent_id}" {common} />\n')
+        handle.write("</posts>\n")
@@ -1,7 +1,12 @@
 import collections
 import datetime
+import functools
 import json
 import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
 import typing
 
 
@@ -9,105 +14,371 @@ import click
 import tqdm
 
 
+import utils.checkpoint as checkpoint
+import utils.compressed_io as compressed_io
 import utils.extractor as extractor
+import utils.import_cache as import_cache
+import utils.incremental as incremental
+import utils.jsonl_writer as jsonl_writer
+import utils.post_filters as post_filters
+import utils.post_stats as post_stats
+import utils.post_store as post_store
+import utils.valid_packages as valid_packages
 import utils.xml_parser as xml_parser
 
 logging.basicConfig(level=logging.DEBUG, format='%(message)s')
 logger = logging.getLogger(__name__)
 
+FAN_OUT_LANGUAGES = "all"
+
+# set by generate_extracted_import_metadata(), forked workers inherit it
+_import_cache: typing.Optional[import_cache.ImportCache] = None
+
+
+def _iter_input_lines(
+    input_path: typing.Union[str, typing.List[str]],
+    start: typing.Tuple[int, int] = (0, 0),
+):
+    """
+    Yields (file index, byte offset of the line, line) starting at the given
+    (file index, byte offset) position.
+    """
+    # sharded XML output is consumed shard by shard, in order
+    input_paths = [input_path] if isinstance(input_path, str) else input_path
+    start_index, start_offset = start
+    for path_index, path in enumerate(input_paths):
+        if path_index < start_index:
+            continue
+        offset = start_offset if path_index == start_index else 0
+        with compressed_io.open_input(path, "rb") as in_handle:
+            in_handle.seek(offset)
+            for line in in_handle:
+                yield path_index, offset, line
+                offset += len(line)
+
+
+def _save_extraction_checkpoint(
+    checkpoints: checkpoint.CheckpointDir,
+    position: typing.Tuple[int, int],
+    stats: typing.Dict,
+    invalid_libs_stats: typing.Dict,
+    daily_post_stats: typing.Dict,
+    payload_writer: jsonl_writer.JsonlWriter,
+):
+    # the payloads are in the post stats output, the state records its size
+    checkpoints.save("extract", {
+        "phase": "extract",
+        "position": position,
+        "stats": stats,
+        "invalid_libs_stats": invalid_libs_stats,
+        "daily_post_stats": daily_post_stats,
+        "post_stats": payload_writer.checkpoint_state(),
+    })
+
+
+def _restore_extraction_checkpoint(
+    payload_writer: jsonl_writer.JsonlWriter, state: typing.Dict
+) -> typing.List[int]:
+    payload_writer.restore(state["post_stats"])
+    payload_writer.flush()
+    return [
+        len(payload["imports"])
+        for path in payload_writer.paths
+        for payload in post_stats.iter_post_stats(path)
+    ]
+
+
+def _iter_input_chunks(
+    input_path: typing.Union[str, typing.List[str]],
+    start: typing.Tuple[int, int],
+    chunk_size: int,
+):
+    """
+    Yields (position after the chunk, lines) for chunks of at most chunk_size
+    lines, the position can be passed to _iter_input_lines to continue.
+    """
+    rows = []
+    for path_index, offset, line in _iter_input_lines(input_path, start):
+        rows.append(line)
+        if len(rows) == chunk_size:
+            yield (path_index, offset + len(line)), rows
+            rows = []
+    if rows:
+        yield (path_index, offset + len(line)), rows
+
+
+def _extract_from_rows(
+        rows: typing.List[bytes],
+        target_language: str,
+        bypass_validation: bool,
+        post_filter: post_filters.PostFilter,
+        code_engine: str,
+        manifest: typing.Optional[incremental.PostManifest] = None,
+):
+    """
+    Extracts the imports of a chunk of curated rows, returns the partial
+    results in the order of generate_extracted_import_metadata() followed
+    by the entries the chunk added to the import cache.
+    """
+    stats = collections.defaultdict(int)
+    valid_libs_stats = []
+    invalid_libs_stats = collections.defaultdict(int)
+    daily_post_stats = collections.defaultdict(int)
+    code_count_list = []
+    cache_counters = _import_cache.counters() if _import_cache is not None else {}
+
+    for row in rows:
+        stats["TOTAL"] += 1
+        try:
+            parsed_row = json.loads(row)
+            if manifest is not None and not manifest.observe(parsed_row):
+                stats["unchanged"] += 1
+                continue
+            # the cheap checks run on the raw columns, before any extraction
+            rejection_reason = post_filter.rejection_reason_of_values(
+                next(iter(parsed_row.values())))
+            if rejection_reason is not None:
+                stats[rejection_reason] += 1
+                continue
+            post_id, data =\
+                extractor.extract_code_snippets_from_parsed_row(parsed_row, code_engine)
+            post_id, codes, import_list, invalids =\
+                extractor.extract_import_statements_from_single_row(
+                    post_id,
+                    parsed_data=data,
+                    target_language=target_language,
+                    bypass_validation=bypass_validation,
+                    cache=_import_cache)
+            
+            if not post_id:
+                stats["no post id"] += 1
+                continue
+
+            if not data.get("code_snippets"):
+                stats["no code"] += 1
+                continue
+
+            # process invalid libs stats
+            for invalid in invalids:
+                invalid_libs_stats[invalid] += 1
+
+            # TODO: this should not happen here.
+            # only keep reasonably looking imports. Ditch empty strings, etc.
+            import_list = [item.strip() for item in import_list if item.strip()]
+
+            if not import_list:
+                stats['empty list'] += 1
+                continue
+
+            code_count_list.append(len(import_list))
+            payload = {
+                "id": post_id,
+		    "post_type":data.get("post_type"),
+                "imports": import_list,
+                # "codes": codes,  # NOTE: this can be huge, think twice before adding it back!
+                "date": data.get("date_posted"),  # 
+                "poster_id": data.get("poster_id"),
+                "score": data.get("score"),
+            }
+            valid_libs_stats.append(payload)
+            # log post in daily stats
+            dt = datetime.datetime.strptime(
+                data.get(
+                    "date_posted"),
+                    "%Y-%m-%dT%H:%M:%S.%f").date()
+            daily_post_stats[dt.strftime("%Y-%m-%d")] += 1
+
+            stats['success'] += 1
+        except Exception as exc:
+            stats[str(exc)] += 1
+
+    new_cache_entries = []
+    if _import_cache is not None:
+        for name, count in _import_cache.counters().items():
+            stats[name] += count - cache_counters[name]
+        new_cache_entries = _import_cache.pop_new_entries()
+
+    return (
+        valid_libs_stats, invalid_libs_stats, daily_post_stats, code_count_list, stats,
+        new_cache_entries,
+    )
+
+
+def _merge_counts(total: typing.Dict[str, int], partial: typing.Dict[str, int]):
+    # chunks are merged in input order, so keys keep their first-seen order
+    for key, count in partial.items():
+        total[key] += count
+
+
+def _extract_chunks_in_order(chunks, extract_chunk, workers: int):
+    """
+    Yields (position after the chunk, partial results) in input order. With
+    several workers, at most two chunks per worker are in flight, so the
+    input is not read ahead of the extraction.
+    """
+    if workers <= 1:
+        for end_position, rows in chunks:
+            yield end_position, extract_chunk(rows)
+        return
+
+    with multiprocessing.get_context("fork").Pool(workers) as pool:
+        pending = collections.deque()
+        for end_position, rows in chunks:
+            pending.append((end_position, pool.apply_async(extract_chunk, (rows,))))
+            if len(pending) >= 2 * workers:
+                end_position, result = pending.popleft()
+                yield end_position, result.get()
+        while pending:
+            end_position, result = pending.popleft()
+            yield end_position, result.get()
+
 
 def generate_extracted_import_metadata(
-        input_path: str,
+        input_path: typing.Union[str, typing.List[str]],
         target_language: str,
         bypass_validation: bool,
         max_year: int,
+        manifest: typing.Optional[incremental.PostManifest] = None,
+        checkpoints: typing.Optional[checkpoint.CheckpointDir] = None,
+        resume: bool = False,
+        checkpoint_every: int = 100_000,
+        code_engine: str = "markdown",
+        workers: int = 1,
+        chunk_size: int = 1000,
+        cache: typing.Optional[import_cache.ImportCache] = None,
+        payload_writer: typing.Optional[jsonl_writer.JsonlWriter] = None,
+        min_year: typing.Optional[int] = None,
+        post_types: typing.Optional[typing.Iterable[str]] = None,
+        min_score: typing.Optional[int] = None,
 ) -> typing.Dict[str, int]:
+    """
+    Posts without a poster id or a date, posted outside of [min_year,
+    max_year], of another type than post_types (PostTypeId values) or with
+    a score below min_score are counted per reason and skipped before their
+    code is extracted.
+
+    The payloads of the posts are written to payload_writer as they come
+    (the returned list is empty then) or collected and returned. Checkpoints
+    need a payload_writer, they record its size.
+
+    With workers > 1 the rows are extracted in chunks of chunk_size on a
+    process pool. The partial results are merged in input order, so the
+    outputs are identical to a single process run. Checkpoints are taken
+    at chunk boundaries.
+
+    The imports of the snippets are memoized in cache, if given. Workers
+    use their own copy of it; if cache.record_new is set, what they add is
+    sent back and added to cache as well.
+    """
+    global _import_cache
+    if workers > 1 and manifest is not None:
+        raise ValueError("The manifest cannot be shared with worker processes!")
+    if checkpoints is not None and payload_writer is None:
+        raise ValueError("Checkpoints need the payloads to be written as they come!")
+
     stats = collections.defaultdict(int)
     valid_libs_stats = []
     invalid_libs_stats = collections. defaultdict(int)
     daily_post_stats = collections.defaultdict(int)
     code_count_list = []
-    with (
-        open(input_path) as in_handle,
-    ):
-        for row in tqdm.tqdm(in_handle):
-            stats["TOTAL"] += 1
-            try:
-                parsed_row = json.loads(row)
-                post_id, data =\
-                    extractor.extract_code_snippets_from_parsed_row(parsed_row)
-                post_id, codes, import_list, invalids =\
-                    extractor.extract_import_statements_from_single_row(
-                        post_id,
-                        parsed_data=data,
-                        target_language=target_language,
-                        bypass_validation=bypass_validation)
-                
-                if not post_id:
-                    stats["no post id"] += 1
-                    continue
-
-                if not data.get("poster_id"):
-                    stats["no poster id"] += 1
-                    continue
-
-                if not data.get("date_posted"):
-                    stats["no date posted"] += 1
-                    continue
-
-                if not data.get("code_snippets"):
-                    stats["no code"] += 1
-                    continue
-
-                if not data.get("date_posted"):
-                    stats["no date"] += 1
-                    continue
-
-                if int(data["date_posted"][:4]) > int(max_year):
-                    stats["too new"] += 1
-                    continue
-
-                # process invalid libs stats
-                for invalid in invalids:
-                    invalid_libs_stats[invalid] += 1
-
-                # TODO: this should not happen here.
-                # only keep reasonably looking imports. Ditch empty strings, etc.
-                import_list = [item.strip() for item in import_list if item.strip()]
-
-                if not import_list:
-                    stats['empty list'] += 1
-                    continue
-
-                code_count_list.append(len(import_list))
-                payload = {
-                    "id": post_id,
-		    "post_type":data.get("post_type"),
-                    "imports": import_list,
-                    # "codes": codes,  # NOTE: this can be huge, think twice before adding it back!
-                    "date": data.get("date_posted"),  # 
-                    "poster_id": data.get("poster_id"),
-                    "score": data.get("score"),
-                }
-                valid_libs_stats.append(payload)
-                # log post in daily stats
-                dt = datetime.datetime.strptime(
-                    data.get(
-                        "date_posted"),
-                        "%Y-%m-%dT%H:%M:%S.%f").date()
-                daily_post_stats[dt.strftime("%Y-%m-%d")] += 1
-
-                stats['success'] += 1
-            except Exception as exc:
-                stats[str(exc)] += 1
+
+    position = (0, 0)
+    state = checkpoints.load("extract") if checkpoints and resume else None
+    if state is not None:
+        logger.info(f"Resuming extraction at (file, offset) {state['position']}.")
+        position = tuple(state["position"])
+        stats.update(state["stats"])
+        invalid_libs_stats.update(state["invalid_libs_stats"])
+        daily_post_stats.update(state["daily_post_stats"])
+        code_count_list = _restore_extraction_checkpoint(payload_writer, state)
+
+    extract_chunk = functools.partial(
+        _extract_from_rows,
+        target_language=target_language,
+        bypass_validation=bypass_validation,
+        post_filter=post_filters.PostFilter(
+            min_year=min_year,
+            max_year=max_year,
+            post_types=post_types,
+            min_score=min_score,
+            require_poster_id=True,
+            require_date=True,
+        ),
+        code_engine=code_engine,
+        manifest=manifest,
+    )
+    chunks = _iter_input_chunks(input_path, position, chunk_size)
+    saved_checkpoints = stats["TOTAL"] // checkpoint_every
+    _import_cache = cache
+    with tqdm.tqdm(unit="posts") as progress:
+        for end_position, (
+            partial_valid_libs_stats, partial_invalid_libs_stats,
+            partial_daily_post_stats, partial_code_count_list, partial_stats,
+            new_cache_entries,
+        ) in _extract_chunks_in_order(chunks, extract_chunk, workers):
+            if workers > 1 and cache is not None:
+                cache.update(new_cache_entries)
+            if payload_writer is None:
+                valid_libs_stats.extend(partial_valid_libs_stats)
+            else:
+                for payload in partial_valid_libs_stats:
+                    payload_writer.write(payload)
+            _merge_counts(invalid_libs_stats, partial_invalid_libs_stats)
+            _merge_counts(daily_post_stats, partial_daily_post_stats)
+            code_count_list.extend(partial_code_count_list)
+            _merge_counts(stats, partial_stats)
+            progress.update(partial_stats["TOTAL"])
+
+            if (
+                checkpoints is not None and
+                stats["TOTAL"] // checkpoint_every > saved_checkpoints
+            ):
+                _save_extraction_checkpoint(
+                    checkpoints, end_position, stats, invalid_libs_stats,
+                    daily_post_stats, payload_writer)
+                saved_checkpoints = stats["TOTAL"] // checkpoint_every
+    _import_cache = None
 
     return valid_libs_stats, invalid_libs_stats, daily_post_stats, code_count_list, stats
 
 
+def summarize_payloads(
+    payloads: typing.List[typing.Dict],
+) -> typing.Tuple[typing.Dict[str, int], typing.List[int]]:
+    """
+    Rebuilds daily_post_stats and code_count_list from the post payloads,
+    both are derived from the successfully extracted posts only.
+    """
+    daily_post_stats = collections.defaultdict(int)
+    code_count_list = []
+    for payload in payloads:
+        code_count_list.append(len(payload["imports"]))
+        dt = datetime.datetime.strptime(
+            payload["date"], "%Y-%m-%dT%H:%M:%S.%f").date()
+        daily_post_stats[dt.strftime("%Y-%m-%d")] += 1
+    return daily_post_stats, code_count_list
+
+
+def _load_json_if_exists(path: str, default):
+    if not os.path.exists(path):
+        return default
+    with compressed_io.open_input(path) as handle:
+        return json.load(handle)
+
+
 @click.command()
-@click.option("-t", "--target_language", type=str, required=True)
+@click.option("-t", "--target_language", type=str, required=True,
+              help=f"Use >>{FAN_OUT_LANGUAGES}<< with --parse_xml_only to split the XML into every language at once.")
 @click.option("-i", "--raw_input_path", type=str, default=None)
 @click.option("--parse_xml_only", is_flag=True, show_default=True, default=False)
+@click.option("--single_pass", is_flag=True, show_default=True, default=False,
+              help="Parse the raw XML in a single scan, parking answers with unseen questions on disk.")
+@click.option("--xml_workers", type=int, default=1, show_default=True,
+              help="Parse the raw XML on this many processes (byte range shards).")
+@click.option("--max_rows_per_file", type=int, default=None,
+              help="Shard the curated posts output after this many rows per file.")
+@click.option("--max_bytes_per_file", type=int, default=None,
+              help="Shard the curated posts output after this many bytes per file.")
 @click.option("-j", "--curated_posts_path", type=str, default=None)
 @click.option("-m", "--metadata_output_path", type=str, default="meta.json")
 @click.option("-o", "--imports_output_path", type=str)
@@ -115,18 +386,86 @@ def generate_extracted_import_metadata(
               help="Should we validate the packages obtained?")
 @click.option("--gen_invalids", is_flag=True, show_default=True, default=False,
               help="Generates a JSON collection of encountered invalid libs.")
+@click.option("--compression", type=click.Choice(compressed_io.COMPRESSION_CHOICES),
+              default="none", show_default=True,
+              help="Compress the JSON outputs (the extension is appended to the file names).")
+@click.option("--write_post_store", is_flag=True, show_default=True, default=False,
+              help="Also write the post stats as a memory-mappable columnar store "
+                   "(<-o>_<language>_post_store/, see utils.post_store).")
+@click.option("--code_engine", type=click.Choice(extractor.CODE_EXTRACTION_ENGINES),
+              default="markdown", show_default=True,
+              help="How code blocks are found in the post bodies: the Markdown line state machine "
+                   "or a single scan over the <pre><code> blocks of the rendered HTML.")
+@click.option("--workers", type=int, default=1, show_default=True,
+              help="Extract the imports on this many processes (chunks of curated rows, "
+                   "merged in input order).")
+@click.option("--chunk_size", type=int, default=1000, show_default=True,
+              help="Curated rows handed to a worker at once.")
+@click.option("--import_cache_size", type=int, default=0, show_default=True,
+              help="Memoize the imports of up to this many distinct snippets (0: no cache).")
+@click.option("--import_cache_path", type=str, default=None,
+              help="Load the import cache from and save it to this JSON file, so later runs "
+                   "(e.g. with another --max_year or validation setting) can reuse it.")
+@click.option("--package_snapshot_dir", type=str, default=None,
+              help="Validate against the package registry snapshots in this directory "
+                   "(see generate_package_snapshots.py) instead of the live registries.")
 @click.option("--max_year", type=int, default=2024, show_default=True,
               help="Only process entries that are not younger than the end of the given year.")
+@click.option("--min_year", type=int, default=None,
+              help="Only process entries posted in the given year or later.")
+@click.option("--post_type", type=click.Choice(sorted(post_filters.POST_TYPE_IDS)), multiple=True,
+              help="Only process posts of this type (can be repeated, default: all).")
+@click.option("--min_score", type=int, default=None,
+              help="Only process posts with at least this score.")
+@click.option("--require_poster_id", is_flag=True, show_default=True, default=False,
+              help="Drop the posts without an owner at XML ingest already (the extraction always "
+                   "skips them).")
+@click.option("--filter_xml", is_flag=True, show_default=True, default=False,
+              help="Apply the year range, post type, score and poster id filters to the raw XML "
+                   "rows, so the rejected posts are never written to the curated posts.")
+@click.option("--manifest_path", type=str, default=None,
+              help="Incremental mode: only extract posts that are new or edited since the run "
+                   "that wrote this manifest, and merge them into the existing outputs.")
+@click.option("--full_curated_posts_path", type=str, default=None,
+              help="Incremental mode: full curated posts JSONL the new/edited posts are merged into.")
+@click.option("--checkpoint_dir", type=str, default=None,
+              help="Periodically save the progress of the XML ingest and the extraction here.")
+@click.option("--checkpoint_every", type=int, default=100_000, show_default=True,
+              help="Rows between two checkpoints.")
+@click.option("--resume", is_flag=True, show_default=True, default=False,
+              help="Continue from the last checkpoint in --checkpoint_dir.")
 def main(
     target_language,
     raw_input_path,
     parse_xml_only,
+    single_pass,
+    xml_workers,
+    max_rows_per_file,
+    max_bytes_per_file,
     curated_posts_path,
     metadata_output_path,
     imports_output_path,
     bypass_validation,
     gen_invalids,
+    compression,
+    write_post_store,
+    code_engine,
+    workers,
+    chunk_size,
+    import_cache_size,
+    import_cache_path,
+    package_snapshot_dir,
     max_year,
+    min_year,
+    post_type,
+    min_score,
+    require_poster_id,
+    filter_xml,
+    manifest_path,
+    full_curated_posts_path,
+    checkpoint_dir,
+    checkpoint_every,
+    resume,
 ):
     if (
         not raw_input_path
@@ -142,40 +481,213 @@ def main(
         raise ValueError(
             "The flag >>parse_xml_only<< is only meaningful if we process a raw XML input!"
         )
+    if target_language == FAN_OUT_LANGUAGES and not parse_xml_only:
+        raise ValueError(
+            f"Target language >>{FAN_OUT_LANGUAGES}<< requires the >>parse_xml_only<< flag!"
+        )
+    if full_curated_posts_path and not (manifest_path and raw_input_path):
+        raise ValueError(
+            ">>full_curated_posts_path<< needs a raw XML input and a >>manifest_path<<!"
+        )
+
+    if filter_xml and not raw_input_path:
+        raise ValueError("The flag >>filter_xml<< requires a >>raw_input_path<<!")
+    if import_cache_path and not import_cache_size:
+        raise ValueError(">>import_cache_path<< requires an >>import_cache_size<<!")
+    if resume and not checkpoint_dir:
+        raise ValueError("The flag >>resume<< requires a >>checkpoint_dir<<!")
+    if checkpoint_dir and manifest_path:
+        raise ValueError("Checkpoints are not supported in incremental mode!")
+    if checkpoint_dir and compression != "none":
+        raise ValueError("Compressed outputs cannot be checkpointed!")
+    if workers > 1 and manifest_path and not raw_input_path:
+        raise ValueError(
+            "Incremental mode on curated posts (>>manifest_path<< with "
+            ">>curated_posts_path<<) needs a single worker!"
+        )
+    checkpoints = None
+    if checkpoint_dir:
+        checkpoints = checkpoint.CheckpointDir(checkpoint_dir)
+        if not resume:
+            checkpoints.clear()
+        elif (checkpoints.load("extract") or {}).get("phase") == "done":
+            logger.info("Nothing to resume, the previous run finished.")
+            return
+
+    manifest = None
+    if manifest_path:
+        if raw_input_path and os.path.exists(metadata_output_path):
+            raise ValueError(
+                f"{metadata_output_path} already exists, the new/edited posts "
+                "must be written to a fresh file in incremental mode!"
+            )
+        manifest = incremental.PostManifest.load(manifest_path)
+        logger.info(
+            f"Incremental mode, {len(manifest.body_hashes)} posts known "
+            f"up to post Id {manifest.max_post_id}."
+        )
+
+    post_types = [post_filters.POST_TYPE_IDS[name] for name in post_type] or None
+    xml_post_filter = None
+    if filter_xml:
+        xml_post_filter = post_filters.PostFilter(
+            min_year=min_year,
+            max_year=max_year,
+            post_types=post_types,
+            min_score=min_score,
+            require_poster_id=require_poster_id,
+        )
+
+    if raw_input_path and target_language == FAN_OUT_LANGUAGES:
+        logger.info("Starting XML search for all languages.")
+        output_paths = xml_parser.parse_xml_source_and_generate_output(
+            None,
+            raw_input_path,
+            metadata_output_path,
+            single_pass=single_pass,
+            max_rows_per_file=max_rows_per_file,
+            max_bytes_per_file=max_bytes_per_file,
+            workers=xml_workers,
+            row_filter=manifest.observe if manifest else None,
+            checkpoints=checkpoints,
+            resume=resume,
+            checkpoint_every=checkpoint_every,
+            post_filter=xml_post_filter,
+        )
+        logger.info(f"XML extraction finished. Output files are {output_paths}")
+        if manifest:
+            manifest.save(manifest_path)
+        return
 
     if raw_input_path:
         logger.info(f"Starting XML search. Target language is {target_language}")
-        xml_parser.parse_xml_source_and_generate_output(
+        curated_posts_path = xml_parser.parse_xml_source_and_generate_output(
             target_language,
             raw_input_path,
             metadata_output_path,
-        )
-        curated_posts_path = metadata_output_path
+            single_pass=single_pass,
+            max_rows_per_file=max_rows_per_file,
+            max_bytes_per_file=max_bytes_per_file,
+            workers=xml_workers,
+            row_filter=manifest.observe if manifest else None,
+            checkpoints=checkpoints,
+            resume=resume,
+            checkpoint_every=checkpoint_every,
+            post_filter=xml_post_filter,
+        )[target_language]
         logger.info(f"XML extraction finished. Output file is {curated_posts_path}")
+        if full_curated_posts_path:
+            merge_stats = incremental.merge_jsonl_by_id(
+                full_curated_posts_path, curated_posts_path, full_curated_posts_path)
+            logger.info(f"Merged new/edited posts into {full_curated_posts_path}: {merge_stats}")
         if parse_xml_only:
+            if manifest:
+                manifest.save(manifest_path)
             logger.info("Parse-XML-only enabled, exiting execution.")
             return
 
-    valid_libs_stats, invalid_libs_stats, daily_post_stats, code_count_list, stats =\
-        generate_extracted_import_metadata(
-            input_path=curated_posts_path, 
-            target_language=target_language,
-            bypass_validation=bypass_validation,
-            max_year=max_year)
+    if package_snapshot_dir:
+        valid_packages.set_snapshot_dir(package_snapshot_dir)
+
+    cache = None
+    if import_cache_path:
+        cache = import_cache.ImportCache.load(
+            import_cache_path, import_cache_size, record_new=workers > 1)
+    elif import_cache_size:
+        cache = import_cache.ImportCache(import_cache_size)
 
-    with open(f"{imports_output_path}_{target_language}_post_stats.json", "w") as out_handle:
-        json.dump(valid_libs_stats, out_handle)
+    suffix = compressed_io.compression_suffix(compression)
+    output_prefix = f"{imports_output_path}_{target_language}"
+    post_stats_path = f"{output_prefix}{post_stats.POST_STATS_SUFFIX}{suffix}"
+    # in incremental mode the payloads are merged into the existing ones
+    # at the end, otherwise they are written as they come
+    payload_writer = (
+        None if manifest else jsonl_writer.JsonlWriter(post_stats_path, mode="w")
+    )
 
-    with open(f"{imports_output_path}_{target_language}_daily_post_stats.json", "w") as out_handle:
+    shared_index_dir = None
+    if workers > 1 and not bypass_validation:
+        shared_index_dir = tempfile.mkdtemp(prefix="package_index_")
+    try:
+        if shared_index_dir:
+            valid_packages.share_live_packages(target_language, shared_index_dir)
+        valid_libs_stats, invalid_libs_stats, daily_post_stats, code_count_list, stats =\
+            generate_extracted_import_metadata(
+                input_path=curated_posts_path, 
+                target_language=target_language,
+                bypass_validation=bypass_validation,
+                max_year=max_year,
+                # rows coming from the XML ingest were already filtered
+                manifest=manifest if manifest and not raw_input_path else None,
+                checkpoints=checkpoints,
+                resume=resume,
+                checkpoint_every=checkpoint_every,
+                code_engine=code_engine,
+                workers=workers,
+                chunk_size=chunk_size,
+                cache=cache,
+                payload_writer=payload_writer,
+                min_year=min_year,
+                post_types=post_types,
+                min_score=min_score)
+    finally:
+        # the temporary index goes away whatever happened to the extraction
+        if shared_index_dir:
+            shutil.rmtree(shared_index_dir)
+    if xml_post_filter is not None:
+        # the posts dropped at ingest count as if the extraction had skipped them
+        stats["TOTAL"] += sum(xml_post_filter.rejected.values())
+        _merge_counts(stats, xml_post_filter.rejected)
+
+    if payload_writer is not None:
+        payload_writer.close()
+    else:
+        existing_path = post_stats.find_post_stats(output_prefix, suffix)
+        valid_libs_stats = incremental.merge_payloads(
+            post_stats.iter_post_stats(existing_path) if existing_path else [],
+            valid_libs_stats,
+            manifest.changed_ids,
+        )
+        daily_post_stats, code_count_list = summarize_payloads(valid_libs_stats)
+        # counts of edited posts cannot be taken back, invalid libs only grow
+        invalids_path = f"{imports_output_path}_{target_language}_invalid_libs.json{suffix}"
+        for lib, count in _load_json_if_exists(invalids_path, {}).items():
+            invalid_libs_stats[lib] += count
+        logger.info(
+            f"Merged {len(manifest.changed_ids)} new/edited posts, "
+            f"{len(valid_libs_stats)} posts in total."
+        )
+        post_stats.write_post_stats(post_stats_path, valid_libs_stats)
+
+    if write_post_store:
+        n_posts = post_store.write_post_store(
+            f"{output_prefix}{post_store.POST_STORE_SUFFIX}",
+            post_stats.iter_post_stats(post_stats_path))
+        logger.info(f"{n_posts} posts written to the post store.")
+
+    with compressed_io.open_output(
+        f"{imports_output_path}_{target_language}_daily_post_stats.json{suffix}"
+    ) as out_handle:
         json.dump(daily_post_stats, out_handle)
 
-    with open(f"{imports_output_path}_{target_language}_code_count_list.json", "w") as out_handle:
+    with compressed_io.open_output(
+        f"{imports_output_path}_{target_language}_code_count_list.json{suffix}"
+    ) as out_handle:
         json.dump(code_count_list, out_handle)
 
     if gen_invalids:
-        with open(f"{imports_output_path}_{target_language}_invalid_libs.json", 'w') as handle:
+        with compressed_io.open_output(
+            f"{imports_output_path}_{target_language}_invalid_libs.json{suffix}"
+        ) as handle:
             json.dump(invalid_libs_stats, handle)
 
+    if manifest:
+        manifest.save(manifest_path)
+    if import_cache_path:
+        cache.save(import_cache_path)
+    if checkpoints:
+        checkpoints.save("extract", {"phase": "done"})
+
     logger.info(f"Extraction finished,  stats: {stats}")
 
 
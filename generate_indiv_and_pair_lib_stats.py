@@ -3,18 +3,40 @@ import datetime
 import itertools
 import json
 import logging
+import multiprocessing
 import typing
 
 import click
 import tqdm
 
+import utils.compressed_io as compressed_io
+import utils.date_histograms as date_histograms
+import utils.lib_stats as lib_stats
+import utils.post_stats as post_stats
+import utils.post_store as post_store
+
 logging.basicConfig(level=logging.DEBUG, format='%(message)s')
 logger = logging.getLogger(__name__)
 
+# "python" walks the posts with dicts keyed by names, "numpy" counts on
+# interned lib ids (see utils.lib_stats); both give the same outputs
+COUNTING_ENGINES = ["python", "numpy"]
+
+# <-o>_<name>.json
+OUTPUT_NAMES = lib_stats.OUTPUT_NAMES
+# replaced by <-o>_libs/pairs + date_histograms.HISTOGRAMS_SUFFIX with --histogram_dates
+DATE_LIST_OUTPUT_NAMES = ["all_libs_dates", "all_pairs_dates"]
+
 
 def find_first_appearances_and_count_appearances(
-        data: typing.List[typing.Dict]
+        data: typing.Iterable[typing.Dict],
+        engine: str = "python",
 ):
+    if engine == "numpy":
+        return lib_stats.find_first_appearances_and_count_appearances(data)
+    if engine != "python":
+        raise ValueError(f"Unknown counting engine: {engine}")
+
     libs_count = collections.defaultdict(int)
     pairs_count = collections.defaultdict(int)
     all_libs_dates = collections.defaultdict(list)
@@ -65,35 +87,158 @@ def find_first_appearances_and_count_appearances(
     )
 
 
+def _aggregate_chunk(
+    chunk: typing.Tuple[typing.List[typing.Dict], int]
+) -> lib_stats.LibStatsAggregate:
+    rows, first_sequence = chunk
+    return lib_stats.LibStatsAggregate.from_posts(rows, first_sequence)
+
+
+def aggregate_in_chunks(
+    data: typing.Iterable[typing.Dict],
+    workers: int = 1,
+    chunk_size: int = 100_000,
+    aggregate: typing.Optional[lib_stats.LibStatsAggregate] = None,
+) -> lib_stats.LibStatsAggregate:
+    """
+    Aggregates chunks of chunk_size posts (on a process pool if workers > 1)
+    and merges them in input order into aggregate, e.g. the one of a
+    previous run, or a new one.
+    """
+    if aggregate is None:
+        aggregate = lib_stats.LibStatsAggregate()
+
+    def chunks():
+        first_sequence = aggregate.first_sequence + aggregate.n_posts
+        rows_iterator = iter(data)
+        while True:
+            rows = list(itertools.islice(rows_iterator, chunk_size))
+            if not rows:
+                return
+            yield rows, first_sequence
+            first_sequence += len(rows)
+
+    if workers <= 1:
+        for chunk in chunks():
+            aggregate.merge(_aggregate_chunk(chunk))
+        return aggregate
+
+    # at most two chunks per worker are in flight, the input is not read ahead
+    with multiprocessing.get_context("fork").Pool(workers) as pool:
+        pending = collections.deque()
+        for chunk in chunks():
+            pending.append(pool.apply_async(_aggregate_chunk, (chunk,)))
+            if len(pending) >= 2 * workers:
+                aggregate.merge(pending.popleft().get())
+        while pending:
+            aggregate.merge(pending.popleft().get())
+    return aggregate
+
+
 @click.command()
 @click.option("-i", "--input_path", type=str)
 @click.option("-o", "--output_path", type=str)
-def main(input_path, output_path):
-    logger.info("Load input JSON (this takes a while...)")
-    with open(input_path) as handle:
-        data = json.load(handle)
-    logger.info("Input JSON loaded.")
+@click.option("--compression", type=click.Choice(compressed_io.COMPRESSION_CHOICES),
+              default="none", show_default=True,
+              help="Compress the JSON outputs (the extension is appended to the file names).")
+@click.option("--engine", type=click.Choice(COUNTING_ENGINES), default="python", show_default=True,
+              help="Count with dicts keyed by the lib names, or with numpy on interned lib ids "
+                   "(same outputs, much faster on large corpora). --workers and "
+                   "--previous_output_path only count with numpy.")
+@click.option("--histogram_dates", is_flag=True, show_default=True, default=False,
+              help="Write the appearance dates as per-key daily histograms (.npz, see "
+                   "utils.date_histograms) instead of the all_libs_dates/all_pairs_dates JSON lists.")
+@click.option("--workers", type=int, default=1, show_default=True,
+              help="Aggregate chunks of posts on this many processes and merge them in input "
+                   "order; the chunks are always counted with numpy.")
+@click.option("--chunk_size", type=int, default=100_000, show_default=True,
+              help="Posts per chunk with --workers or --previous_output_path.")
+@click.option("--previous_output_path", type=str, default=None,
+              help="Incremental mode: -o of a previous run (with the JSON date lists), the posts of "
+                   "-i are added to its statistics.")
+def main(
+    input_path,
+    output_path,
+    compression,
+    engine,
+    histogram_dates,
+    workers,
+    chunk_size,
+    previous_output_path,
+):
+    # payloads are read one by one (JSONL, the older JSON array or a post store)
+    data = post_stats.iter_post_stats(input_path)
+    suffix = compressed_io.compression_suffix(compression)
+    output_names = [
+        name for name in OUTPUT_NAMES
+        if not (histogram_dates and name in DATE_LIST_OUTPUT_NAMES)
+    ]
+
+    if workers > 1 or previous_output_path:
+        if click.get_current_context().get_parameter_source("engine") != \
+                click.core.ParameterSource.DEFAULT and engine != "numpy":
+            raise click.UsageError(
+                f"--workers and --previous_output_path count with numpy, not --engine {engine}.")
+        aggregate = None
+        if previous_output_path:
+            aggregate = lib_stats.LibStatsAggregate.load_outputs(previous_output_path, suffix)
+            logger.info(f"Adding the posts to the {aggregate.n_posts} of {previous_output_path}.")
+        aggregate = aggregate_in_chunks(data, workers, chunk_size, aggregate)
+        outputs = aggregate.json_outputs(include_dates=not histogram_dates)
+        logger.info("Generating output files...")
+        for name in output_names:
+            with compressed_io.open_output(f"{output_path}_{name}.json{suffix}") as handle:
+                handle.write(outputs[name])
+        if histogram_dates:
+            for kind in ["libs", "pairs"]:
+                date_histograms.write_histograms_from_date_lists(
+                    f"{output_path}_{kind}{date_histograms.HISTOGRAMS_SUFFIX}",
+                    aggregate.all_dates[kind])
+        return
+
+    if engine == "numpy":
+        # the outputs are rendered from the arrays, no dict per lib/pair; a
+        # post store is counted on its mapped columns, without any payload
+        if post_store.is_post_store(input_path):
+            appearances = lib_stats.Appearances.from_interned(
+                post_store.PostStore(input_path).interned())
+        else:
+            appearances = lib_stats.Appearances(data)
+        outputs = appearances.json_outputs(include_dates=not histogram_dates)
+        logger.info("Generating output files...")
+        for name in output_names:
+            with compressed_io.open_output(f"{output_path}_{name}.json{suffix}") as handle:
+                handle.write(outputs[name])
+        if histogram_dates:
+            appearances.write_date_histograms(output_path)
+        return
 
     (
         libs_count, pairs_count, user_to_posts,
         all_libs_dates, all_pairs_dates,
         libs_first_dates, pairs_first_dates,
     ) =\
-        find_first_appearances_and_count_appearances(data)
+        find_first_appearances_and_count_appearances(data, engine)
     logger.info("Generating output files...")
-    with open(f"{output_path}_user_to_posts.json", "w") as handle:
+    with compressed_io.open_output(f"{output_path}_user_to_posts.json{suffix}") as handle:
         json.dump(user_to_posts, handle)
-    with open(f"{output_path}_libs_count.json", 'w') as handle:
+    with compressed_io.open_output(f"{output_path}_libs_count.json{suffix}") as handle:
         json.dump(libs_count, handle, default=str)
-    with open(f"{output_path}_pairs_count.json", 'w') as handle:
+    with compressed_io.open_output(f"{output_path}_pairs_count.json{suffix}") as handle:
         json.dump(pairs_count, handle, default=str)
-    with open(f"{output_path}_all_libs_dates.json", 'w') as handle:
-        json.dump(all_libs_dates, handle, default=str)
-    with open(f"{output_path}_all_pairs_dates.json", 'w') as handle:
-        json.dump(all_pairs_dates, handle, default=str)
-    with open(f"{output_path}_libs_first_dates.json", 'w') as handle:
+    if histogram_dates:
+        date_histograms.write_histograms_from_date_lists(
+            f"{output_path}_libs{date_histograms.HISTOGRAMS_SUFFIX}", all_libs_dates)
+        date_histograms.write_histograms_from_date_lists(
+            f"{output_path}_pairs{date_histograms.HISTOGRAMS_SUFFIX}", all_pairs_dates)
+    else:
+        with compressed_io.open_output(f"{output_path}_all_libs_dates.json{suffix}") as handle:
+            json.dump(all_libs_dates, handle, default=str)
+        with compressed_io.open_output(f"{output_path}_all_pairs_dates.json{suffix}") as handle:
+            json.dump(all_pairs_dates, handle, default=str)
+    with compressed_io.open_output(f"{output_path}_libs_first_dates.json{suffix}") as handle:
         json.dump(libs_first_dates, handle, default=str)
-    with open(f"{output_path}_pairs_first_dates.json", 'w') as handle:
+    with compressed_io.open_output(f"{output_path}_pairs_first_dates.json{suffix}") as handle:
         json.dump(pairs_first_dates, handle, default=str)
 
 
@@ -4,19 +4,25 @@ import logging
 import typing
 
 import click
+import numpy as np
 import tqdm
 
+import utils.compressed_io as compressed_io
+import utils.lib_stats as lib_stats
+import utils.post_stats as post_stats
+import utils.post_store as post_store
+
 logging.basicConfig(level=logging.DEBUG, format='%(message)s')
 logger = logging.getLogger(__name__)
 
 
 def generate_time_based_new_stats(
-        data: typing.List[typing.Dict],
+        data: typing.Iterable[typing.Dict],
         output_path: str,
 ):
     LIBS_SEEN = set()
     PAIRS_SEEN = set()
-    with open(output_path, "w") as json_file:
+    with compressed_io.open_output(output_path) as json_file:
         for row in tqdm.tqdm(data):
             payload = {
                 "post_id": row.get("id"),
@@ -43,16 +49,64 @@ def generate_time_based_new_stats(
             json_file.write("\n")
 
 
+def _first_occurrences(
+    keys: np.ndarray, post_indices: np.ndarray, n_posts: int,
+) -> typing.Tuple[typing.List[int], typing.List[int]]:
+    """
+    The keys in the order they are first seen and where the ones of each
+    post start (post i saw keys[starts[i]:starts[i + 1]] first).
+    """
+    _, first_positions = np.unique(keys, return_index=True)
+    first_positions.sort()
+    starts = np.searchsorted(post_indices[first_positions], np.arange(n_posts + 1))
+    return keys[first_positions].tolist(), starts.tolist()
+
+
+def generate_time_based_new_stats_from_store(
+        store: post_store.PostStore,
+        output_path: str,
+):
+    """
+    generate_time_based_new_stats() on a post store: the new libs and pairs
+    of every post are found on the interned columns.
+    """
+    posts = store.interned()
+    new_lib_ids, lib_starts = _first_occurrences(*lib_stats.lib_occurrences(posts), len(posts))
+    new_pair_keys, pair_starts = _first_occurrences(*lib_stats.pair_occurrences(posts), len(posts))
+    names = posts.names
+    with compressed_io.open_output(output_path) as json_file:
+        for index, row in enumerate(tqdm.tqdm(store.iter_payloads(), total=len(store))):
+            payload = {
+                "post_id": row.get("id"),
+                "post_date": row.get("date"),
+                "user_id": row.get("poster_id"),
+                "post_type": row.get("post_type"),
+                "imports": row.get("imports"),
+                "new_libs": [
+                    names[lib_id] for lib_id in new_lib_ids[lib_starts[index]:lib_starts[index + 1]]
+                ],
+                "new_pairs": [
+                    lib_stats.pair_names(names, key)
+                    for key in new_pair_keys[pair_starts[index]:pair_starts[index + 1]]
+                ],
+            }
+            json_file.write(json.dumps(payload))
+            json_file.write("\n")
+
+
 @click.command()
 @click.option("-i", "--input_path", type=str)
 @click.option("-o", "--output_path", type=str)
-def main(input_path, output_path):
-    logger.info("Load input JSON (this takes a while...)")
-    with open(input_path) as handle:
-        data = json.load(handle)
-    logger.info("Input JSON loaded.")
-
-    generate_time_based_new_stats(data, output_path + "_time_based_new.jsonl")
+@click.option("--compression", type=click.Choice(compressed_io.COMPRESSION_CHOICES),
+              default="none", show_default=True,
+              help="Compress the JSONL output (the extension is appended to the file name).")
+def main(input_path, output_path, compression):
+    output_path = output_path + "_time_based_new.jsonl" + compressed_io.compression_suffix(compression)
+    if post_store.is_post_store(input_path):
+        generate_time_based_new_stats_from_store(post_store.PostStore(input_path), output_path)
+    else:
+        # payloads are read one by one (JSONL or the older JSON array)
+        generate_time_based_new_stats(post_stats.iter_post_stats(input_path), output_path)
     logger.info("DONE")
 
 
@@ -0,0 +1,42 @@
+import logging
+
+import click
+
+import utils.common as common
+import utils.package_snapshot as package_snapshot
+import utils.valid_packages as valid_packages
+
+logging.basicConfig(level=logging.DEBUG, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+
+@click.command()
+@click.option("-d", "--snapshot_dir", type=str, required=True,
+              help="Directory the snapshots are written to.")
+@click.option("-l", "--language", "languages", type=str, multiple=True,
+              default=["python", "ruby"], show_default=True,
+              help="Language to snapshot from its live registry (repeatable).")
+@click.option("--from_file", type=str, default=None,
+              help="Snapshot the names listed in this file (one per line) instead of the "
+                   "live registry, e.g. for languages without a registry client. "
+                   "Requires a single --language.")
+def main(snapshot_dir, languages, from_file):
+    if from_file and len(languages) != 1:
+        raise ValueError(">>from_file<< requires exactly one >>language<<!")
+
+    for language in languages:
+        if from_file:
+            with open(from_file) as handle:
+                names = common.to_lowercase_underscored(
+                    [line.strip() for line in handle if line.strip()])
+        else:
+            names = valid_packages.get_live_packages(language)
+            if names is None:
+                raise ValueError(
+                    f"No registry client for {language}, use >>from_file<<!")
+        count = package_snapshot.write_snapshot(snapshot_dir, language, names)
+        logger.info(f"{language}: {count} package names written to {snapshot_dir}.")
+
+
+if __name__ == "__main__":
+    main()
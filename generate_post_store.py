@@ -0,0 +1,32 @@
+import logging
+
+import click
+
+import utils.post_stats as post_stats
+import utils.post_store as post_store
+
+logging.basicConfig(level=logging.DEBUG, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+
+@click.command()
+@click.option("-i", "--input_path", type=str, required=True,
+              help="Post stats file (JSONL or the older JSON array, possibly compressed).")
+@click.option("-o", "--output_path", type=str, default=None,
+              help="Directory of the store; defaults to the input path with the post stats "
+                   "suffix replaced by " + post_store.POST_STORE_SUFFIX + ".")
+def main(input_path, output_path):
+    if output_path is None:
+        for suffix in [post_stats.POST_STATS_SUFFIX, post_stats.LEGACY_POST_STATS_SUFFIX]:
+            if suffix in input_path:
+                output_path = input_path[:input_path.rindex(suffix)] + post_store.POST_STORE_SUFFIX
+                break
+        else:
+            raise ValueError(f"Cannot derive the store path from {input_path}, pass >>output_path<<!")
+
+    n_posts = post_store.write_post_store(output_path, post_stats.iter_post_stats(input_path))
+    logger.info(f"{n_posts} posts written to {output_path}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,9 @@ import typing
 import click
 import tqdm
 
+import utils.post_stats as post_stats
+import utils.post_store as post_store
+
 logging.basicConfig(level=logging.DEBUG, format='%(message)s')
 logger = logging.getLogger(__name__)
 
@@ -16,8 +19,10 @@ def collect_post_count_to_new_libs_and_pairs(language: str, count_lower_limit: i
     time_buckets = collections.defaultdict(list)
 
 
-    with open(f"data/results/{language}/{language}_{language}_post_stats.json") as in_handle:
-        data = json.load(in_handle)
+    # the post store is much faster to read, if it was written
+    prefix = f"data/results/{language}/{language}_{language}"
+    data = post_stats.iter_post_stats(
+        post_store.find_post_store(prefix) or post_stats.find_post_stats(prefix))
 
     with open(f"data/results/{language}/{language}_libs_count.json") as handle:
         counts = json.load(handle)
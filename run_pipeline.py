@@ -0,0 +1,191 @@
+import glob
+import logging
+import os
+import subprocess
+import sys
+import time
+import typing
+
+import click
+
+import generate_indiv_and_pair_lib_stats as lib_stats_script
+import utils.post_stats as post_stats
+import utils.post_store as post_store
+import utils.stage_cache as stage_cache
+
+logging.basicConfig(level=logging.DEBUG, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+LANGUAGES = [
+    "python", "r", "javascript", "java", "cpp", "php", "ruby", "perl", "rust", "swift",
+    "objectivec", "c#",
+]
+STAGES = ["extract", "stats", "time_history"]
+
+_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+class Stage:
+    """
+    One script run of the pipeline: its command line, the files it reads,
+    the parameters that are not files and the files it writes.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        script: str,
+        args: typing.List[str],
+        inputs: typing.List[str],
+        params: typing.Dict,
+        outputs: typing.List[str],
+    ):
+        self.name = name
+        self.script = script
+        self.args = args
+        # the code is an input as well, any change to it reruns the stage
+        self.inputs = inputs + [os.path.join(_ROOT, script)] + sorted(
+            glob.glob(os.path.join(_ROOT, "utils", "*.py")))
+        self.params = params
+        self.outputs = outputs
+
+    @property
+    def command(self) -> typing.List[str]:
+        return [sys.executable, os.path.join(_ROOT, self.script)] + self.args
+
+
+def language_stages(
+    language: str,
+    results_dir: str,
+    max_year: int,
+    bypass_validation: bool,
+    package_snapshot_dir: typing.Optional[str],
+    engine: str,
+) -> typing.List[Stage]:
+    """
+    The stages of main_runner.sh for a language, in order.
+    """
+    directory = os.path.join(results_dir, language)
+    output_path = os.path.join(directory, language)
+    prefix = f"{output_path}_{language}"
+    store_path = f"{prefix}{post_store.POST_STORE_SUFFIX}"
+
+    extract_args = [
+        "-t", language,
+        "-j", os.path.join(directory, f"all_{language}_so_posts.jsonl"),
+        "-o", output_path,
+        "--max_year", str(max_year),
+        "--write_post_store",
+    ]
+    extract_inputs = [os.path.join(directory, f"all_{language}_so_posts.jsonl")]
+    if bypass_validation:
+        extract_args.append("-x")
+    elif package_snapshot_dir:
+        extract_args += ["--package_snapshot_dir", package_snapshot_dir]
+        extract_inputs.append(package_snapshot_dir)
+
+    return [
+        Stage(
+            "extract", "generate_extracted_import_metadata.py", extract_args, extract_inputs,
+            {"target_language": language, "max_year": max_year, "bypass_validation": bypass_validation},
+            [
+                f"{prefix}{post_stats.POST_STATS_SUFFIX}",
+                store_path,
+                f"{prefix}_daily_post_stats.json",
+                f"{prefix}_code_count_list.json",
+            ],
+        ),
+        Stage(
+            "stats", "generate_indiv_and_pair_lib_stats.py",
+            ["--engine", engine, "-i", store_path, "-o", output_path],
+            [store_path],
+            {"engine": engine},
+            [f"{output_path}_{name}.json" for name in lib_stats_script.OUTPUT_NAMES],
+        ),
+        Stage(
+            "time_history", "generate_new_time_based_history.py",
+            ["-i", store_path, "-o", output_path],
+            [store_path],
+            {},
+            [f"{output_path}_time_based_new.jsonl"],
+        ),
+    ]
+
+
+def run_stages(
+    stages: typing.List[Stage],
+    cache: stage_cache.StageCache,
+    cache_prefix: str,
+    force: bool = False,
+) -> typing.Dict[str, str]:
+    """
+    Runs the stages in order, skipping the ones whose outputs are valid for
+    their inputs and parameters. Returns stage name -> "cached"/"ran".
+    """
+    results = {}
+    for stage in stages:
+        cache_name = f"{cache_prefix}_{stage.name}"
+        key = cache.stage_key(stage.name, stage.inputs, stage.params)
+        if not force and cache.is_valid(cache_name, key, stage.outputs):
+            logger.info(f"{cache_name}: cached, skipped.")
+            results[stage.name] = "cached"
+            continue
+        missing = [path for path in stage.inputs if not os.path.exists(path)]
+        if missing:
+            raise ValueError(f"{cache_name}: missing inputs {missing}!")
+
+        logger.info(f"{cache_name}: running {' '.join(stage.command)}")
+        start = time.monotonic()
+        subprocess.run(stage.command, check=True)
+        cache.record(cache_name, key, stage.outputs)
+        logger.info(f"{cache_name}: done in {time.monotonic() - start:.1f}s.")
+        results[stage.name] = "ran"
+    return results
+
+
+@click.command()
+@click.option("-l", "--language", "languages", type=str, multiple=True, default=LANGUAGES,
+              show_default=True, help="Language to run the pipeline for (repeatable).")
+@click.option("-s", "--stage", "stages", type=click.Choice(STAGES), multiple=True, default=STAGES,
+              show_default=True,
+              help="Stage to run (repeatable); the stages of the other ones are not checked.")
+@click.option("--results_dir", type=str, default="data/results", show_default=True,
+              help="Holds <language>/all_<language>_so_posts.jsonl, the outputs go next to it.")
+@click.option("--max_year", type=int, default=2024, show_default=True)
+@click.option("-x", "--bypass_validation", is_flag=True, show_default=True, default=False,
+              help="Do not validate the packages found.")
+@click.option("--package_snapshot_dir", type=str, default=None,
+              help="Validate against these registry snapshots; they are hashed with the inputs. "
+                   "Live registries are not, a validated extraction is only rerun when its "
+                   "inputs change.")
+@click.option("--engine", type=click.Choice(lib_stats_script.COUNTING_ENGINES), default="numpy",
+              show_default=True)
+@click.option("--cache_dir", type=str, default=None,
+              help="Where the stage records are kept, <results_dir>/.pipeline_cache by default.")
+@click.option("--force", is_flag=True, show_default=True, default=False,
+              help="Run the selected stages even if their outputs are up to date.")
+def main(
+    languages,
+    stages,
+    results_dir,
+    max_year,
+    bypass_validation,
+    package_snapshot_dir,
+    engine,
+    cache_dir,
+    force,
+):
+    cache = stage_cache.StageCache(cache_dir or os.path.join(results_dir, ".pipeline_cache"))
+    for language in languages:
+        logger.info(f"Doing {language}")
+        selected = [
+            stage for stage in language_stages(
+                language, results_dir, max_year, bypass_validation, package_snapshot_dir, engine)
+            if stage.name in stages
+        ]
+        run_stages(selected, cache, language, force)
+    logger.info("DONE")
+
+
+if __name__ == "__main__":
+    main()
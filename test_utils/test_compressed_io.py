@@ -0,0 +1,39 @@
+import pytest
+
+import utils.compressed_io as compressed_io
+
+
+@pytest.mark.parametrize("ext", ["", ".gz", ".bz2", ".xz"])
+def test_output_round_trip(tmp_path, ext):
+    path = str(tmp_path / f"out.jsonl{ext}")
+    lines = [f'{{"id": "{i}", "body": "caf\\u00e9"}}\n' for i in range(1000)]
+    with compressed_io.open_output(path) as handle:
+        for line in lines:
+            handle.write(line)
+
+    with compressed_io.open_input(path) as handle:
+        assert list(handle) == lines
+
+
+def test_background_writer_small_chunks(tmp_path):
+    path = str(tmp_path / "out.txt.gz")
+    with compressed_io.open_output(path) as handle:
+        assert isinstance(handle, compressed_io.BackgroundCompressedWriter)
+        handle.chunk_size = 10
+        for i in range(100):
+            handle.write(f"{i}\n")
+
+    with compressed_io.open_input(path) as handle:
+        assert handle.read() == "".join(f"{i}\n" for i in range(100))
+
+
+@pytest.mark.parametrize(
+    "path,expected",
+    [
+        ("out.jsonl.gz", ("out.jsonl", ".gz")),
+        ("out.jsonl.xz", ("out.jsonl", ".xz")),
+        ("out.jsonl", ("out.jsonl", "")),
+    ],
+)
+def test_split_compression_ext(path, expected):
+    assert compressed_io.split_compression_ext(path) == expected
@@ -0,0 +1,48 @@
+import datetime
+
+import numpy as np
+
+import utils.date_histograms as date_histograms
+import utils.lib_stats as lib_stats
+
+DATES_BY_KEY = {
+    "numpy": [datetime.date(2010, 1, 3), datetime.date(2010, 1, 1), datetime.date(2010, 1, 3)],
+    "os|sys": [datetime.date(2011, 5, 1)],
+    "café": [datetime.date(2010, 2, 1), datetime.date(2010, 1, 31), datetime.date(2012, 1, 1)],
+}
+
+
+def test_histograms_round_trip(tmp_path):
+    path = str(tmp_path / f"libs{date_histograms.HISTOGRAMS_SUFFIX}")
+    date_histograms.write_histograms_from_date_lists(path, DATES_BY_KEY)
+    histograms = date_histograms.DateHistograms(path)
+
+    assert histograms.keys == list(DATES_BY_KEY)
+    days, counts = histograms.daily("numpy")
+    assert days.tolist() == [datetime.date(2010, 1, 1), datetime.date(2010, 1, 3)]
+    assert counts.tolist() == [1, 2]
+    months, counts = histograms.monthly("café")
+    assert months.astype(str).tolist() == ["2010-01", "2010-02", "2012-01"]
+    assert counts.tolist() == [1, 1, 1]
+    assert histograms.totals() == {key: len(dates) for key, dates in DATES_BY_KEY.items()}
+    assert histograms.first_day("os|sys") == np.datetime64("2011-05-01")
+    assert "os" not in histograms
+
+
+def test_numpy_engine_writes_the_same_histograms(tmp_path):
+    payloads = [
+        {"id": "1", "imports": ["os", "sys"], "date": "2010-01-03T00:00:00.000", "poster_id": "1"},
+        {"id": "2", "imports": ["numpy", "os"], "date": "2010-01-01T00:00:00.000", "poster_id": "2"},
+        {"id": "3", "imports": ["sys", "os"], "date": "2010-01-03T12:00:00.000", "poster_id": "1"},
+    ]
+    appearances = lib_stats.Appearances(payloads)
+    appearances.write_date_histograms(str(tmp_path / "numpy"))
+    _, _, _, all_libs_dates, all_pairs_dates, _, _ = lib_stats.Appearances(payloads).to_dicts()
+
+    for kind, dates_by_key in [("libs", all_libs_dates), ("pairs", all_pairs_dates)]:
+        histograms = date_histograms.DateHistograms(
+            str(tmp_path / f"numpy_{kind}{date_histograms.HISTOGRAMS_SUFFIX}"))
+        assert histograms.keys == list(dates_by_key)
+        for key, dates in dates_by_key.items():
+            days, counts = histograms.daily(key)
+            assert np.repeat(days, counts).astype(str).tolist() == sorted(dates)
@@ -1,9 +1,12 @@
 # flake8: noqa501
+import random
 from unittest.mock import patch
 
 import pytest
 
 import utils.extractor as extractor
+import utils.models as models
+import utils.regex_patterns as regex_patterns
 
 
 @pytest.mark.parametrize(
@@ -155,4 +158,134 @@ def test_extract_import_statements_from_single_row_find_valid_ruby(parsed_row, e
             parsed_data=parsed_row,
             target_language="ruby",
         )
-    assert import_list == expected_imports
\ No newline at end of file
+    assert import_list == expected_imports
+
+def _parsed_row(body: str):
+    # Body is the 6th column of models.POSTS_COLS
+    return {"42": ["1", "", "2010-01-01T00:00:00.000", "3", "10", body, "7", "", "<python>", "0", "1", ""]}
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        pytest.param(
+            "<p>What is wrong?</p>\n\n<pre><code>import urllib2\nfrom BeautifulSoup import BeautifulSoup\nsoup = BeautifulSoup(urllib2.urlopen(\"https://www.google.com\"))\nprint soup.title.string\n</code></pre>\n\n<p>Thanks</p>\n",
+            id="single block",
+        ),
+        pytest.param(
+            "<p>First</p>\n\n<pre class=\"lang-py prettyprint-override\"><code>from lxml import etree\nfrom StringIO import StringIO\n\netree.parse(StringIO(html), etree.HTMLParser(recover=False))\n</code></pre>\n\n<p>then</p>\n\n<pre><code>import os,sys\n</code></pre>\n",
+            id="two blocks, empty line, class attribute",
+        ),
+        pytest.param(
+            "<pre><code>require 'rubygems'\nrequire 'scrubyt'\ndata =\n</code></pre>\n\n<pre><code>x = 1 &lt; 2 &amp;&amp; true\n</code></pre>\n",
+            id="adjacent blocks, entities",
+        ),
+        pytest.param(
+            "<p>Use <code>import foo</code> inline, no block here.</p>\n",
+            id="inline code only",
+        ),
+        pytest.param(
+            "<p>Closing brace:</p>\n\n<pre><code>}\n</code></pre>\n\n<p>end</p>\n",
+            id="block without letters",
+        ),
+        pytest.param(
+            "<pre><code>   \n</code></pre>\n\n<pre><code>x\n</code></pre>\n",
+            id="whitespace-only block",
+        ),
+        pytest.param(
+            "<p>First</p>\n\n<pre><code> \n\t\nimport os\n   \nimport sys\n\t\n</code></pre>\n\n<p>end</p>\n",
+            id="whitespace lines around and within a block",
+        ),
+        pytest.param(
+            "<pre><code>import os\n</code></pre>\n\n<pre><code>\t\n \nimport sys\n</code></pre>\n\n<pre><code> \n</code></pre>\n\n<p>end</p>\n",
+            id="adjacent blocks, whitespace lines",
+        ),
+    ],
+)
+def test_html_engine_agrees_with_markdown_engine(body):
+    markdown_post_id, markdown_data = extractor.extract_code_snippets_from_parsed_row(
+        _parsed_row(body), engine="markdown")
+    html_post_id, html_data = extractor.extract_code_snippets_from_parsed_row(
+        _parsed_row(body), engine="html")
+
+    assert html_post_id == markdown_post_id
+    assert html_data == markdown_data
+
+
+def test_html_engine_keeps_fence_lines():
+    body = "<pre><code>```\nimport os\n```\n</code></pre>\n"
+    assert extractor.extract_code_snippets_from_html(body) == ["```\nimport os\n```"]
+
+
+def _classify_line_with_regexes(line: str):
+    return (
+        regex_patterns.code_block_regex.match(line) is not None,
+        regex_patterns.whitespace_line_regex.fullmatch(line) is not None,
+        regex_patterns.snippet_language_regex.fullmatch(line) is not None,
+        regex_patterns.snippet_divider_regex.fullmatch(line) is not None,
+        regex_patterns.inline_code_line_regex.fullmatch(line) is not None,
+    )
+
+
+def test_classify_line_agrees_with_regexes():
+    fragments = [
+        " ", "  ", "    ", "\t", " \t", "\xa0", " ", "\r", "\x1c",
+        "<!--", "<?--", "<!-- ", "-->", "language: lang-js", ">", "<",
+        "`", "``", "```", "code", "<br>", "<br />", "x", "<pre>",
+    ]
+    rnd = random.Random(0)
+    lines = {
+        "".join(rnd.choice(fragments) for _ in range(rnd.randint(1, 5)))
+        for _ in range(20_000)
+    }
+    lines.update([
+        "    import os", "   \timport os", "\timport os", "  x",
+        "<!-- language: lang-js -->", "<?-- -->  ", "<!-- -->",
+        "  `foo` <br/>", "`foo`", "`` ", "   ",
+    ])
+    for line in lines:
+        assert extractor.classify_line(line) == _classify_line_with_regexes(line), repr(line)
+
+
+def test_post_block_joins_lines_like_string_concatenation():
+    block = models.CodeBlock("1")
+    block.append("")
+    assert block.content == "" and block.is_empty()
+    block.append("  ")
+    block.append("")
+    assert block.content == "  \n" and block.is_empty()
+    block.append("x = 1")
+    block.prepend("")
+    assert block.content == "\n  \n\nx = 1" and not block.is_empty()
+
+    block = models.TextBlock("2")
+    block.prepend("}")
+    block.append("text")
+    assert block.content == "}\ntext"
+    assert not hasattr(block, "__dict__")
+
+
+@pytest.mark.parametrize("language", sorted(extractor.IMPORT_EXTRACTORS_BY_LANGUAGE))
+def test_batch_import_extraction_agrees_with_single_snippets(language):
+    snippets = [
+        "import numpy as np\nfrom os import path",
+        "require 'rubygems'\nrequire_once('a/b.php');\ninclude(\"c.php\");",
+        "use std::io;\nuse strict;\nusing System.Text;",
+        "#include <stdio.h>\n#  include \"boost/asio.hpp\"\n#import <Foundation/Foundation.h>",
+        "library(ggplot2)\nrequire(\"dplyr\")\nconst fs = require('fs');",
+        "import java.util.List;\nimport static org.junit.Assert.assertEquals;",
+        "import matlab.io.*\nimport UIKit",
+        "x = 1\nfor i in range(10):\n    print(i)",
+        "",
+    ]
+    expected = [
+        set().union(*(
+            extractor.extract_import_statements_from_code(snippet, language)
+            for snippet in post_snippets
+        ))
+        for post_snippets in [snippets[:3], snippets[3:7], snippets[7:]]
+    ]
+
+    assert extractor.extract_import_statements_from_posts(
+        [snippets[:3], snippets[3:7], snippets[7:]], language) == expected
+    assert any(expected)
@@ -0,0 +1,53 @@
+import pytest
+
+import utils.extractor as extractor
+import utils.import_cache as import_cache
+
+
+def test_cache_evicts_least_recently_used_entries(tmp_path):
+    cache = import_cache.ImportCache(max_entries=2)
+    for snippet in ["import a", "import b"]:
+        key, imports = cache.get("python", snippet)
+        assert imports is None
+        cache.put(key, {snippet.split()[1]})
+    assert cache.get("python", "import a")[1] == {"a"}
+    cache.put(cache.get("python", "import c")[0], {"c"})
+
+    assert cache.get("python", "import b")[1] is None
+    assert cache.get("ruby", "import a")[1] is None
+    assert cache.counters() == {
+        "import cache hits": 1,
+        "import cache misses": 5,
+        "import cache evictions": 1,
+    }
+
+    cache.save(str(tmp_path / "cache.json"))
+    loaded = import_cache.ImportCache.load(str(tmp_path / "cache.json"), max_entries=1)
+    assert len(loaded) == 1
+    assert loaded.get("python", "import c")[1] == {"c"}
+
+
+def test_cached_extraction_returns_the_same_imports():
+    cache = import_cache.ImportCache(record_new=True)
+    snippets = ["import os\nimport sys", "from numpy import array", "x = 1", "import os\nimport sys"]
+
+    first = extractor.extract_import_statements_from_snippets(snippets, "python", cache)
+    second = extractor.extract_import_statements_from_snippets(snippets, "python", cache)
+
+    assert first == second == extractor.extract_import_statements_from_snippets(snippets, "python")
+    # the keyword-less snippet never reaches the cache
+    assert (cache.hits, cache.misses) == (4, 2)
+    assert len(cache.pop_new_entries()) == 2
+
+
+@pytest.mark.parametrize("name", ["cache.json.gz", "cache.json.bz2"])
+def test_compressed_cache_round_trip(tmp_path, name):
+    cache = import_cache.ImportCache(max_entries=10)
+    for snippet in ["import a", "import b"]:
+        cache.put(cache.get("python", snippet)[0], {snippet.split()[1]})
+    cache.save(str(tmp_path / name))
+
+    loaded = import_cache.ImportCache.load(str(tmp_path / name))
+    assert len(loaded) == 2
+    assert loaded.get("python", "import b")[1] == {"b"}
+    assert [path.name for path in tmp_path.iterdir()] == [name]
@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+import utils.compressed_io as compressed_io
+import utils.incremental as incremental
+import utils.models as models
+
+
+def _post(post_id: str, body: str):
+    values = [""] * len(models.POSTS_COLS)
+    values[incremental.BODY_INDEX] = body
+    return {post_id: values}
+
+
+@pytest.mark.parametrize("name", ["manifest.json", "manifest.json.gz"])
+def test_manifest_only_reports_new_or_edited_posts(tmp_path, name):
+    manifest = incremental.PostManifest()
+    assert manifest.observe(_post("1", "import os"))
+    assert manifest.observe(_post("5", "import sys"))
+    manifest.save(str(tmp_path / name))
+
+    manifest = incremental.PostManifest.load(str(tmp_path / name))
+    assert manifest.max_post_id == 5
+    assert not manifest.observe(_post("1", "import os"))
+    assert manifest.observe(_post("5", "import numpy"))
+    assert manifest.observe(_post("3", "retagged, never seen"))
+    assert manifest.observe(_post("9", "import os"))
+    assert manifest.changed_ids == {"3", "5", "9"}
+
+
+def test_merge_payloads_replaces_drops_and_appends():
+    existing = [{"id": "1"}, {"id": "2", "v": 1}, {"id": "3"}]
+    delta = [{"id": "2", "v": 2}, {"id": "4"}]
+
+    merged = incremental.merge_payloads(existing, delta, changed_ids={"2", "3", "4"})
+
+    assert merged == [{"id": "1"}, {"id": "2", "v": 2}, {"id": "4"}]
+
+
+@pytest.mark.parametrize("name", ["posts.jsonl", "posts.jsonl.gz", "posts.jsonl.xz"])
+def test_merge_jsonl_by_id_keeps_the_compression(tmp_path, name):
+    path = str(tmp_path / name)
+    with compressed_io.open_output(path) as handle:
+        for post_id in ["1", "2"]:
+            handle.write(json.dumps(_post(post_id, "old")) + "\n")
+    delta_path = str(tmp_path / "delta.jsonl")
+    with open(delta_path, "w") as handle:
+        for post_id in ["2", "3"]:
+            handle.write(json.dumps(_post(post_id, "new")) + "\n")
+
+    assert incremental.merge_jsonl_by_id(path, [delta_path], path) == {
+        "kept": 1, "replaced": 1, "appended": 1}
+    with compressed_io.open_input(path) as handle:
+        rows = [json.loads(line) for line in handle]
+    assert rows == [_post("1", "old"), _post("2", "new"), _post("3", "new")]
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted([name, "delta.jsonl"])
@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+import utils.jsonl_writer as jsonl_writer
+
+
+def _read_rows(paths):
+    rows = []
+    for path in paths:
+        with open(path) as handle:
+            rows.extend(json.loads(line) for line in handle)
+    return rows
+
+
+def test_writer_keeps_rows_in_order(tmp_path):
+    rows = [{str(i): ["foo", i]} for i in range(25)]
+    with jsonl_writer.JsonlWriter(str(tmp_path / "out.jsonl"), batch_size=4) as writer:
+        for row in rows:
+            writer.write(row)
+
+    assert writer.paths == [str(tmp_path / "out.jsonl")]
+    assert _read_rows(writer.paths) == rows
+
+
+@pytest.mark.parametrize(
+    "limits,expected_shards",
+    [
+        pytest.param({"max_rows_per_file": 10}, 3, id="row limit"),
+        pytest.param({"max_bytes_per_file": 200}, 3, id="byte limit"),
+    ],
+)
+def test_writer_shards_output(tmp_path, limits, expected_shards):
+    # every row serializes to 20 bytes including the newline
+    rows = [{"id": f"{i:07d}"} for i in range(25)]
+    with jsonl_writer.JsonlWriter(str(tmp_path / "out.jsonl"), **limits) as writer:
+        for row in rows:
+            writer.write(row)
+
+    assert len(writer.paths) == expected_shards
+    assert writer.paths[0] == str(tmp_path / "out.00000.jsonl")
+    assert _read_rows(writer.paths) == rows
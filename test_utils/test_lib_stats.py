@@ -0,0 +1,121 @@
+import json
+import random
+
+import click.testing
+import pytest
+
+import generate_indiv_and_pair_lib_stats as lib_stats_script
+import utils.lib_stats as lib_stats
+
+LIBS = ["os", "sys", "numpy", 'we"ird\\name', "café", "a|b", "z"]
+
+
+def _random_payloads(seed: int, n_posts: int):
+    rnd = random.Random(seed)
+    return [
+        {
+            "id": str(post_id),
+            # duplicates and the same day for many posts (ties)
+            "imports": rnd.choices(LIBS, k=rnd.randint(0, 6)),
+            "date": f"20{rnd.randint(10, 12)}-01-0{rnd.randint(1, 3)}T10:00:00.{post_id % 1000:03d}",
+            "poster_id": rnd.choice(["1", "2", None]),
+        }
+        for post_id in range(n_posts)
+    ]
+
+
+def _as_json(results):
+    return [json.dumps(result, default=str) for result in results]
+
+
+@pytest.mark.parametrize("seed, n_posts", [(0, 0), (1, 1), (2, 50), (3, 500)])
+def test_numpy_engine_matches_python_engine(seed, n_posts):
+    payloads = _random_payloads(seed, n_posts)
+    expected = _as_json(
+        lib_stats_script.find_first_appearances_and_count_appearances(payloads, "python"))
+
+    appearances = lib_stats.Appearances(payloads)
+    assert _as_json(appearances.to_dicts()) == expected
+    outputs = appearances.json_outputs()
+    assert [
+        outputs[name] for name in [
+            "libs_count", "pairs_count", "user_to_posts", "all_libs_dates",
+            "all_pairs_dates", "libs_first_dates", "pairs_first_dates",
+        ]
+    ] == expected
+
+
+def test_pair_keys_put_the_lower_name_first():
+    posts = lib_stats.intern_posts([
+        {"id": "1", "imports": ["b", "a", "c"], "date": "2010-01-01T00:00:00.000", "poster_id": "1"},
+    ])
+    keys, post_indices = lib_stats.pair_occurrences(posts)
+
+    assert [lib_stats.pair_names(posts.names, key) for key in keys.tolist()] == ["a|b", "b|c", "a|c"]
+    assert post_indices.tolist() == [0, 0, 0]
+
+
+def test_pairs_rendering_the_same_name_are_one_pair():
+    payloads = [
+        {"id": "1", "imports": ["a|b", "c"], "date": "2010-01-02T00:00:00.000", "poster_id": "1"},
+        {"id": "2", "imports": ["a", "b|c", "a|b"], "date": "2010-01-01T00:00:00.000", "poster_id": "2"},
+    ]
+    expected = _as_json(
+        lib_stats_script.find_first_appearances_and_count_appearances(payloads, "python"))
+    assert json.loads(expected[1]) == {"a|b|c": 2, "a|a|b": 1, "a|b|b|c": 1}
+
+    appearances = lib_stats.Appearances(payloads)
+    assert _as_json(appearances.to_dicts()) == expected
+    outputs = appearances.json_outputs()
+    assert outputs["pairs_count"] == expected[1]
+    assert outputs["pairs_first_dates"] == expected[6]
+
+
+@pytest.mark.parametrize("chunk_size, workers", [(1, 1), (7, 1), (64, 2), (1000, 1)])
+def test_chunked_aggregates_match_single_pass(chunk_size, workers):
+    payloads = _random_payloads(4, 300)
+    expected = _as_json(
+        lib_stats_script.find_first_appearances_and_count_appearances(payloads, "python"))
+
+    aggregate = lib_stats_script.aggregate_in_chunks(payloads, workers, chunk_size)
+
+    assert _as_json(aggregate.to_dicts()) == expected
+    assert aggregate.n_posts == len(payloads)
+
+
+def test_aggregates_merge_only_in_input_order():
+    payloads = _random_payloads(5, 20)
+    first = lib_stats.LibStatsAggregate.from_posts(payloads[:10])
+    second = lib_stats.LibStatsAggregate.from_posts(payloads[10:], first_sequence=10)
+
+    with pytest.raises(ValueError):
+        second.merge(first)
+    assert first.merge(second).n_posts == 20
+
+
+def test_new_posts_merge_into_previous_outputs(tmp_path):
+    payloads = _random_payloads(6, 200)
+    output_path = str(tmp_path / "previous")
+    for name, text in lib_stats.Appearances(payloads[:120]).json_outputs().items():
+        with open(f"{output_path}_{name}.json", "w") as handle:
+            handle.write(text)
+
+    aggregate = lib_stats_script.aggregate_in_chunks(
+        payloads[120:], chunk_size=50,
+        aggregate=lib_stats.LibStatsAggregate.load_outputs(output_path))
+
+    assert aggregate.json_outputs() == lib_stats.Appearances(payloads).json_outputs()
+
+
+@pytest.mark.parametrize("args, exit_code", [
+    (["--workers", "2"], 0),
+    (["--workers", "2", "--engine", "numpy"], 0),
+    (["--workers", "2", "--engine", "python"], 2),
+])
+def test_chunked_mode_refuses_the_python_engine(tmp_path, args, exit_code):
+    input_path = tmp_path / "posts.jsonl"
+    input_path.write_text("".join(json.dumps(payload) + "\n" for payload in _random_payloads(7, 20)))
+    result = click.testing.CliRunner().invoke(
+        lib_stats_script.main, ["-i", str(input_path), "-o", str(tmp_path / "out")] + args)
+    assert result.exit_code == exit_code, result.output
+    assert (tmp_path / "out_libs_count.json").exists() == (exit_code == 0)
@@ -0,0 +1,91 @@
+from unittest.mock import patch
+
+import pytest
+
+import utils.package_snapshot as package_snapshot
+import utils.valid_packages as valid_packages
+
+
+@pytest.fixture(autouse=True)
+def reset_snapshot_dir():
+    before = valid_packages.SNAPSHOT_DIR
+    yield
+    # also drops the snapshots registered by share_live_packages()
+    valid_packages.set_snapshot_dir(before)
+
+
+def test_snapshot_lookups(tmp_path):
+    names = ["numpy", "requests", "a", "zope_interface", "numpy", "", "ünicode"]
+    assert package_snapshot.write_snapshot(str(tmp_path), "python", names) == 5
+
+    snapshot = package_snapshot.PackageSnapshot(str(tmp_path), "python")
+    assert len(snapshot) == 5
+    for name in names[:-3] + ["ünicode"]:
+        assert name in snapshot
+    for name in ["", "num", "numpyx", "zzz", "0", "requests "]:
+        assert name not in snapshot
+    assert list(snapshot.names()) == ["a", "numpy", "requests", "zope_interface", "ünicode"]
+
+
+def test_empty_snapshot(tmp_path):
+    package_snapshot.write_snapshot(str(tmp_path), "c#", [])
+    snapshot = package_snapshot.PackageSnapshot(str(tmp_path), "c#")
+    assert len(snapshot) == 0
+    assert "system" not in snapshot
+
+
+def test_valid_packages_prefers_snapshots(tmp_path):
+    package_snapshot.write_snapshot(str(tmp_path), "rust", ["serde", "tokio"])
+    valid_packages.set_snapshot_dir(str(tmp_path))
+
+    assert "serde" in valid_packages.get_valid_packages("rust")
+    assert "std" not in valid_packages.get_valid_packages("rust")
+    # no snapshot and no registry client
+    assert valid_packages.get_valid_packages("perl") is None
+
+
+def test_bloom_filter_never_rejects_a_package(tmp_path):
+    names = [f"package_{i}" for i in range(5000)]
+    package_snapshot.write_snapshot(str(tmp_path), "python", names)
+    snapshot = package_snapshot.PackageSnapshot(str(tmp_path), "python")
+
+    assert snapshot._bloom is not None
+    assert all(name in snapshot for name in names)
+    assert not any(f"package_{i}x" in snapshot for i in range(5000))
+
+    # a filter written for other names is refused
+    package_snapshot.write_snapshot(str(tmp_path / "other"), "python", names[:10])
+    (tmp_path / "other" / "python.bloom").replace(tmp_path / "python.bloom")
+    with pytest.raises(ValueError):
+        package_snapshot.PackageSnapshot(str(tmp_path), "python")
+
+
+def test_bloom_filter_rejects_most_other_names(tmp_path):
+    package_snapshot.write_snapshot(str(tmp_path), "python", [f"package_{i}" for i in range(5000)])
+    bloom = package_snapshot.PackageSnapshot(str(tmp_path), "python")._bloom
+
+    passed = 0
+    for i in range(10000):
+        word, mask = package_snapshot._bloom_word_and_mask(f"other_{i}".encode(), len(bloom))
+        passed += bloom[word] & mask == mask
+    assert passed < 500
+
+
+def test_bloom_filters_without_the_magic_are_ignored(tmp_path):
+    names = [f"package_{i}" for i in range(100)]
+    package_snapshot.write_snapshot(str(tmp_path), "python", names)
+    # what earlier versions wrote: the number of names, then the words
+    content = (tmp_path / "python.bloom").read_bytes()
+    (tmp_path / "python.bloom").write_bytes(content[len(package_snapshot.BLOOM_MAGIC):])
+
+    snapshot = package_snapshot.PackageSnapshot(str(tmp_path), "python")
+    assert snapshot._bloom is None
+    assert all(name in snapshot for name in names)
+
+
+def test_share_live_packages(tmp_path):
+    with patch("utils.valid_packages.python_get_all_package_names", return_value={"numpy", "six"}):
+        assert valid_packages.share_live_packages("python", str(tmp_path))
+    assert isinstance(valid_packages.get_valid_packages("python"), package_snapshot.PackageSnapshot)
+    assert "six" in valid_packages.get_valid_packages("python")
+    assert not valid_packages.share_live_packages("perl", str(tmp_path))
@@ -0,0 +1,59 @@
+import pytest
+
+import utils.models as models
+import utils.post_filters as post_filters
+
+
+def _values(post_type="1", date="2012-05-01T10:00:00.000", score="3", poster_id="7"):
+    values = [""] * len(models.POSTS_COLS)
+    values[models.POSTS_COLS.index("PostTypeId")] = post_type
+    values[models.POSTS_COLS.index("CreationDate")] = date
+    values[models.POSTS_COLS.index("Score")] = score
+    values[models.POSTS_COLS.index("OwnerUserId")] = poster_id
+    return values
+
+
+@pytest.mark.parametrize(
+    "values, reason",
+    [
+        (_values(), None),
+        (_values(poster_id=""), "no poster id"),
+        (_values(date=""), "no date posted"),
+        (_values(date="2009-05-01T10:00:00.000"), "too old"),
+        (_values(date="2015-01-01T00:00:00.000"), "too new"),
+        (_values(post_type="2"), "other post type"),
+        (_values(score="-1"), "low score"),
+        (_values(score=""), "low score"),
+        (_values(date="n/a"), "bad date"),
+        (_values(date="20"), "bad date"),
+        (_values(score="1.5"), "bad score"),
+        # checked in the order of the extraction's stats
+        (_values(poster_id="", date="2015-01-01T00:00:00.000"), "no poster id"),
+    ],
+)
+def test_rejection_reasons(values, reason):
+    post_filter = post_filters.PostFilter(
+        min_year=2010, max_year=2014, post_types=["1"], min_score=0,
+        require_poster_id=True)
+
+    assert post_filter.rejection_reason_of_values(values) == reason
+
+
+def test_inactive_filter_accepts_everything():
+    post_filter = post_filters.PostFilter()
+
+    assert not post_filter.is_active
+    assert post_filter.rejection_reason_of_values(_values(poster_id="", date="", score="")) is None
+
+
+class _Row:
+    def __init__(self, **attrib):
+        self.attrib = attrib
+
+
+def test_rows_with_a_bad_date_are_counted():
+    post_filter = post_filters.PostFilter(min_year=2010)
+
+    assert not post_filter.accepts_row(_Row(PostTypeId="1", CreationDate="garbage"))
+    assert post_filter.accepts_row(_Row(PostTypeId="1", CreationDate="2012-05-01T10:00:00.000"))
+    assert dict(post_filter.rejected) == {"bad date": 1}
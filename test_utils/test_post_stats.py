@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+import utils.post_stats as post_stats
+
+PAYLOADS = [
+    {"id": "1", "post_type": "1", "imports": ["os", "sys"], "date": "2010-01-01T00:00:00.000",
+     "poster_id": "7", "score": "3"},
+    {"id": "2", "post_type": "2", "imports": ["]", "[,"], "date": "2011-01-01T00:00:00.000",
+     "poster_id": "8", "score": "-1"},
+]
+
+
+@pytest.mark.parametrize("name", ["post_stats.jsonl", "post_stats.jsonl.gz"])
+def test_post_stats_round_trip(tmp_path, name):
+    path = str(tmp_path / name)
+    assert post_stats.write_post_stats(path, iter(PAYLOADS)) == 2
+    assert list(post_stats.iter_post_stats(path)) == PAYLOADS
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+def test_legacy_json_arrays_are_read_lazily(tmp_path, monkeypatch, indent):
+    # items spanning several reads
+    monkeypatch.setattr(post_stats, "_READ_SIZE", 5)
+    path = tmp_path / "post_stats.json"
+    path.write_text("\n" + json.dumps(PAYLOADS * 3, indent=indent))
+
+    assert list(post_stats.iter_post_stats(str(path))) == PAYLOADS * 3
+
+    path.write_text("[]")
+    assert list(post_stats.iter_post_stats(str(path))) == []
+
+    path.write_text(json.dumps(PAYLOADS)[:-3])
+    with pytest.raises(ValueError):
+        list(post_stats.iter_post_stats(str(path)))
+
+
+def test_find_post_stats_prefers_jsonl(tmp_path):
+    prefix = str(tmp_path / "out_python")
+    assert post_stats.find_post_stats(prefix) is None
+    (tmp_path / "out_python_post_stats.json").write_text("[]")
+    assert post_stats.find_post_stats(prefix).endswith("_post_stats.json")
+    (tmp_path / "out_python_post_stats.jsonl").write_text("")
+    assert post_stats.find_post_stats(prefix).endswith("_post_stats.jsonl")
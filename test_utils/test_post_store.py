@@ -0,0 +1,87 @@
+import random
+
+import numpy as np
+import pytest
+
+import generate_new_time_based_history as time_based_history
+import utils.lib_stats as lib_stats
+import utils.post_stats as post_stats
+import utils.post_store as post_store
+
+LIBS = ["os", "sys", "numpy", 'we"ird\\name', "café", "a|b", "z"]
+
+
+def _random_payloads(seed: int, n_posts: int):
+    rnd = random.Random(seed)
+    return [
+        {
+            "id": str(1000 + post_id),
+            "post_type": rnd.choice(["1", "2", None]),
+            "imports": rnd.choices(LIBS, k=rnd.randint(0, 6)),
+            "date": f"19{rnd.randint(60, 99)}-0{rnd.randint(1, 9)}-1{rnd.randint(0, 9)}"
+                    f"T{rnd.randint(10, 23)}:00:00.{post_id % 1000:03d}",
+            "poster_id": rnd.choice(["1", "22", None]),
+            "score": rnd.choice(["0", "-3", "1234", None]),
+        }
+        for post_id in range(n_posts)
+    ]
+
+
+@pytest.mark.parametrize("seed, n_posts", [(0, 0), (1, 1), (2, 300)])
+def test_post_store_round_trip(tmp_path, monkeypatch, seed, n_posts):
+    # several chunks on write and read
+    monkeypatch.setattr(post_store, "_CHUNK_SIZE", 7)
+    payloads = _random_payloads(seed, n_posts)
+    directory = str(tmp_path / f"python_python{post_store.POST_STORE_SUFFIX}")
+    assert post_store.write_post_store(directory, iter(payloads)) == n_posts
+
+    assert post_store.find_post_store(str(tmp_path / "python_python")) == directory
+    store = post_store.PostStore(directory)
+    assert isinstance(store.import_ids, np.memmap)
+    assert list(store.iter_payloads()) == payloads
+    assert list(store.iter_payloads(5, 20)) == payloads[5:20]
+    assert list(post_stats.iter_post_stats(directory)) == payloads
+    assert [store.imports(index) for index in range(len(store))] == [
+        payload["imports"] for payload in payloads]
+    assert store.lib_names == sorted({lib for payload in payloads for lib in payload["imports"]})
+
+
+@pytest.mark.parametrize("seed, n_posts", [(3, 0), (4, 400)])
+def test_interned_store_gives_the_same_outputs(tmp_path, seed, n_posts):
+    payloads = _random_payloads(seed, n_posts)
+    directory = str(tmp_path / "store")
+    post_store.write_post_store(directory, payloads)
+
+    appearances = lib_stats.Appearances.from_interned(post_store.PostStore(directory).interned())
+    assert appearances.json_outputs() == lib_stats.Appearances(payloads).json_outputs()
+
+
+@pytest.mark.parametrize("seed, n_posts", [(8, 0), (9, 200)])
+def test_time_based_history_of_a_store_matches(tmp_path, seed, n_posts):
+    payloads = _random_payloads(seed, n_posts)
+    post_store.write_post_store(str(tmp_path / "store"), payloads)
+    time_based_history.generate_time_based_new_stats(payloads, str(tmp_path / "expected.jsonl"))
+    time_based_history.generate_time_based_new_stats_from_store(
+        post_store.PostStore(str(tmp_path / "store")), str(tmp_path / "actual.jsonl"))
+    assert (tmp_path / "actual.jsonl").read_text() == (tmp_path / "expected.jsonl").read_text()
+
+
+@pytest.mark.parametrize("key, value", [
+    ("id", "0802"), ("id", None), ("score", "1.5"), ("poster_id", 7),
+    ("date", "2010-01-01T00:00:00"), ("date", None),
+])
+def test_payloads_that_would_not_read_back_are_refused(tmp_path, key, value):
+    payload = _random_payloads(5, 1)[0]
+    payload[key] = value
+    with pytest.raises(ValueError):
+        post_store.write_post_store(str(tmp_path / "store"), [payload])
+    assert not (tmp_path / "store").exists()
+
+
+def test_rewriting_replaces_the_store(tmp_path):
+    directory = str(tmp_path / "store")
+    post_store.write_post_store(directory, _random_payloads(6, 30))
+    payloads = _random_payloads(7, 3)
+    post_store.write_post_store(directory, payloads)
+    assert list(post_store.PostStore(directory).iter_payloads()) == payloads
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["store"]
@@ -0,0 +1,94 @@
+import pytest
+
+import run_pipeline
+import utils.stage_cache as stage_cache
+
+EXTRACT_SCRIPT = "generate_extracted_import_metadata.py"
+HISTORY_SCRIPT = "generate_new_time_based_history.py"
+
+
+def test_digests_follow_the_content(tmp_path):
+    cache = stage_cache.StageCache(str(tmp_path / "cache"))
+    (tmp_path / "store").mkdir()
+    (tmp_path / "store" / "ids.npy").write_bytes(b"123")
+    path = tmp_path / "posts.jsonl"
+    path.write_text("a")
+
+    digest, store_digest = cache.digest(str(path)), cache.digest(str(tmp_path / "store"))
+    assert cache.digest(str(tmp_path / "missing")) is None
+    path.write_text("bc")
+    assert cache.digest(str(path)) != digest
+    path.write_text("a")
+    assert cache.digest(str(path)) == digest
+    (tmp_path / "store" / "dates.npy").write_bytes(b"")
+    assert cache.digest(str(tmp_path / "store")) != store_digest
+
+
+def _stages(tmp_path, max_year: int = 2024):
+    posts, stats = str(tmp_path / "posts.jsonl"), str(tmp_path / "stats.json")
+    history = str(tmp_path / "history.jsonl")
+    return [
+        run_pipeline.Stage("extract", EXTRACT_SCRIPT, [], [posts], {"max_year": max_year}, [stats]),
+        run_pipeline.Stage("time_history", HISTORY_SCRIPT, [], [stats], {}, [history]),
+    ]
+
+
+@pytest.fixture
+def fake_scripts(tmp_path, monkeypatch):
+    # the scripts are not run, the stages copy their input to their output
+    runs = []
+
+    def run(command, check):
+        script = command[1].rsplit("/", 1)[-1]
+        runs.append(script)
+        source, target = {
+            EXTRACT_SCRIPT: ("posts.jsonl", "stats.json"),
+            HISTORY_SCRIPT: ("stats.json", "history.jsonl"),
+        }[script]
+        (tmp_path / target).write_text((tmp_path / source).read_text().upper())
+
+    monkeypatch.setattr(run_pipeline.subprocess, "run", run)
+    return runs
+
+
+def test_stages_are_skipped_while_their_inputs_are_unchanged(tmp_path, fake_scripts):
+    (tmp_path / "posts.jsonl").write_text("posts")
+    cache = stage_cache.StageCache(str(tmp_path / "cache"))
+
+    assert run_pipeline.run_stages(_stages(tmp_path), cache, "python") == {
+        "extract": "ran", "time_history": "ran"}
+    assert sorted(path.name for path in (tmp_path / "cache").iterdir()) == [
+        "digests.json", "python_extract.json", "python_time_history.json"]
+    # a new process starts from the saved records
+    cache = stage_cache.StageCache(str(tmp_path / "cache"))
+    assert run_pipeline.run_stages(_stages(tmp_path), cache, "python") == {
+        "extract": "cached", "time_history": "cached"}
+
+    # another parameter reruns the stage; its output is the same, so the next one is kept
+    assert run_pipeline.run_stages(_stages(tmp_path, max_year=2020), cache, "python") == {
+        "extract": "ran", "time_history": "cached"}
+    # as does another input, whose new output reruns the next stage
+    (tmp_path / "posts.jsonl").write_text("more posts")
+    assert run_pipeline.run_stages(_stages(tmp_path, max_year=2020), cache, "python") == {
+        "extract": "ran", "time_history": "ran"}
+    assert fake_scripts == [
+        EXTRACT_SCRIPT, HISTORY_SCRIPT, EXTRACT_SCRIPT, EXTRACT_SCRIPT, HISTORY_SCRIPT]
+
+
+def test_stages_rerun_when_their_outputs_changed(tmp_path, fake_scripts):
+    (tmp_path / "posts.jsonl").write_text("posts")
+    cache = stage_cache.StageCache(str(tmp_path / "cache"))
+    run_pipeline.run_stages(_stages(tmp_path), cache, "python")
+
+    (tmp_path / "history.jsonl").unlink()
+    assert run_pipeline.run_stages(_stages(tmp_path), cache, "python") == {
+        "extract": "cached", "time_history": "ran"}
+    assert run_pipeline.run_stages(_stages(tmp_path), cache, "python", force=True) == {
+        "extract": "ran", "time_history": "ran"}
+
+
+def test_missing_inputs_are_reported(tmp_path, fake_scripts):
+    cache = stage_cache.StageCache(str(tmp_path / "cache"))
+    with pytest.raises(ValueError):
+        run_pipeline.run_stages(_stages(tmp_path), cache, "python")
+    assert fake_scripts == []
@@ -0,0 +1,78 @@
+import utils.tag_index as tag_index
+
+
+def test_tag_set_table_interns_and_caches_language():
+    table = tag_index.TagSetTable()
+    first = table.intern("<python><django>")
+    second = table.intern("<python><ruby>")
+
+    assert table.intern("<python><django>") == first
+    assert len(table) == 2
+    assert table.languages[first] == "python"
+    assert table.languages[second] is None
+
+
+def test_tag_index_resolves_answers_like_the_dict_implementation():
+    questions = [(1, "<python>"), (2, ""), (5, "<ruby>"), (1, "<c++>")]
+    answers = [(3, 1), (4, 2), (6, 5), (7, 99)]
+
+    builder = tag_index.TagIndexBuilder()
+    for post_id, tags in questions:
+        builder.add_question(post_id, tags)
+    for post_id, parent_id in answers:
+        builder.add_answer(post_id, parent_id)
+    index = builder.build()
+
+    # reference: the former dict based posts_to_tags population
+    questions_to_tags = dict(questions)
+    posts_to_tags = dict(questions_to_tags)
+    for answer, question in answers:
+        if questions_to_tags.get(question):
+            posts_to_tags[answer] = questions_to_tags[question]
+
+    for post_id in range(10):
+        tag_set_id = index.lookup(post_id)
+        if post_id in posts_to_tags:
+            assert index.table.tags[tag_set_id] == posts_to_tags[post_id]
+        else:
+            assert tag_set_id == -1
+
+
+def test_merged_builders_equal_single_builder():
+    single = tag_index.TagIndexBuilder()
+    shards = [tag_index.TagIndexBuilder(), tag_index.TagIndexBuilder()]
+    for post_id, tags in [(1, "<r>"), (2, "<perl>"), (3, "<r>")]:
+        single.add_question(post_id, tags)
+        shards[post_id % 2].add_question(post_id, tags)
+    single.add_answer(4, 3)
+    shards[0].add_answer(4, 3)
+
+    merged = tag_index.TagIndexBuilder()
+    for shard in shards:
+        merged.merge(shard)
+    single_index, merged_index = single.build(), merged.build()
+
+    def tags_of(index, post_id):
+        tag_set_id = index.lookup(post_id)
+        return index.table.tags[tag_set_id] if tag_set_id >= 0 else None
+
+    for post_id in range(6):
+        assert tags_of(single_index, post_id) == tags_of(merged_index, post_id)
+
+
+def test_builder_without_answers():
+    builder = tag_index.TagIndexBuilder()
+    builder.add_question(2, "<python>")
+    builder.add_question(1, "<ruby>")
+    index = builder.build()
+
+    assert index.table.tags[index.lookup(1)] == "<ruby>"
+    assert index.table.tags[index.lookup(2)] == "<python>"
+    assert index.lookup(3) == -1
+
+
+def test_empty_builder():
+    index = tag_index.TagIndexBuilder().build()
+
+    assert len(index.post_ids) == 0
+    assert index.lookup(1) == -1
@@ -0,0 +1,248 @@
+import json
+
+import pytest
+
+import utils.checkpoint as checkpoint
+import utils.jsonl_writer as jsonl_writer
+import utils.post_filters as post_filters
+import utils.xml_parser as xml_parser
+
+LANGUAGE_TAGS = ["&lt;python&gt;&lt;django&gt;", "&lt;ruby&gt;", "&lt;c++&gt;", "&lt;python&gt;&lt;ruby&gt;", ""]
+
+
+def _question(post_id: int) -> str:
+    tags = LANGUAGE_TAGS[post_id % len(LANGUAGE_TAGS)]
+    return (
+        f'  <row Id="{post_id}" PostTypeId="1" CreationDate="2008-08-01T10:00:00.{post_id:03d}" '
+        f'Score="{post_id % 7}" Body="&lt;pre&gt;&lt;code&gt;import os&#xA;&lt;/code&gt;&lt;/pre&gt;" '
+        f'OwnerUserId="{post_id % 5}" Tags="{tags}" AnswerCount="1" CommentCount="0" />\n'
+    )
+
+
+def _answer(post_id: int, parent_id: int) -> str:
+    return (
+        f'  <row Id="{post_id}" PostTypeId="2" ParentId="{parent_id}" '
+        f'CreationDate="2008-08-02T10:00:00.000" Score="1" Body="&lt;p&gt;a &amp;amp; b&lt;/p&gt;" '
+        f'OwnerUserId="3" CommentCount="0" />\n'
+    )
+
+
+@pytest.fixture
+def posts_xml(tmp_path):
+    lines = ['<?xml version="1.0" encoding="utf-8"?>\n', "<posts>\n"]
+    for post_id in range(1, 121):
+        if post_id % 3:
+            lines.append(_question(post_id))
+        else:
+            # every fourth answer points to a question further down the file
+            parent_id = post_id + 4 if post_id % 4 == 0 else post_id - 1
+            lines.append(_answer(post_id, parent_id))
+    lines.append("</posts>\n")
+    path = tmp_path / "Posts.xml"
+    path.write_text("".join(lines))
+    return str(path)
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        pytest.param({}, id="two pass"),
+        pytest.param({"single_pass": True}, id="single pass"),
+        pytest.param({"workers": 2}, id="parallel"),
+        pytest.param({"checkpoint_every": 7}, id="checkpointed"),
+    ],
+)
+@pytest.mark.parametrize("post_ids", [range(1, 21), range(0)], ids=["questions only", "no rows"])
+def test_dumps_without_answers(tmp_path, options, post_ids):
+    path = tmp_path / "Posts.xml"
+    path.write_text(
+        '<?xml version="1.0" encoding="utf-8"?>\n<posts>\n' +
+        "".join(_question(post_id) for post_id in post_ids) + "</posts>\n")
+    if "checkpoint_every" in options:
+        options["checkpoints"] = checkpoint.CheckpointDir(str(tmp_path / "checkpoints"))
+
+    output_paths = xml_parser.parse_xml_source_and_generate_output(
+        None, str(path), str(tmp_path / "posts.jsonl"), **options)
+
+    written_ids = sorted(
+        int(next(iter(json.loads(line))))
+        for line in _read(output_paths["python"]).splitlines()
+    )
+    # the questions whose Id is 0 modulo 5 are tagged <python> only
+    assert written_ids == [post_id for post_id in post_ids if post_id % 5 == 0]
+
+
+def _read(paths):
+    content = ""
+    for path in paths:
+        with open(path) as handle:
+            content += handle.read()
+    return content
+
+
+def _write_with(tmp_path, name, parse, *args):
+    writers = {
+        language: jsonl_writer.JsonlWriter(
+            xml_parser.language_output_path(str(tmp_path / name), language))
+        for language in ["python", "ruby", "c++"]
+    }
+    parse(writers, *args)
+    for writer in writers.values():
+        writer.close()
+    return {language: _read(writer.paths) for language, writer in writers.items()}
+
+
+def test_single_pass_writes_the_same_rows_as_two_passes(posts_xml, tmp_path):
+    two_pass = _write_with(
+        tmp_path, "two_pass.jsonl",
+        lambda writers: xml_parser.parse_xml_source_two_pass(posts_xml, writers))
+    single_pass = _write_with(
+        tmp_path, "single_pass.jsonl",
+        lambda writers: xml_parser.parse_xml_source_single_pass(
+            posts_xml, writers, str(tmp_path)))
+
+    # answers 12, 24, ... come before their question, they are resolved at the end
+    early_answers = {
+        next(iter(json.loads(line))) for line in single_pass["python"].splitlines()
+        if int(next(iter(json.loads(line)))) % 12 == 0
+    }
+    assert early_answers
+    for language, content in two_pass.items():
+        assert content
+        assert sorted(single_pass[language].splitlines()) == sorted(content.splitlines())
+    assert single_pass != two_pass
+
+
+def test_split_into_row_ranges_covers_file_on_row_boundaries(posts_xml):
+    ranges = xml_parser.split_into_row_ranges(posts_xml, 9)
+
+    with open(posts_xml, "rb") as handle:
+        content = handle.read()
+    assert ranges[0][0] == 0
+    assert ranges[-1][1] == len(content)
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start
+        assert content[start:].lstrip().startswith(b"<row")
+
+
+@pytest.mark.parametrize("n_shards", [1, 2, 7, 50])
+def test_parallel_output_identical_to_serial(posts_xml, tmp_path, n_shards):
+    serial_paths = xml_parser.parse_xml_source_and_generate_output(
+        None, posts_xml, str(tmp_path / "serial.jsonl"))
+
+    writers = {
+        language: jsonl_writer.JsonlWriter(
+            xml_parser.language_output_path(str(tmp_path / "parallel.jsonl"), language))
+        for language in serial_paths
+    }
+    xml_parser.parse_xml_source_parallel(posts_xml, writers, workers=3, n_shards=n_shards)
+    for writer in writers.values():
+        writer.close()
+
+    assert _read(serial_paths["python"])
+    for language, paths in serial_paths.items():
+        assert _read(writers[language].paths) == _read(paths)
+
+
+def test_parallel_output_identical_to_serial_single_language(posts_xml, tmp_path):
+    serial_paths = xml_parser.parse_xml_source_and_generate_output(
+        "ruby", posts_xml, str(tmp_path / "serial.jsonl"))
+    parallel_paths = xml_parser.parse_xml_source_and_generate_output(
+        "ruby", posts_xml, str(tmp_path / "parallel.jsonl"), workers=2)
+
+    assert _read(parallel_paths["ruby"])
+    assert _read(parallel_paths["ruby"]) == _read(serial_paths["ruby"])
+
+
+@pytest.mark.parametrize(
+    "crash_after_rows",
+    [
+        pytest.param(50, id="crash while linking tags"),
+        pytest.param(170, id="crash while writing rows"),
+    ],
+)
+def test_checkpointed_ingest_resumes_without_duplicates(
+        posts_xml, tmp_path, monkeypatch, crash_after_rows):
+    reference_paths = xml_parser.parse_xml_source_and_generate_output(
+        None, posts_xml, str(tmp_path / "reference.jsonl"))
+
+    iter_rows_with_offsets = xml_parser.iter_rows_with_offsets
+    n_rows = 0
+
+    def crashing_iter_rows_with_offsets(*args, **kwargs):
+        nonlocal n_rows
+        for item in iter_rows_with_offsets(*args, **kwargs):
+            n_rows += 1
+            if n_rows == crash_after_rows:
+                raise KeyboardInterrupt
+            yield item
+
+    checkpoints = checkpoint.CheckpointDir(str(tmp_path / "checkpoints"))
+    output_path = str(tmp_path / "resumed.jsonl")
+    monkeypatch.setattr(
+        xml_parser, "iter_rows_with_offsets", crashing_iter_rows_with_offsets)
+    with pytest.raises(KeyboardInterrupt):
+        xml_parser.parse_xml_source_and_generate_output(
+            None, posts_xml, output_path,
+            checkpoints=checkpoints, checkpoint_every=7)
+
+    monkeypatch.setattr(xml_parser, "iter_rows_with_offsets", iter_rows_with_offsets)
+    resumed_paths = xml_parser.parse_xml_source_and_generate_output(
+        None, posts_xml, output_path,
+        checkpoints=checkpoints, resume=True, checkpoint_every=7)
+
+    assert _read(reference_paths["python"])
+    for language, paths in reference_paths.items():
+        assert _read(resumed_paths[language]) == _read(paths)
+
+
+def test_clearing_checkpoints_keeps_unrelated_files(posts_xml, tmp_path):
+    directory = tmp_path / "outputs"
+    directory.mkdir()
+    (directory / "notes.json").write_text("keep me")
+    (directory / "python.bin").write_bytes(b"keep me")
+    checkpoints = checkpoint.CheckpointDir(str(directory))
+    xml_parser.parse_xml_source_and_generate_output(
+        None, posts_xml, str(directory / "posts.jsonl"),
+        checkpoints=checkpoints, checkpoint_every=7)
+    assert (directory / "xml.json").exists()
+    assert (directory / "index_post_ids.npy").exists()
+
+    checkpoints.clear()
+    assert sorted(path.name for path in directory.iterdir() if "posts" not in path.name) == [
+        "notes.json", "python.bin"]
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        pytest.param({}, id="two pass"),
+        pytest.param({"single_pass": True}, id="single pass"),
+        pytest.param({"workers": 2}, id="parallel"),
+        pytest.param({"checkpoint_every": 7}, id="checkpointed"),
+    ],
+)
+def test_post_filter_drops_rows_before_writing(posts_xml, tmp_path, options):
+    reference_paths = xml_parser.parse_xml_source_and_generate_output(
+        None, posts_xml, str(tmp_path / "reference.jsonl"))
+
+    if "checkpoint_every" in options:
+        options["checkpoints"] = checkpoint.CheckpointDir(str(tmp_path / "checkpoints"))
+    post_filter = post_filters.PostFilter(min_score=3, post_types=["1"])
+    filtered_paths = xml_parser.parse_xml_source_and_generate_output(
+        None, posts_xml, str(tmp_path / "filtered.jsonl"), post_filter=post_filter,
+        **options)
+
+    n_rejected = 0
+    for language, paths in reference_paths.items():
+        expected = []
+        for line in _read(paths).splitlines(keepends=True):
+            values = next(iter(json.loads(line).values()))
+            if post_filters.PostFilter(min_score=3, post_types=["1"]).rejection_reason_of_values(values):
+                n_rejected += 1
+            else:
+                expected.append(line)
+        assert _read(filtered_paths[language]) == "".join(expected)
+    assert n_rejected
+    assert sum(post_filter.rejected.values()) == n_rejected
+    assert set(post_filter.rejected) == {"other post type", "low score"}
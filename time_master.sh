@@ -1,7 +1,3 @@
 #!/bin/bash
-languages=("python" "r" "javascript" "java" "cpp" "php" "ruby" "perl" "rust" "swift" "objectivec" "c#")
-for language in "${languages[@]}"; do
-  echo "Doing $language"
-  python3 generate_new_time_based_history.py -i data/results/${language}/${language}_${language}_post_stats.json -o data/results/${language}/${language}
-  sleep 1
-done
+# the time history stage only, for every language
+python3 run_pipeline.py -x -s time_history "$@"
@@ -0,0 +1,58 @@
+import json
+import os
+import typing
+
+import utils.tag_index as tag_index
+
+# the stages that keep their state in a checkpoint directory
+STAGES = ["xml", "extract"]
+
+
+class CheckpointDir:
+    """
+    Directory holding the checkpoints of a run: one JSON state per stage
+    (e.g. "xml", "extract") plus whatever sidecar files the stages keep
+    next to it. States are replaced atomically, so a crash leaves the last
+    consistent one behind.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def load(self, stage: str) -> typing.Optional[typing.Dict]:
+        path = self.file(f"{stage}.json")
+        if not os.path.exists(path):
+            return None
+        with open(path) as handle:
+            return json.load(handle)
+
+    def save(self, stage: str, state: typing.Dict):
+        path = self.file(f"{stage}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as handle:
+            json.dump(state, handle)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_path, path)
+
+    def clear(self):
+        """
+        Removes the states and sidecar files of a previous run; anything
+        else in the directory is left alone.
+        """
+        names = [f"{stage}.json" for stage in STAGES] + [f"{stage}.json.tmp" for stage in STAGES]
+        for name in names + tag_index.SPILL_FILES + tag_index.INDEX_FILES:
+            if os.path.exists(self.file(name)):
+                os.remove(self.file(name))
+
+
+def truncate(path: str, size: int):
+    """
+    Cuts whatever was written after the checkpoint off the end of a file.
+    """
+    with open(path, "r+b") as handle:
+        handle.truncate(size)
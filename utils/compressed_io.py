@@ -0,0 +1,149 @@
+import bz2
+import gzip
+import lzma
+import os
+import queue
+import threading
+import typing
+
+# file extension -> stdlib codec module (all of them expose the same open())
+CODECS = {
+    ".gz": gzip,
+    ".bz2": bz2,
+    ".xz": lzma,
+}
+
+
+# values accepted by the scripts' --compression option
+COMPRESSION_CHOICES = ["none", "gz", "bz2", "xz"]
+
+
+def compression_suffix(compression: str) -> str:
+    """
+    "gz" -> ".gz", "none" -> ""
+    """
+    return "" if compression == "none" else f".{compression}"
+
+
+def split_compression_ext(path: str) -> typing.Tuple[str, str]:
+    """
+    "out.jsonl.gz" -> ("out.jsonl", ".gz"), "out.jsonl" -> ("out.jsonl", "")
+    """
+    root, ext = os.path.splitext(path)
+    if ext in CODECS:
+        return root, ext
+    return path, ""
+
+
+def tmp_path(path: str) -> str:
+    """
+    Where to write path before renaming it, keeping the compression
+    extension last: "out.jsonl.gz" -> "out.jsonl.tmp.gz"
+    """
+    root, ext = split_compression_ext(path)
+    return f"{root}.tmp{ext}"
+
+
+def is_compressed(path: str) -> bool:
+    return bool(split_compression_ext(path)[1])
+
+
+def open_input(path: str, mode: str = "rt"):
+    """
+    Opens path for reading, decompressing on the fly based on its extension.
+    mode is "rt" (text) or "rb" (binary).
+    """
+    codec = CODECS.get(split_compression_ext(path)[1])
+    if codec is None:
+        return open(path, mode.replace("t", ""))
+    return codec.open(path, mode)
+
+
+def open_output(path: str, mode: str = "w"):
+    """
+    Opens path for writing text. If the extension asks for compression, the
+    compression runs on a background thread (see BackgroundCompressedWriter).
+    """
+    codec = CODECS.get(split_compression_ext(path)[1])
+    if codec is None:
+        return open(path, mode)
+    return BackgroundCompressedWriter(path, codec, mode)
+
+
+class BackgroundCompressedWriter:
+    """
+    Text file-like object that hands its content over to a worker thread,
+    which encodes, compresses and writes it. The stdlib codecs release the
+    GIL while compressing, so this overlaps with the producer (parsing,
+    serializing) instead of stalling it.
+    Small writes are buffered and sent over in chunks of chunk_size chars.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        codec,
+        mode: str = "w",
+        chunk_size: int = 1 << 20,
+        max_pending_chunks: int = 16,
+    ):
+        self.name = path
+        self.chunk_size = chunk_size
+        self._handle = codec.open(path, mode.replace("t", "") + "b")
+        self._buffer = []
+        self._buffer_size = 0
+        self._queue = queue.Queue(maxsize=max_pending_chunks)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self.closed = False
+
+    def _run(self):
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                break
+            if self._error is not None:
+                continue
+            try:
+                self._handle.write(chunk.encode("utf-8"))
+            except Exception as exc:
+                self._error = exc
+
+    def _raise_pending_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def write(self, text: str) -> int:
+        self._raise_pending_error()
+        self._buffer.append(text)
+        self._buffer_size += len(text)
+        if self._buffer_size >= self.chunk_size:
+            self._send_buffer()
+        return len(text)
+
+    def _send_buffer(self):
+        if self._buffer:
+            self._queue.put("".join(self._buffer))
+            self._buffer = []
+            self._buffer_size = 0
+
+    def flush(self):
+        # Only hands the buffer over, the data is on disk after close().
+        self._send_buffer()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._send_buffer()
+        self._queue.put(None)
+        self._thread.join()
+        self._handle.close()
+        self._raise_pending_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
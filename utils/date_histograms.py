@@ -0,0 +1,144 @@
+import datetime
+import os
+import typing
+
+import numpy as np
+
+# <-o>_<libs|pairs> + HISTOGRAMS_SUFFIX, a (zip compressed) .npz holding
+#   key_bytes, key_offsets: the keys (UTF-8, concatenated) and their int64 start offsets + total size
+#   offsets: int64, the histogram of key i is days/counts[offsets[i]:offsets[i + 1]]
+#   days: int32 date ordinals (datetime.date.toordinal()), ascending per key
+#   counts: int32 appearances on that day
+HISTOGRAMS_SUFFIX = "_date_histograms.npz"
+
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+
+def build_histograms(
+    key_indices: np.ndarray, days: np.ndarray, n_keys: int,
+) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Counts the (key index, day ordinal) occurrences, returns offsets, days
+    and counts in the layout of the file.
+    """
+    combined, counts = np.unique(
+        key_indices.astype(np.int64) << 32 | days.astype(np.int64), return_counts=True)
+    offsets = np.zeros(n_keys + 1, dtype=np.int64)
+    np.cumsum(np.bincount(combined >> 32, minlength=n_keys), out=offsets[1:])
+    return offsets, (combined & 0xFFFFFFFF).astype(np.int32), counts.astype(np.int32)
+
+
+def write_histograms(
+    path: str,
+    keys: typing.List[str],
+    key_indices: np.ndarray,
+    days: np.ndarray,
+):
+    """
+    Writes the daily histograms of the occurrences (key_indices[i] into
+    keys, on day ordinal days[i]); keys keep their order.
+    """
+    encoded = [key.encode("utf-8") for key in keys]
+    key_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(key) for key in encoded], out=key_offsets[1:])
+    offsets, histogram_days, counts = build_histograms(key_indices, days, len(keys))
+    # numpy would add the extension to other names
+    tmp_path = f"{path}.tmp.npz"
+    np.savez_compressed(
+        tmp_path,
+        key_bytes=np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        key_offsets=key_offsets,
+        offsets=offsets,
+        days=histogram_days,
+        counts=counts,
+    )
+    os.replace(tmp_path, path)
+
+
+def write_histograms_from_date_lists(
+    path: str,
+    dates_by_key: typing.Dict[str, typing.List[typing.Union[datetime.date, str]]],
+):
+    """
+    write_histograms() for the all_libs_dates/all_pairs_dates dicts, the
+    dates being datetime.date objects or "YYYY-MM-DD" strings.
+    """
+    keys = list(dates_by_key)
+    dates = np.array(
+        [date for dates in dates_by_key.values() for date in dates], dtype="datetime64[D]")
+    write_histograms(
+        path,
+        keys,
+        np.repeat(
+            np.arange(len(keys), dtype=np.int64),
+            [len(dates) for dates in dates_by_key.values()],
+        ),
+        dates.astype(np.int64) + _EPOCH_ORDINAL,
+    )
+
+
+def _to_datetime64(days: np.ndarray) -> np.ndarray:
+    return (days.astype(np.int64) - _EPOCH_ORDINAL).astype("datetime64[D]")
+
+
+class DateHistograms:
+    """
+    Per-key daily appearance counts read from a histograms file; the keys
+    are decoded once, the histograms are slices of the loaded arrays.
+    """
+
+    def __init__(self, path: str):
+        with np.load(path) as arrays:
+            key_bytes = arrays["key_bytes"].tobytes()
+            key_offsets = arrays["key_offsets"].tolist()
+            self.offsets = arrays["offsets"]
+            self.days = arrays["days"]
+            self.counts = arrays["counts"]
+        self.keys = [
+            key_bytes[start:end].decode("utf-8")
+            for start, end in zip(key_offsets, key_offsets[1:])
+        ]
+        self._index = {key: index for index, key in enumerate(self.keys)}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def _slice(self, key: str) -> slice:
+        index = self._index[key]
+        return slice(self.offsets[index], self.offsets[index + 1])
+
+    def daily(self, key: str) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """
+        (days as datetime64[D], appearances on that day) of the key.
+        """
+        rows = self._slice(key)
+        return _to_datetime64(self.days[rows]), self.counts[rows]
+
+    def monthly(self, key: str) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """
+        (months as datetime64[M], appearances in that month) of the key.
+        """
+        days, counts = self.daily(key)
+        months, inverse = np.unique(days.astype("datetime64[M]"), return_inverse=True)
+        monthly_counts = np.bincount(
+            inverse.reshape(-1), weights=counts, minlength=len(months))
+        return months, monthly_counts.astype(np.int64)
+
+    def total(self, key: str) -> int:
+        return int(self.counts[self._slice(key)].sum())
+
+    def totals(self) -> typing.Dict[str, int]:
+        """
+        Key -> number of appearances, in the order of the file.
+        """
+        sums = np.bincount(
+            np.repeat(np.arange(len(self.keys)), np.diff(self.offsets)),
+            weights=self.counts, minlength=len(self.keys),
+        )
+        return dict(zip(self.keys, sums.astype(np.int64).tolist()))
+
+    def first_day(self, key: str) -> np.datetime64:
+        return _to_datetime64(self.days[self._slice(key)][:1])[0]
@@ -7,6 +7,7 @@ import typing
 
 import tqdm
 
+import utils.import_cache as import_cache
 import utils.valid_packages as valid_packages
 import utils.models as models
 import utils.regex_patterns as regex_patterns
@@ -67,9 +68,45 @@ def _revise_post_blocks(post_blocks):
             previous_post_block.append(next_post_block.content)
             marked_for_deletion.add(next_post_block)
 
-    # remove post blocks marked for deletion
-    for current_post_block in marked_for_deletion:
-        post_blocks.remove(current_post_block)
+    # post_blocks is a copy, the caller's list keeps the merged blocks
+    return [
+        post_block for post_block in post_blocks
+        if post_block not in marked_for_deletion
+    ]
+
+
+def classify_line(line: str) -> typing.Tuple[bool, bool, bool, bool, bool]:
+    """
+    Classifies a non-empty line of a post, returns
+    (in_markdown_code_block, is_whitespace_line, is_snippet_language,
+     is_snippet_divider, is_inline_code_line).
+    Same result as matching regex_patterns.code_block_regex,
+    whitespace_line_regex, snippet_language_regex, snippet_divider_regex and
+    inline_code_line_regex, but the regexes only run on the lines whose
+    first characters allow a match.
+    """
+    first = line[0]
+    in_markdown_code_block = first in " \t" and (
+        line.startswith("    ") or line.lstrip(" ").startswith("\t")
+    )
+    is_whitespace_line = line.isspace()
+
+    is_snippet_language = is_snippet_divider = False
+    if first == "<" and line.startswith(("<!--", "<?--")):
+        is_snippet_language = (
+            regex_patterns.snippet_language_regex.fullmatch(line) is not None
+        )
+        is_snippet_divider = (
+            regex_patterns.snippet_divider_regex.fullmatch(line) is not None
+        )
+
+    is_inline_code_line = "`" in line and line.lstrip().startswith("`") and (
+        regex_patterns.inline_code_line_regex.fullmatch(line) is not None
+    )
+    return (
+        in_markdown_code_block, is_whitespace_line, is_snippet_language,
+        is_snippet_divider, is_inline_code_line,
+    )
 
 
 def extract_text_blocks(text, post_id: str):
@@ -110,32 +147,26 @@ def extract_text_blocks(text, post_id: str):
         # check for indented code blocks (Stack Overflow's standard way)
         # even if tab is not listed here: http://stackoverflow.com/editing-help#code
         # we observed cases where it was important to check for the tab, sometimes preceded by spaces
-        in_markdown_code_block = (
-            regex_patterns.code_block_regex.match(line) is not None
-        )  # only match beginning of line
         # check if line only contains whitespaces
         # (ignore whitespaces at the beginning of posts and not end blocks with whitespace lines)
-        is_whitespace_line = (
-            regex_patterns.whitespace_line_regex.fullmatch(line) is not None
-        )  # match whole line
         # e.g. "<!-- language: lang-js -->" (see https://stackoverflow.com/editing-help#syntax-highlighting)
-        is_snippet_language = (
-            regex_patterns.snippet_language_regex.fullmatch(line) is not None
-        )  # match whole line
         # in some posts an empty XML comment ("<!-- -->") is used to divide code blocks (see, e.g., post 33058542)
-        is_snippet_divider = (
-            regex_patterns.snippet_divider_regex.fullmatch(line) is not None
-        )  # match whole line
         # in some cases, there are inline code blocks in a single line (`...`)
-        is_inline_code_line = (
-            regex_patterns.inline_code_line_regex.fullmatch(line) is not None
-        )  # match whole line
+        (
+            in_markdown_code_block,
+            is_whitespace_line,
+            is_snippet_language,
+            is_snippet_divider,
+            is_inline_code_line,
+        ) = classify_line(line)
 
         # if line is not part of a regular Stack Overflow code block, try to detect alternative code block styles
+        # every alternative style is marked by a tag or backticks
         if (
             not in_markdown_code_block
             and not is_whitespace_line
             and not is_snippet_language
+            and ("<" in line or "`" in line)
         ):
             # see https://stackoverflow.blog/2014/09/16/introducing-runnable-javascript-css-and-html-code-snippets/
             # ignore stack snippet begin in post block version
@@ -337,7 +368,60 @@ def extract_text_blocks(text, post_id: str):
     return post_blocks
 
 
-def extract_code_snippets_from_parsed_row(parsed_row: typing.Dict) -> None:
+def extract_code_snippets_from_html(html: str) -> typing.List[str]:
+    """
+    Extracts the content of the <pre><code> blocks of a rendered HTML body in
+    a single scan. The result follows extract_text_blocks:
+      - entities are kept as they are (e.g. "&lt;"),
+      - empty lines are dropped, a snippet starts at its first line with
+        content (whitespace-only lines are kept after it),
+      - blocks only separated by whitespace are merged, whitespace-only
+        blocks are skipped.
+    Unlike extract_text_blocks, indented or fenced Markdown code outside of
+    <pre><code> is not recognized (the dumps render all of it as HTML), and
+    ``` fence lines inside <pre><code> are kept as code.
+    """
+    snippets = []
+    last_end = 0
+    for match in regex_patterns.html_code_block_regex.finditer(html):
+        lines = re.split(regex_patterns.newline_regex, match.group(1))
+        if not lines[0].strip():
+            # the rest of the line of the opening tag
+            lines = lines[1:]
+        lines = [line for line in lines if line]
+        follows_last_snippet = snippets and not html[last_end:match.start()].strip()
+        if not follows_last_snippet:
+            # a snippet starts at its first line with content
+            while lines and not lines[0].strip():
+                lines.pop(0)
+        if lines:
+            if follows_last_snippet:
+                snippets[-1] += "\n" + "\n".join(lines)
+            else:
+                snippets.append("\n".join(lines))
+        elif not follows_last_snippet:
+            continue
+        last_end = match.end()
+    return snippets
+
+
+# values accepted by extract_code_snippets_from_parsed_row(engine=...)
+CODE_EXTRACTION_ENGINES = ["markdown", "html"]
+
+
+def extract_code_snippets(body: str, post_id: str, engine: str = "markdown") -> typing.List[str]:
+    if engine == "html":
+        return extract_code_snippets_from_html(body)
+    if engine != "markdown":
+        raise ValueError(f"Unknown code extraction engine: {engine}")
+    return [
+        x.content
+        for x in extract_text_blocks(body, post_id)
+        if type(x) == models.CodeBlock
+    ]
+
+
+def extract_code_snippets_from_parsed_row(parsed_row: typing.Dict, engine: str = "markdown") -> None:
         post_id, data = list(parsed_row.items())[0]
         return (
             post_id,
@@ -347,11 +431,7 @@ def extract_code_snippets_from_parsed_row(parsed_row: typing.Dict) -> None:
                 "date_posted": data[2],
                 "score": data[3],
                 "view_count": data[4],
-                "code_snippets": [
-                    x.content
-                    for x in extract_text_blocks(data[5], post_id)
-                    if type(x) == models.CodeBlock
-                ],
+                "code_snippets": extract_code_snippets(data[5], post_id, engine),
                 "post_length": len(data[5]),
                 "poster_id": data[6],
                 "last_activity": data[7],
@@ -366,27 +446,62 @@ def extract_code_snippets_from_parsed_row(parsed_row: typing.Dict) -> None:
 
 
 def extract_import_statements_from_code(code: str, target_language: str) -> typing.List[str]:
-    language_specific_extractor = {
-        "python": extract_python_import_statements_from_code,
-        "php": extract_php_import_statements_from_code,
-        "ruby": extract_ruby_import_statements_from_code,
-        "rust": extract_rust_import_statements_from_code,
-        "javascript": extract_javascript_import_statements_from_code,
-        "java": extract_java_import_statements_from_code,
-        "c": extract_c_import_statements_from_code,
-        "r": extract_r_import_statements_from_code,
-        "cpp": extract_cpp_import_statements_from_code,
-        "perl": extract_perl_import_statements_from_code,
-        "swift": extract_swift_import_statements_from_code,
-        "matlab": extract_matlab_import_statements_from_code,
-        "objectivec": extract_objectivec_import_statements_from_code,
-        "c#": extract_c_sharp_import_statements_from_code,
-    }.get(target_language)
+    language_specific_extractor = IMPORT_EXTRACTORS_BY_LANGUAGE.get(target_language)
     if not language_specific_extractor:
         raise Exception("Language import extract is not supported, missing function!")
     return language_specific_extractor(code)
 
 
+def extract_import_statements_from_snippets(
+        snippets: typing.Iterable[str],
+        target_language: str,
+        cache: typing.Optional[import_cache.ImportCache] = None) -> typing.Set[str]:
+    """
+    Union of extract_import_statements_from_code() over the snippets of a
+    post. Snippets without any of the language's import keywords are
+    skipped without running its regex, the others are looked up in the
+    cache first if one is given.
+    """
+    language_specific_extractor = IMPORT_EXTRACTORS_BY_LANGUAGE.get(target_language)
+    if not language_specific_extractor:
+        raise Exception("Language import extract is not supported, missing function!")
+    keywords = regex_patterns.import_keywords_by_language[target_language]
+
+    libs = set()
+    for cs in snippets:
+        for keyword in keywords:
+            if keyword in cs:
+                break
+        else:
+            continue
+        if cache is not None:
+            key, cached = cache.get(target_language, cs)
+            if cached is not None:
+                libs |= cached
+                continue
+        try:
+            imports = language_specific_extractor(cs)
+        except Exception as exc:
+            logger.error(f"Exception at code extraction with cs:{cs}, exc: {exc}")
+            continue
+        if cache is not None:
+            cache.put(key, imports)
+        libs |= imports
+    return libs
+
+
+def extract_import_statements_from_posts(
+        snippets_by_post: typing.Iterable[typing.Iterable[str]],
+        target_language: str) -> typing.List[typing.Set[str]]:
+    """
+    extract_import_statements_from_snippets() for many posts of a language.
+    """
+    return [
+        extract_import_statements_from_snippets(snippets, target_language)
+        for snippets in snippets_by_post
+    ]
+
+
 def extract_python_import_statements_from_code(code: str) -> typing.List[str]:
     import_statements = set()
 
@@ -544,17 +659,36 @@ def extract_c_sharp_import_statements_from_code(code:str) -> typing.List[str]:
     return import_statements
 
 
+IMPORT_EXTRACTORS_BY_LANGUAGE = {
+    "python": extract_python_import_statements_from_code,
+    "php": extract_php_import_statements_from_code,
+    "ruby": extract_ruby_import_statements_from_code,
+    "rust": extract_rust_import_statements_from_code,
+    "javascript": extract_javascript_import_statements_from_code,
+    "java": extract_java_import_statements_from_code,
+    "c": extract_c_import_statements_from_code,
+    "r": extract_r_import_statements_from_code,
+    "cpp": extract_cpp_import_statements_from_code,
+    "perl": extract_perl_import_statements_from_code,
+    "swift": extract_swift_import_statements_from_code,
+    "matlab": extract_matlab_import_statements_from_code,
+    "objectivec": extract_objectivec_import_statements_from_code,
+    "c#": extract_c_sharp_import_statements_from_code,
+}
+
+
 def extract_import_statements_from_single_row(
         post_id: str,
         parsed_data: typing.Dict,
         target_language: str,
-        bypass_validation: bool):
-    libs = set()
-    for cs in parsed_data["code_snippets"]:
-        try:
-            libs |= extract_import_statements_from_code(cs, target_language)
-        except Exception as exc:
-            logger.error(f"Exception at code extraction with cs:{cs}, exc: {exc}")
+        bypass_validation: bool,
+        cache: typing.Optional[import_cache.ImportCache] = None):
+    try:
+        libs = extract_import_statements_from_snippets(
+            parsed_data["code_snippets"], target_language, cache)
+    except Exception as exc:
+        logger.error(f"Exception at code extraction of post {post_id}, exc: {exc}")
+        libs = set()
 
     if bypass_validation:
         return (
@@ -0,0 +1,101 @@
+import collections
+import hashlib
+import json
+import logging
+import os
+import typing
+
+import utils.compressed_io as compressed_io
+
+logger = logging.getLogger(__name__)
+
+
+def snippet_key(language: str, snippet: str) -> bytes:
+    return hashlib.blake2b(
+        f"{language}\0{snippet}".encode("utf-8"), digest_size=16).digest()
+
+
+class ImportCache:
+    """
+    Bounded LRU map (language, snippet) -> imports found in the snippet,
+    keyed by a hash of both. Holds the imports before validation, so the
+    entries do not depend on the settings of the run (max_year, validation).
+
+    If record_new is set, the entries added since the last pop_new_entries()
+    are remembered (e.g. to send them from a worker to the main process).
+    """
+
+    def __init__(self, max_entries: int = 100_000, record_new: bool = False):
+        self.max_entries = max_entries
+        self.record_new = record_new
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+        self._new_entries = []
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, language: str, snippet: str) -> typing.Tuple[bytes, typing.Optional[typing.FrozenSet[str]]]:
+        """
+        Returns the key of the snippet and its imports, None if not cached.
+        """
+        key = snippet_key(language, snippet)
+        imports = self._entries.get(key)
+        if imports is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        return key, imports
+
+    def put(self, key: bytes, imports: typing.Iterable[str]):
+        imports = frozenset(imports)
+        self._entries[key] = imports
+        self._entries.move_to_end(key)
+        if self.record_new:
+            self._new_entries.append((key, imports))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def pop_new_entries(self) -> typing.List[typing.Tuple[bytes, typing.FrozenSet[str]]]:
+        new_entries, self._new_entries = self._new_entries, []
+        return new_entries
+
+    def update(self, entries: typing.Iterable[typing.Tuple[bytes, typing.FrozenSet[str]]]):
+        for key, imports in entries:
+            self.put(key, imports)
+
+    def counters(self) -> typing.Dict[str, int]:
+        return {
+            "import cache hits": self.hits,
+            "import cache misses": self.misses,
+            "import cache evictions": self.evictions,
+        }
+
+    @classmethod
+    def load(cls, path: str, max_entries: int = 100_000, record_new: bool = False) -> "ImportCache":
+        cache = cls(max_entries, record_new)
+        if not os.path.exists(path):
+            logger.info(f"No import cache at {path}, starting with an empty one.")
+            return cache
+        with compressed_io.open_input(path) as handle:
+            entries = json.load(handle)["entries"]
+        # least recently used first, only the most recent ones fit
+        for key, imports in entries[-max_entries:]:
+            cache._entries[bytes.fromhex(key)] = frozenset(imports)
+        return cache
+
+    def save(self, path: str):
+        tmp_path = compressed_io.tmp_path(path)
+        with compressed_io.open_output(tmp_path) as handle:
+            json.dump(
+                {"entries": [
+                    [key.hex(), sorted(imports)]
+                    for key, imports in self._entries.items()
+                ]},
+                handle,
+            )
+        os.replace(tmp_path, path)
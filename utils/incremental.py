@@ -0,0 +1,125 @@
+import hashlib
+import json
+import logging
+import os
+import typing
+
+import utils.compressed_io as compressed_io
+import utils.models as models
+
+logger = logging.getLogger(__name__)
+
+BODY_INDEX = models.POSTS_COLS.index("Body")
+
+
+def body_hash(body: str) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(body.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class PostManifest:
+    """
+    Remembers what a previous run extracted: the largest post Id and a hash
+    of the Body of every curated post. observe() tells whether a curated row
+    is new or edited since then, and records it for the next run.
+    """
+
+    def __init__(
+        self,
+        max_post_id: int = 0,
+        body_hashes: typing.Optional[typing.Dict[str, int]] = None,
+    ):
+        self.max_post_id = max_post_id
+        self.body_hashes = body_hashes or {}
+        self.changed_ids = set()
+        self._previous_max_post_id = max_post_id
+
+    @classmethod
+    def load(cls, path: str) -> "PostManifest":
+        if not os.path.exists(path):
+            logger.info(f"No manifest at {path}, every post counts as new.")
+            return cls()
+        with compressed_io.open_input(path) as handle:
+            content = json.load(handle)
+        return cls(content["max_post_id"], content["body_hashes"])
+
+    def save(self, path: str):
+        tmp_path = compressed_io.tmp_path(path)
+        with compressed_io.open_output(tmp_path) as handle:
+            json.dump(
+                {"max_post_id": self.max_post_id, "body_hashes": self.body_hashes},
+                handle,
+            )
+        os.replace(tmp_path, path)
+
+    def observe(self, post_dict: typing.Dict) -> bool:
+        """
+        post_dict is a curated row ({post_id: [POSTS_COLS values]}).
+        Returns True if the post is new or its Body changed.
+        """
+        post_id, values = next(iter(post_dict.items()))
+        digest = body_hash(values[BODY_INDEX])
+        numeric_id = int(post_id)
+        changed = (
+            numeric_id > self._previous_max_post_id or
+            self.body_hashes.get(post_id) != digest
+        )
+        if changed:
+            self.body_hashes[post_id] = digest
+            self.changed_ids.add(post_id)
+            self.max_post_id = max(self.max_post_id, numeric_id)
+        return changed
+
+
+def merge_jsonl_by_id(
+    base_path: str, delta_paths: typing.List[str], output_path: str
+) -> typing.Dict[str, int]:
+    """
+    Merges curated delta rows into a full curated JSONL: rows of the base
+    whose Id is in the delta are replaced in place, the other delta rows are
+    appended. base_path and output_path may be the same file.
+    """
+    delta = {}
+    for path in delta_paths:
+        with compressed_io.open_input(path) as handle:
+            for line in handle:
+                delta[next(iter(json.loads(line)))] = line
+
+    stats = {"kept": 0, "replaced": 0, "appended": 0}
+    tmp_path = compressed_io.tmp_path(output_path)
+    with compressed_io.open_output(tmp_path) as out_handle:
+        if os.path.exists(base_path):
+            with compressed_io.open_input(base_path) as in_handle:
+                for line in in_handle:
+                    post_id = next(iter(json.loads(line)))
+                    if post_id in delta:
+                        out_handle.write(delta.pop(post_id))
+                        stats["replaced"] += 1
+                    else:
+                        out_handle.write(line)
+                        stats["kept"] += 1
+        for line in delta.values():
+            out_handle.write(line)
+            stats["appended"] += 1
+    os.replace(tmp_path, output_path)
+    return stats
+
+
+def merge_payloads(
+    existing_payloads: typing.List[typing.Dict],
+    delta_payloads: typing.List[typing.Dict],
+    changed_ids: typing.Set[str],
+) -> typing.List[typing.Dict]:
+    """
+    Replaces the payloads of re-extracted posts. A changed post that no
+    longer yields a payload (e.g. its imports were edited out) is dropped.
+    """
+    delta = {payload["id"]: payload for payload in delta_payloads}
+    merged = []
+    for payload in existing_payloads:
+        if payload["id"] not in changed_ids:
+            merged.append(payload)
+        elif payload["id"] in delta:
+            merged.append(delta.pop(payload["id"]))
+    merged.extend(delta.values())
+    return merged
@@ -0,0 +1,190 @@
+import json
+import os
+import typing
+
+import utils.checkpoint as checkpoint
+import utils.compressed_io as compressed_io
+
+
+class JsonlWriter:
+    """
+    Keeps the output open for the whole run and writes JSON lines in batches.
+    Rows are serialized as they come in and flushed to disk once the buffer
+    holds batch_size rows or flush_bytes characters.
+
+    If max_rows_per_file or max_bytes_per_file is set, the output is sharded:
+    <root>.00000<ext>, <root>.00001<ext>, ... are written instead of
+    output_path, each shard holding at most the given amount of rows/bytes
+    (a single row larger than max_bytes_per_file still gets its own shard).
+    If row_filter is given, only the rows it returns True for are written.
+
+    Limits apply to the uncompressed content; a compression extension
+    (.gz, .bz2, .xz) is kept at the end: <root>.00000<ext>.gz
+    """
+
+    def __init__(
+        self,
+        output_path: str,
+        batch_size: int = 1000,
+        flush_bytes: int = 1 << 20,
+        max_rows_per_file: typing.Optional[int] = None,
+        max_bytes_per_file: typing.Optional[int] = None,
+        mode: str = "a",
+        row_filter: typing.Optional[typing.Callable[[typing.Any], bool]] = None,
+    ):
+        self.output_path = output_path
+        self.batch_size = batch_size
+        self.flush_bytes = flush_bytes
+        self.max_rows_per_file = max_rows_per_file
+        self.max_bytes_per_file = max_bytes_per_file
+        self.mode = mode
+        self.row_filter = row_filter
+
+        self.paths = []
+        self.n_rows = 0
+        self.n_filtered = 0
+        self.n_bytes = 0
+
+        self._handle = None
+        self._buffer = []
+        self._buffer_bytes = 0
+        self._file_rows = 0
+        self._file_bytes = 0
+
+    @property
+    def is_sharded(self) -> bool:
+        return bool(self.max_rows_per_file or self.max_bytes_per_file)
+
+    def _shard_path(self, index: int) -> str:
+        path, compression_ext = compressed_io.split_compression_ext(self.output_path)
+        root, ext = os.path.splitext(path)
+        return f"{root}.{index:05d}{ext}{compression_ext}"
+
+    def _open_next_file(self):
+        self._close_file()
+        path = (
+            self._shard_path(len(self.paths))
+            if self.is_sharded else self.output_path
+        )
+        self._handle = compressed_io.open_output(path, self.mode)
+        self.paths.append(path)
+        self._file_rows = 0
+        self._file_bytes = 0
+
+    def _close_file(self):
+        if self._handle is not None:
+            self.flush()
+            self._handle.close()
+            self._handle = None
+
+    def _is_file_full(self, line_bytes: int) -> bool:
+        if not self._file_rows:
+            return False
+        if self.max_rows_per_file and self._file_rows >= self.max_rows_per_file:
+            return True
+        if (
+            self.max_bytes_per_file and
+            self._file_bytes + line_bytes > self.max_bytes_per_file
+        ):
+            return True
+        return False
+
+    def write(self, row: typing.Any):
+        if self.row_filter is not None and not self.row_filter(row):
+            self.n_filtered += 1
+            return
+        self._write_line(json.dumps(row) + "\n")
+
+    def write_serialized(self, line: str):
+        """
+        Writes an already serialized, newline-terminated JSON line.
+        """
+        if self.row_filter is not None and not self.row_filter(json.loads(line)):
+            self.n_filtered += 1
+            return
+        self._write_line(line)
+
+    def _write_line(self, line: str):
+        # json.dumps escapes non-ASCII by default, so len() is the byte count
+        line_bytes = len(line)
+
+        if self._handle is None or self._is_file_full(line_bytes):
+            self._open_next_file()
+
+        self._buffer.append(line)
+        self._buffer_bytes += line_bytes
+        self._file_rows += 1
+        self._file_bytes += line_bytes
+        self.n_rows += 1
+        self.n_bytes += line_bytes
+
+        if (
+            len(self._buffer) >= self.batch_size or
+            self._buffer_bytes >= self.flush_bytes
+        ):
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self._handle.write("".join(self._buffer))
+            self._buffer = []
+            self._buffer_bytes = 0
+        if self._handle is not None:
+            self._handle.flush()
+
+    def checkpoint_state(self) -> typing.Dict:
+        """
+        Flushes everything to disk and returns what restore() needs to
+        continue from this very point after a crash.
+        """
+        if compressed_io.is_compressed(self.output_path):
+            raise ValueError("Compressed outputs cannot be checkpointed!")
+        if self._handle is None:
+            # open now so that the recorded offset covers what the file
+            # already contained before the run (append mode)
+            self._open_next_file()
+        self.flush()
+        os.fsync(self._handle.fileno())
+        offset = os.fstat(self._handle.fileno()).st_size
+        return {
+            "paths": list(self.paths),
+            "offset": offset,
+            "n_rows": self.n_rows,
+            "n_filtered": self.n_filtered,
+            "n_bytes": self.n_bytes,
+            "file_rows": self._file_rows,
+            "file_bytes": self._file_bytes,
+        }
+
+    def restore(self, state: typing.Dict):
+        """
+        Drops everything written after checkpoint_state() returned state and
+        reopens the output where it left off.
+        """
+        self._close_file()
+        self.paths = list(state["paths"])
+        self.n_rows = state["n_rows"]
+        self.n_filtered = state["n_filtered"]
+        self.n_bytes = state["n_bytes"]
+        checkpoint.truncate(self.paths[-1], state["offset"])
+        self._handle = open(self.paths[-1], "a")
+        self._file_rows = state["file_rows"]
+        self._file_bytes = state["file_bytes"]
+        if self.is_sharded:
+            # shards opened after the checkpoint would be appended to otherwise
+            index = len(self.paths)
+            while os.path.exists(self._shard_path(index)):
+                os.remove(self._shard_path(index))
+                index += 1
+
+    def close(self):
+        if self._handle is None and not self.paths:
+            # Nothing was written, still leave an (empty) output behind.
+            self._open_next_file()
+        self._close_file()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,494 @@
+import array
+import collections
+import datetime
+import json
+import os
+import typing
+
+import numpy as np
+
+import utils.compressed_io as compressed_io
+import utils.date_histograms as date_histograms
+
+
+class InternedPosts:
+    """
+    The posts of a post stats file in columns: the imports of post i are
+    lib_ids[offsets[i]:offsets[i + 1]], ids into names (sorted, so a lower
+    id is a lower name), days are date ordinals.
+    """
+
+    def __init__(
+        self,
+        names: typing.List[str],
+        lib_ids: np.ndarray,
+        offsets: np.ndarray,
+        days: np.ndarray,
+        post_ids: typing.List,
+        poster_ids: typing.List,
+    ):
+        self.names = names
+        self.lib_ids = lib_ids
+        self.offsets = offsets
+        self.days = days
+        self.post_ids = post_ids
+        self.poster_ids = poster_ids
+
+    def __len__(self):
+        return len(self.days)
+
+
+def intern_posts(
+    data: typing.Iterable[typing.Dict],
+    user_to_posts: typing.Optional[typing.Dict[typing.Any, typing.List]] = None,
+) -> InternedPosts:
+    """
+    Reads the payloads once; if given, user_to_posts is filled on the way.
+    """
+    first_seen_ids = {}
+    lib_ids = array.array("i")
+    offsets = array.array("q", [0])
+    days = array.array("i")
+    post_ids = []
+    poster_ids = []
+    # the dates of a corpus fall on a few thousand days
+    day_ordinals = {}
+
+    for row in data:
+        date = row.get("date")[:10]
+        day = day_ordinals.get(date)
+        if day is None:
+            day = day_ordinals[date] = datetime.date.fromisoformat(date).toordinal()
+        if user_to_posts is not None:
+            user_to_posts[row["poster_id"]].append(row["id"])
+        days.append(day)
+        post_ids.append(row["id"])
+        poster_ids.append(row["poster_id"])
+        lib_ids.extend([
+            first_seen_ids.setdefault(package, len(first_seen_ids))
+            for package in row.get("imports")
+        ])
+        offsets.append(len(lib_ids))
+
+    names = sorted(first_seen_ids)
+    sorted_ids = np.empty(len(names), dtype=np.int32)
+    sorted_ids[np.fromiter(
+        (first_seen_ids[name] for name in names), dtype=np.int32, count=len(names)
+    )] = np.arange(len(names), dtype=np.int32)
+    return InternedPosts(
+        names,
+        sorted_ids[np.frombuffer(lib_ids, dtype=np.int32)],
+        np.frombuffer(offsets, dtype=np.int64),
+        np.frombuffer(days, dtype=np.int32),
+        post_ids,
+        poster_ids,
+    )
+
+
+def lib_occurrences(posts: InternedPosts) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """
+    (lib id, post index) of every import, in input order.
+    """
+    return posts.lib_ids.astype(np.int64), np.repeat(
+        np.arange(len(posts), dtype=np.int64), np.diff(posts.offsets))
+
+
+def pair_key(low_ids: np.ndarray, high_ids: np.ndarray) -> np.ndarray:
+    return low_ids.astype(np.int64) << 32 | high_ids.astype(np.int64)
+
+
+def pair_names(names: typing.List[str], key: int) -> str:
+    return f"{names[key >> 32]}|{names[key & 0xFFFFFFFF]}"
+
+
+def pair_occurrences(posts: InternedPosts) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """
+    (pair key, post index) of every import pair, in the order of
+    itertools.combinations over each post's imports. The key holds the
+    lower lib id in its high 32 bits.
+    """
+    n_imports = np.diff(posts.offsets)
+    n_pairs = n_imports * (n_imports - 1) // 2
+    # the pairs of post i start at pair_starts[i]
+    pair_starts = np.concatenate([[0], np.cumsum(n_pairs)])
+    keys = np.empty(pair_starts[-1], dtype=np.int64)
+    post_indices = np.empty(pair_starts[-1], dtype=np.int64)
+
+    # posts with the same number of imports share the combinations' indices
+    for size in np.unique(n_imports[n_imports > 1]):
+        indices = np.flatnonzero(n_imports == size)
+        first, second = np.triu_indices(size, 1)
+        starts = posts.offsets[indices][:, None]
+        first_ids = posts.lib_ids[starts + first]
+        second_ids = posts.lib_ids[starts + second]
+        positions = (pair_starts[indices][:, None] + np.arange(len(first))).ravel()
+        keys[positions] = pair_key(
+            np.minimum(first_ids, second_ids), np.maximum(first_ids, second_ids)).ravel()
+        post_indices[positions] = np.repeat(indices, len(first))
+    return _merge_colliding_pair_keys(posts.names, keys), post_indices
+
+
+def _merge_colliding_pair_keys(names: typing.List[str], keys: np.ndarray) -> np.ndarray:
+    """
+    The python engine keys a pair by its joined names, so pairs of names
+    holding "|" can be the same pair to it ("a|b" + "c" and "a" + "b|c");
+    such keys are replaced by a single key per rendered name.
+    """
+    piped_ids = np.array([index for index, name in enumerate(names) if "|" in name], dtype=np.int64)
+    if not len(piped_ids):
+        return keys
+    # a pair without a piped name renders a single "|", it cannot collide
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    piped = np.isin(unique_keys >> 32, piped_ids) | np.isin(unique_keys & 0xFFFFFFFF, piped_ids)
+    canonical_keys = {}
+    merged_keys = unique_keys.copy()
+    merged_keys[piped] = [
+        canonical_keys.setdefault(pair_names(names, key), key)
+        for key in unique_keys[piped].tolist()
+    ]
+    return merged_keys[inverse.reshape(-1)]
+
+
+class KeyStats:
+    """
+    Per-key summary of occurrences, keys in order of first occurrence (the
+    key order of the python engine's dicts): the count, the post of the
+    first occurrence on the earliest day and the posts of every occurrence,
+    grouped by key (group i is grouped_posts[group_starts[i]:][:counts[i]]),
+    in input order.
+    """
+
+    def __init__(self, keys: np.ndarray, post_indices: np.ndarray, days: np.ndarray):
+        unique_keys, first_occurrences, inverse, counts = np.unique(
+            keys, return_index=True, return_inverse=True, return_counts=True)
+        order = np.argsort(first_occurrences, kind="stable")
+        ranks = np.empty(len(order), dtype=np.int64)
+        ranks[order] = np.arange(len(order))
+        occurrence_ranks = ranks[inverse.reshape(-1)]
+
+        self.keys = unique_keys[order]
+        self.counts = counts[order]
+        self.group_starts = np.cumsum(self.counts) - self.counts
+        self.grouped_posts = post_indices[np.argsort(occurrence_ranks, kind="stable")]
+        # by key, then day, then input order
+        self.first_posts = post_indices[
+            np.lexsort((days[post_indices], occurrence_ranks))[self.group_starts]]
+
+
+def post_dates(posts: InternedPosts) -> np.ndarray:
+    """
+    The day of every post as "YYYY-MM-DD" (an object array sharing one
+    string per day).
+    """
+    days, inverse = np.unique(posts.days, return_inverse=True)
+    dates = np.empty(len(days), dtype=object)
+    dates[:] = [datetime.date.fromordinal(day).isoformat() for day in days.tolist()]
+    return dates[inverse.reshape(-1)]
+
+
+def _object_array(values: typing.List) -> np.ndarray:
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def _json_object(encoded_keys: np.ndarray, encoded_values: np.ndarray) -> str:
+    # what json.dumps writes for a dict with these keys and values
+    return "{" + ", ".join((encoded_keys + ": " + encoded_values).tolist()) + "}"
+
+
+class Appearances:
+    """
+    Lib and pair statistics of the posts; to_dicts() returns them as the
+    python engine does, json_outputs() renders the output files' content
+    straight from the arrays (the object arrays of strings are joined
+    element-wise, no dict is built per key).
+    """
+
+    def __init__(self, data: typing.Iterable[typing.Dict]):
+        self.user_to_posts = collections.defaultdict(list)
+        self._count(intern_posts(data, self.user_to_posts))
+
+    @classmethod
+    def from_interned(cls, posts: InternedPosts) -> "Appearances":
+        """
+        The statistics of posts that are already interned (e.g. read from a
+        post store).
+        """
+        appearances = cls.__new__(cls)
+        appearances.user_to_posts = collections.defaultdict(list)
+        for poster_id, post_id in zip(posts.poster_ids, posts.post_ids):
+            appearances.user_to_posts[poster_id].append(post_id)
+        appearances._count(posts)
+        return appearances
+
+    def _count(self, posts: InternedPosts):
+        self.posts = posts
+        self.libs = KeyStats(*lib_occurrences(self.posts), self.posts.days)
+        self.pairs = KeyStats(*pair_occurrences(self.posts), self.posts.days)
+
+    def lib_names(self) -> typing.List[str]:
+        return [self.posts.names[key] for key in self.libs.keys.tolist()]
+
+    def pair_names(self) -> typing.List[str]:
+        return [pair_names(self.posts.names, key) for key in self.pairs.keys.tolist()]
+
+    def to_dicts(self):
+        """
+        The results of find_first_appearances_and_count_appearances(), with
+        the dates as "YYYY-MM-DD" (how they are written out).
+        """
+        dates = post_dates(self.posts)
+        libs_count, all_libs_dates, libs_first_dates = self._to_dicts(
+            self.libs, self.lib_names(), dates)
+        pairs_count, all_pairs_dates, pairs_first_dates = self._to_dicts(
+            self.pairs, self.pair_names(), dates)
+        return (
+            libs_count, pairs_count, self.user_to_posts,
+            all_libs_dates, all_pairs_dates,
+            libs_first_dates, pairs_first_dates,
+        )
+
+    def _to_dicts(
+        self, stats: KeyStats, key_names: typing.List[str], dates: np.ndarray,
+    ) -> typing.Tuple[typing.Dict, typing.Dict, typing.Dict]:
+        grouped_dates = dates[stats.grouped_posts].tolist()
+        first_posts = stats.first_posts.tolist()
+        all_dates = {
+            name: grouped_dates[start:end]
+            for name, start, end in zip(
+                key_names, stats.group_starts.tolist(),
+                (stats.group_starts + stats.counts).tolist())
+        }
+        first = {
+            name: {
+                "id": self.posts.post_ids[post_index],
+                "poster_id": self.posts.poster_ids[post_index],
+                "date": date,
+            }
+            for name, post_index, date in zip(key_names, first_posts, dates[first_posts].tolist())
+        }
+        return dict(zip(key_names, stats.counts.tolist())), all_dates, first
+
+    def write_date_histograms(self, output_path: str):
+        """
+        Writes the dates of the libs and of the pairs as daily histograms to
+        <output_path>_libs/pairs + date_histograms.HISTOGRAMS_SUFFIX.
+        """
+        for kind, stats, key_names in [
+            ("libs", self.libs, self.lib_names()), ("pairs", self.pairs, self.pair_names()),
+        ]:
+            date_histograms.write_histograms(
+                f"{output_path}_{kind}{date_histograms.HISTOGRAMS_SUFFIX}",
+                key_names,
+                np.repeat(np.arange(len(key_names), dtype=np.int64), stats.counts),
+                self.posts.days[stats.grouped_posts],
+            )
+
+    def json_outputs(self, include_dates: bool = True) -> typing.Dict[str, str]:
+        """
+        Output name -> the JSON text json.dump would write for the
+        corresponding to_dicts() result. The all_libs/pairs_dates lists are
+        left out unless include_dates is set.
+        """
+        encoded_names = [json.dumps(name) for name in self.posts.names]
+        encoded_libs = _object_array(encoded_names)[self.libs.keys]
+        # "|" is never escaped, so the pair's name is encoded piecewise
+        pair_keys = self.pairs.keys
+        encoded_pairs = (
+            _object_array([name[:-1] for name in encoded_names])[pair_keys >> 32] + "|" +
+            _object_array([name[1:] for name in encoded_names])[pair_keys & 0xFFFFFFFF]
+        )
+        quoted_dates = '"' + post_dates(self.posts) + '"'
+
+        outputs = {"user_to_posts": json.dumps(self.user_to_posts)}
+        for kind, stats, encoded_keys in [
+            ("libs", self.libs, encoded_libs), ("pairs", self.pairs, encoded_pairs),
+        ]:
+            outputs[f"{kind}_count"] = _json_object(
+                encoded_keys, _object_array(list(map(str, stats.counts.tolist()))))
+
+            if include_dates:
+                # the groups are consecutive: open the list at the first date
+                # of a key and close it at the last one
+                pieces = quoted_dates[stats.grouped_posts]
+                group_ends = stats.group_starts + stats.counts - 1
+                pieces[group_ends] = pieces[group_ends] + "]"
+                pieces[stats.group_starts] = encoded_keys + ": [" + pieces[stats.group_starts]
+                outputs[f"all_{kind}_dates"] = "{" + ", ".join(pieces.tolist()) + "}"
+
+            first_posts, post_indices = np.unique(stats.first_posts, return_inverse=True)
+            encoded_firsts = _object_array([
+                f'{{"id": {json.dumps(self.posts.post_ids[post_index])}, '
+                f'"poster_id": {json.dumps(self.posts.poster_ids[post_index])}, '
+                f'"date": {quoted_dates[post_index]}}}'
+                for post_index in first_posts.tolist()
+            ])
+            outputs[f"{kind}_first_dates"] = _json_object(
+                encoded_keys, encoded_firsts[post_indices.reshape(-1)])
+        return outputs
+
+
+def find_first_appearances_and_count_appearances(data: typing.Iterable[typing.Dict]):
+    """
+    Same results (and key order) as the pure Python implementation of
+    generate_indiv_and_pair_lib_stats, computed on interned ids: libs are
+    int32 ids, pairs int64 keys, counted and reduced with numpy sorts.
+    The dates are returned the way they are written out, as "YYYY-MM-DD".
+    """
+    return Appearances(data).to_dicts()
+
+
+# the outputs of generate_indiv_and_pair_lib_stats, <output path>_<name>.json
+OUTPUT_NAMES = [
+    "user_to_posts", "libs_count", "pairs_count", "all_libs_dates", "all_pairs_dates",
+    "libs_first_dates", "pairs_first_dates",
+]
+_KINDS = ["libs", "pairs"]
+
+
+class LibStatsAggregate:
+    """
+    Lib and pair statistics of a run of consecutive posts, starting at
+    position first_sequence of the whole input. a.merge(b) adds b, the
+    aggregate of the posts right after a's, so chunks can be aggregated on
+    separate processes and reduced in input order, and the posts of a later
+    run can be merged into the aggregate of the previous outputs.
+
+    Counts add up, date lists and user_to_posts are concatenated and the
+    first appearance of a key is its minimal (date, sequence), the sequence
+    being the position of the post in the whole input: on equal days the
+    earlier post wins, as in a single pass. Dates are "YYYY-MM-DD" strings.
+    """
+
+    def __init__(self, first_sequence: int = 0):
+        self.first_sequence = first_sequence
+        self.n_posts = 0
+        self.user_to_posts = collections.defaultdict(list)
+        self.counts = {kind: {} for kind in _KINDS}
+        self.all_dates = {kind: {} for kind in _KINDS}
+        # key -> (date, sequence, post id, poster id)
+        self.first = {kind: {} for kind in _KINDS}
+
+    @classmethod
+    def from_posts(
+        cls, data: typing.Iterable[typing.Dict], first_sequence: int = 0,
+    ) -> "LibStatsAggregate":
+        appearances = Appearances(data)
+        aggregate = cls(first_sequence)
+        aggregate.n_posts = len(appearances.posts)
+        aggregate.user_to_posts = appearances.user_to_posts
+        dates = post_dates(appearances.posts)
+        for kind, stats, key_names in [
+            ("libs", appearances.libs, appearances.lib_names()),
+            ("pairs", appearances.pairs, appearances.pair_names()),
+        ]:
+            counts, all_dates, first = appearances._to_dicts(stats, key_names, dates)
+            aggregate.counts[kind] = counts
+            aggregate.all_dates[kind] = all_dates
+            aggregate.first[kind] = {
+                key: (record["date"], first_sequence + post_index, record["id"], record["poster_id"])
+                for (key, record), post_index in zip(first.items(), stats.first_posts.tolist())
+            }
+        return aggregate
+
+    def merge(self, other: "LibStatsAggregate") -> "LibStatsAggregate":
+        """
+        Adds other in place (its lists are copied, not shared) and returns
+        this aggregate.
+        """
+        if other.first_sequence != self.first_sequence + self.n_posts:
+            raise ValueError(
+                "Only the aggregate of the posts right after this one can be merged!")
+        for poster_id, post_ids in other.user_to_posts.items():
+            self.user_to_posts[poster_id].extend(post_ids)
+        for kind in _KINDS:
+            counts = self.counts[kind]
+            for key, count in other.counts[kind].items():
+                counts[key] = counts.get(key, 0) + count
+            all_dates = self.all_dates[kind]
+            for key, dates in other.all_dates[kind].items():
+                if key in all_dates:
+                    all_dates[key].extend(dates)
+                else:
+                    all_dates[key] = list(dates)
+            first = self.first[kind]
+            for key, record in other.first[kind].items():
+                if key not in first or record[:2] < first[key][:2]:
+                    first[key] = record
+        self.n_posts += other.n_posts
+        return self
+
+    def to_dicts(self):
+        """
+        The results of find_first_appearances_and_count_appearances() (dates
+        as "YYYY-MM-DD") for the posts aggregated so far.
+        """
+        libs_first_dates, pairs_first_dates = [
+            {
+                key: {"id": post_id, "poster_id": poster_id, "date": date}
+                for key, (date, _, post_id, poster_id) in self.first[kind].items()
+            }
+            for kind in _KINDS
+        ]
+        return (
+            self.counts["libs"], self.counts["pairs"], self.user_to_posts,
+            self.all_dates["libs"], self.all_dates["pairs"],
+            libs_first_dates, pairs_first_dates,
+        )
+
+    def json_outputs(self, include_dates: bool = True) -> typing.Dict[str, str]:
+        """
+        Output name -> the JSON text json.dump would write for it. The
+        all_libs/pairs_dates lists are left out unless include_dates is set.
+        """
+        (
+            libs_count, pairs_count, user_to_posts,
+            all_libs_dates, all_pairs_dates,
+            libs_first_dates, pairs_first_dates,
+        ) = self.to_dicts()
+        results = {
+            "user_to_posts": user_to_posts,
+            "libs_count": libs_count,
+            "pairs_count": pairs_count,
+            "all_libs_dates": all_libs_dates,
+            "all_pairs_dates": all_pairs_dates,
+            "libs_first_dates": libs_first_dates,
+            "pairs_first_dates": pairs_first_dates,
+        }
+        if not include_dates:
+            del results["all_libs_dates"], results["all_pairs_dates"]
+        # dumps (unlike dump) runs the C encoder
+        return {name: json.dumps(result) for name, result in results.items()}
+
+    @classmethod
+    def load_outputs(cls, output_path: str, suffix: str = "") -> "LibStatsAggregate":
+        """
+        Rebuilds the aggregate of a previous run from its JSON outputs
+        (<output_path>_<name>.json<suffix>), so new posts can be merged in.
+        """
+        results = {}
+        for name in OUTPUT_NAMES:
+            path = f"{output_path}_{name}.json{suffix}"
+            if not os.path.exists(path):
+                raise ValueError(
+                    f"{path} is missing, the previous run must have written the JSON outputs!")
+            with compressed_io.open_input(path) as handle:
+                results[name] = json.load(handle)
+
+        aggregate = cls()
+        # poster ids are strings, JSON turned the missing ones (None) into "null"
+        aggregate.user_to_posts.update(
+            (None if poster_id == "null" else poster_id, post_ids)
+            for poster_id, post_ids in results["user_to_posts"].items()
+        )
+        aggregate.n_posts = sum(len(post_ids) for post_ids in results["user_to_posts"].values())
+        for kind in _KINDS:
+            aggregate.counts[kind] = results[f"{kind}_count"]
+            aggregate.all_dates[kind] = results[f"all_{kind}_dates"]
+            # every previous post comes before the new ones
+            aggregate.first[kind] = {
+                key: (record["date"], 0, record["id"], record["poster_id"])
+                for key, record in results[f"{kind}_first_dates"].items()
+            }
+        return aggregate
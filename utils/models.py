@@ -1,30 +1,55 @@
 class PostBlock:
+    """
+    Lines of a post block. They are kept in a list and joined into content
+    only when content is read, so building a long block stays linear.
+    """
+
+    __slots__ = ("post_id", "_lines", "_is_empty")
+
     def __init__(self, post_id):
         self.post_id = post_id
-        self.content = ""
+        self._lines = []
+        self._is_empty = True
+
+    @property
+    def content(self):
+        if len(self._lines) > 1:
+            self._lines = ["\n".join(self._lines)]
+        return self._lines[0] if self._lines else ""
+
+    @content.setter
+    def content(self, content):
+        self._lines = [content] if content else []
+        self._is_empty = not content.strip()
 
     def is_empty(self):
-        return not self.content.strip()
+        return self._is_empty
+
+    def _observe(self, text):
+        if self._is_empty and text and not text.isspace():
+            self._is_empty = False
 
     def append(self, line):
-        if self.content:
-            self.content += "\n" + line
-        else:
-            self.content = line
+        # empty strings are only kept once there is content to separate
+        if line or self._lines:
+            self._lines.append(line)
+            self._observe(line)
 
     def prepend(self, content):
-        if self.content:
-            self.content = content + "\n" + self.content
-        else:
-            self.content = content
+        if self._lines:
+            self._lines.insert(0, content)
+            self._observe(content)
+        elif content:
+            self._lines.append(content)
+            self._observe(content)
 
 
 class CodeBlock(PostBlock):
-    pass
+    __slots__ = ()
 
 
 class TextBlock(PostBlock):
-    pass
+    __slots__ = ()
 
 
 # TABLE HEADERS
@@ -0,0 +1,160 @@
+import array
+import bisect
+import collections.abc
+import hashlib
+import mmap
+import os
+import typing
+
+import numpy as np
+
+# <snapshot dir>/<language>.names: the sorted, distinct names (UTF-8, no separator)
+# <snapshot dir>/<language>.offsets: int64 start offsets of the names + the total size
+# <snapshot dir>/<language>.bloom: blocked Bloom filter of the names (uint64 words),
+# after BLOOM_MAGIC and an int64 holding the number of names (optional,
+# snapshots work without it); all numbers are in the byte order of the machine
+NAMES_EXT = ".names"
+OFFSETS_EXT = ".offsets"
+BLOOM_EXT = ".bloom"
+
+BLOOM_BITS_PER_NAME = 10
+# filters of earlier versions (CRC32 based, no magic) are ignored
+BLOOM_MAGIC = b"BLAKE2BF"
+
+# every SAMPLE_EVERY-th name is kept in memory to start the lookups with
+SAMPLE_EVERY = 64
+
+
+def _file_name(language: str) -> str:
+    # "c#" and "c++" are fine as file names, only path separators are not
+    return language.replace(os.sep, "_")
+
+
+def snapshot_paths(directory: str, language: str) -> typing.Tuple[str, str]:
+    root = os.path.join(directory, _file_name(language))
+    return root + NAMES_EXT, root + OFFSETS_EXT
+
+
+def bloom_path(directory: str, language: str) -> str:
+    return os.path.join(directory, _file_name(language)) + BLOOM_EXT
+
+
+def _bloom_word_and_mask(name: bytes, n_words: int) -> typing.Tuple[int, int]:
+    # blocked Bloom filter: a name sets (up to) 4 bits of a single 64 bit
+    # word, so a lookup reads one word; the word and the bits come from the
+    # two halves of one BLAKE2b digest
+    digest = hashlib.blake2b(name, digest_size=16).digest()
+    bits = int.from_bytes(digest[8:], "little")
+    return int.from_bytes(digest[:8], "little") % n_words, (
+        1 << (bits & 63) | 1 << (bits >> 6 & 63) |
+        1 << (bits >> 12 & 63) | 1 << (bits >> 18 & 63)
+    )
+
+
+def _build_bloom(encoded: typing.List[bytes]) -> bytes:
+    n_words = max(1, len(encoded) * BLOOM_BITS_PER_NAME // 64)
+    words = np.zeros(n_words, dtype=np.uint64)
+    if encoded:
+        word_indices, masks = zip(*(_bloom_word_and_mask(name, n_words) for name in encoded))
+        np.bitwise_or.at(words, np.array(word_indices), np.array(masks, dtype=np.uint64))
+    return words.tobytes()
+
+
+def has_snapshot(directory: str, language: str) -> bool:
+    return all(os.path.exists(path) for path in snapshot_paths(directory, language))
+
+
+def write_snapshot(directory: str, language: str, names: typing.Iterable[str]) -> int:
+    """
+    Stores the distinct names, sorted by their UTF-8 encoding. Both files are
+    replaced atomically. Returns the number of names.
+    """
+    os.makedirs(directory, exist_ok=True)
+    encoded = sorted({name.encode("utf-8") for name in names if name})
+    offsets = array.array("q", [0])
+    for name in encoded:
+        offsets.append(offsets[-1] + len(name))
+
+    names_path, offsets_path = snapshot_paths(directory, language)
+    with open(f"{names_path}.tmp", "wb") as handle:
+        handle.write(b"".join(encoded))
+    with open(f"{offsets_path}.tmp", "wb") as handle:
+        offsets.tofile(handle)
+    with open(f"{bloom_path(directory, language)}.tmp", "wb") as handle:
+        handle.write(BLOOM_MAGIC)
+        array.array("q", [len(encoded)]).tofile(handle)
+        handle.write(_build_bloom(encoded))
+    # files that do not match each other are refused when opening
+    os.replace(f"{names_path}.tmp", names_path)
+    os.replace(f"{offsets_path}.tmp", offsets_path)
+    os.replace(f"{bloom_path(directory, language)}.tmp", bloom_path(directory, language))
+    return len(encoded)
+
+
+def _map(path: str):
+    with open(path, "rb") as handle:
+        if not os.fstat(handle.fileno()).st_size:
+            return b""
+        return mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class PackageSnapshot(collections.abc.Sequence):
+    """
+    Read-only set of package names backed by memory-mapped snapshot files.
+    Only every SAMPLE_EVERY-th name is loaded; `name in snapshot` is a binary
+    search over the mapped pages, which forked workers share with their
+    parent.
+    """
+
+    def __init__(self, directory: str, language: str):
+        self.language = language
+        names_path, offsets_path = snapshot_paths(directory, language)
+        self._names = _map(names_path)
+        # offsets were written in the byte order of this machine
+        self._offsets = memoryview(_map(offsets_path)).cast("B").cast("q")
+        if len(self._offsets) < 1 or self._offsets[-1] != len(self._names):
+            raise ValueError(f"Corrupt package snapshot for {language}!")
+        self._samples = [self[index] for index in range(0, len(self), SAMPLE_EVERY)]
+
+        self._bloom = None
+        if os.path.exists(bloom_path(directory, language)):
+            bloom = memoryview(_map(bloom_path(directory, language))).cast("B")
+            if bytes(bloom[:8]) == BLOOM_MAGIC:
+                if bloom[8:16].cast("q")[0] != len(self):
+                    raise ValueError(f"Corrupt package snapshot for {language}!")
+                self._bloom = bloom[16:].cast("Q")
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int) -> bytes:
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self._names[self._offsets[index]:self._offsets[index + 1]]
+
+    def __contains__(self, name) -> bool:
+        encoded = name.encode("utf-8")
+        if self._bloom is not None:
+            # most garbage candidates are rejected here without touching the names
+            word, mask = _bloom_word_and_mask(encoded, len(self._bloom))
+            if self._bloom[word] & mask != mask:
+                return False
+        names, offsets = self._names, self._offsets
+        # the sampled names narrow the search down to one block, which is
+        # bisected on the mapped files (inlined, this runs for every import)
+        block = bisect.bisect_right(self._samples, encoded) - 1
+        if block < 0:
+            return False
+        low = block * SAMPLE_EVERY
+        high = min(low + SAMPLE_EVERY, len(offsets) - 1)
+        while low < high:
+            middle = (low + high) // 2
+            if names[offsets[middle]:offsets[middle + 1]] < encoded:
+                low = middle + 1
+            else:
+                high = middle
+        return low < len(offsets) - 1 and names[offsets[low]:offsets[low + 1]] == encoded
+
+    def names(self) -> typing.Iterator[str]:
+        for name in self:
+            yield name.decode("utf-8")
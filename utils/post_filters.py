@@ -0,0 +1,105 @@
+import collections
+import typing
+
+import utils.models as models
+
+# PostTypeId values of the posts the ingest keeps
+POST_TYPE_IDS = {"question": "1", "answer": "2"}
+
+_POST_TYPE = models.POSTS_COLS.index("PostTypeId")
+_CREATION_DATE = models.POSTS_COLS.index("CreationDate")
+_SCORE = models.POSTS_COLS.index("Score")
+_OWNER_USER_ID = models.POSTS_COLS.index("OwnerUserId")
+
+
+class PostFilter:
+    """
+    Cheap predicates on the raw columns of a post (year range, post type,
+    minimum score, poster id), checked before anything is extracted or, at
+    XML ingest, serialized. The rejection reasons are the stats keys of the
+    extraction ("no poster id", "no date posted", "too new", ...).
+
+    accepts_row() counts the rejected XML rows per reason in self.rejected.
+    """
+
+    def __init__(
+        self,
+        min_year: typing.Optional[int] = None,
+        max_year: typing.Optional[int] = None,
+        post_types: typing.Optional[typing.Iterable[str]] = None,
+        min_score: typing.Optional[int] = None,
+        require_poster_id: bool = False,
+        require_date: bool = False,
+    ):
+        self.min_year = min_year
+        self.max_year = max_year
+        self.post_types = None if post_types is None else frozenset(post_types)
+        self.min_score = min_score
+        self.require_poster_id = require_poster_id
+        # a year range needs the date as well
+        self.require_date = require_date or min_year is not None or max_year is not None
+        self.rejected = collections.defaultdict(int)
+
+    @property
+    def is_active(self) -> bool:
+        return bool(
+            self.require_poster_id or self.require_date or
+            self.post_types is not None or self.min_score is not None
+        )
+
+    def rejection_reason(
+        self,
+        post_type: str,
+        date_posted: str,
+        score: str,
+        poster_id: str,
+    ) -> typing.Optional[str]:
+        """
+        Returns why the post is filtered out, None if it passes.
+        """
+        if self.require_poster_id and not poster_id:
+            return "no poster id"
+        if self.require_date and not date_posted:
+            return "no date posted"
+        if self.min_year is not None or self.max_year is not None:
+            if len(date_posted) < 4 or not date_posted[:4].isdigit():
+                return "bad date"
+            year = int(date_posted[:4])
+            if self.min_year is not None and year < self.min_year:
+                return "too old"
+            if self.max_year is not None and year > self.max_year:
+                return "too new"
+        if self.post_types is not None and post_type not in self.post_types:
+            return "other post type"
+        if self.min_score is not None:
+            try:
+                if not score or int(score) < self.min_score:
+                    return "low score"
+            except ValueError:
+                return "bad score"
+        return None
+
+    def rejection_reason_of_values(self, values: typing.List[str]) -> typing.Optional[str]:
+        """
+        rejection_reason() of a curated row's values (models.POSTS_COLS order).
+        """
+        return self.rejection_reason(
+            values[_POST_TYPE], values[_CREATION_DATE], values[_SCORE], values[_OWNER_USER_ID])
+
+    def rejection_reason_of_row(self, row) -> typing.Optional[str]:
+        """
+        rejection_reason() of an XML row (lxml element or scanned row).
+        """
+        return self.rejection_reason(
+            row.attrib.get("PostTypeId", ""),
+            row.attrib.get("CreationDate", ""),
+            row.attrib.get("Score", ""),
+            row.attrib.get("OwnerUserId", ""),
+        )
+
+    def accepts_row(self, row) -> bool:
+        reason = self.rejection_reason_of_row(row)
+        if reason is None:
+            return True
+        self.rejected[reason] += 1
+        return False
@@ -0,0 +1,96 @@
+import itertools
+import json
+import os
+import typing
+
+import utils.compressed_io as compressed_io
+import utils.jsonl_writer as jsonl_writer
+import utils.post_store as post_store
+
+# <-o>_<language> + POST_STATS_SUFFIX (+ compression extension)
+POST_STATS_SUFFIX = "_post_stats.jsonl"
+# what the files were called when they held a single JSON array
+LEGACY_POST_STATS_SUFFIX = "_post_stats.json"
+
+_READ_SIZE = 1 << 20
+
+
+def find_post_stats(prefix: str, compression_suffix: str = "") -> typing.Optional[str]:
+    """
+    Returns the post stats file written for prefix (<-o>_<language>), the
+    JSONL one if both formats exist, None if there is none.
+    """
+    for suffix in [POST_STATS_SUFFIX, LEGACY_POST_STATS_SUFFIX]:
+        path = f"{prefix}{suffix}{compression_suffix}"
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def write_post_stats(path: str, payloads: typing.Iterable[typing.Dict]) -> int:
+    with jsonl_writer.JsonlWriter(path, mode="w") as writer:
+        for payload in payloads:
+            writer.write(payload)
+    return writer.n_rows
+
+
+def _iter_json_array(handle, buffer: str = "") -> typing.Iterator[typing.Any]:
+    # decodes the items of a "[...]" file one by one, holding a read buffer
+    # (plus the item being decoded) in memory; buffer is what was already
+    # read from handle
+    decoder = json.JSONDecoder()
+    position = 0
+    at_eof = False
+    started = False
+    while True:
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        if position == len(buffer):
+            if at_eof:
+                raise ValueError("Unterminated JSON array!")
+            buffer, position = handle.read(_READ_SIZE), 0
+            at_eof = not buffer
+            continue
+        if not started:
+            if buffer[position] != "[":
+                raise ValueError("Not a JSON array!")
+            started = True
+            position += 1
+            continue
+        if buffer[position] == "]":
+            return
+
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if at_eof:
+                raise
+            end = None
+        if (end is None or end == len(buffer)) and not at_eof:
+            # the item may continue in the next read
+            more = handle.read(_READ_SIZE)
+            at_eof = not more
+            buffer, position = buffer[position:] + more, 0
+            continue
+        yield item
+        position = end
+
+
+def iter_post_stats(path: str) -> typing.Iterator[typing.Dict]:
+    """
+    Lazily yields the payloads of a post stats file, either JSONL or a
+    legacy JSON array, or of a post store directory.
+    """
+    if post_store.is_post_store(path):
+        yield from post_store.PostStore(path).iter_payloads()
+        return
+    with compressed_io.open_input(path) as handle:
+        first = handle.read(1)
+        while first.isspace():
+            first = handle.read(1)
+        if first == "[":
+            yield from _iter_json_array(handle, first)
+            return
+        for line in itertools.chain([first + handle.readline()], handle):
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,226 @@
+import datetime
+import itertools
+import os
+import shutil
+import typing
+
+import numpy as np
+
+import utils.lib_stats as lib_stats
+
+# <-o>_<language> + POST_STORE_SUFFIX, a directory of .npy files (one per column):
+#   ids: int64 post ids
+#   dates: int64 epoch milliseconds (the dump's UTC timestamps)
+#   poster_ids: int64, MISSING_ID if there is none
+#   post_types: int8 PostTypeId, MISSING_ID if there is none
+#   scores: int32, MISSING_SCORE if there is none
+#   import_offsets: int64, the imports of post i are import_ids[import_offsets[i]:import_offsets[i + 1]]
+#   import_ids: int32 ids into the lib names, in the order of the post's imports
+#   lib_name_bytes, lib_name_offsets: the sorted lib names (UTF-8, concatenated)
+#     and their int64 start offsets + total size
+POST_STORE_SUFFIX = "_post_store"
+
+MISSING_ID = -1
+MISSING_SCORE = np.iinfo(np.int32).min
+
+_INT_COLUMNS = [
+    # payload key, column, dtype, value stored for a missing one
+    ("id", "ids", np.int64, None),
+    ("poster_id", "poster_ids", np.int64, MISSING_ID),
+    ("post_type", "post_types", np.int8, MISSING_ID),
+    ("score", "scores", np.int32, MISSING_SCORE),
+]
+COLUMNS = [column for _, column, _, _ in _INT_COLUMNS] + [
+    "dates", "import_offsets", "import_ids", "lib_name_bytes", "lib_name_offsets",
+]
+
+_CHUNK_SIZE = 1 << 16
+_MS_PER_DAY = 24 * 60 * 60 * 1000
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+
+def find_post_store(prefix: str) -> typing.Optional[str]:
+    """
+    Returns the post store written for prefix (<-o>_<language>), None if
+    there is none.
+    """
+    path = f"{prefix}{POST_STORE_SUFFIX}"
+    return path if is_post_store(path) else None
+
+
+def is_post_store(path: str) -> bool:
+    return os.path.isdir(path) and all(
+        os.path.exists(os.path.join(path, f"{column}.npy")) for column in COLUMNS)
+
+
+def _render_ints(column: np.ndarray, missing: typing.Optional[int]) -> typing.List:
+    return [None if value == missing else str(value) for value in column.tolist()]
+
+
+def _int_column(
+    values: typing.List, key: str, dtype, missing: typing.Optional[int],
+) -> np.ndarray:
+    try:
+        column = np.array(
+            [missing if value is None else int(value) for value in values], dtype=dtype)
+    except (TypeError, ValueError, OverflowError):
+        column = None
+    # only what reads back as the same payload is stored
+    if column is None or _render_ints(column, missing) != values:
+        raise ValueError(f"Cannot store the >>{key}<< values of the posts in a post store!")
+    return column
+
+
+def _render_dates(dates: np.ndarray) -> typing.List[str]:
+    return np.datetime_as_string(dates.astype("datetime64[ms]"), unit="ms").tolist()
+
+
+def _date_column(values: typing.List) -> np.ndarray:
+    try:
+        dates = np.array(values, dtype="datetime64[ms]")
+    except (TypeError, ValueError):
+        dates = None
+    if dates is None or _render_dates(dates) != values:
+        raise ValueError("Post store dates must look like 2008-08-03T20:07:05.290!")
+    return dates.astype(np.int64)
+
+
+def _concatenate(chunks: typing.List[np.ndarray], dtype) -> np.ndarray:
+    return np.concatenate(chunks) if chunks else np.zeros(0, dtype=dtype)
+
+
+def write_post_store(directory: str, payloads: typing.Iterable[typing.Dict]) -> int:
+    """
+    Stores the post stats payloads in columns, replacing the directory once
+    every column is written. Returns the number of posts.
+    """
+    columns = {column: [] for column in COLUMNS}
+    first_seen_ids = {}
+    import_offsets = [np.zeros(1, dtype=np.int64)]
+    n_imports = 0
+
+    payloads_iterator = iter(payloads)
+    while True:
+        chunk = list(itertools.islice(payloads_iterator, _CHUNK_SIZE))
+        if not chunk:
+            break
+        for key, column, dtype, missing in _INT_COLUMNS:
+            columns[column].append(
+                _int_column([payload.get(key) for payload in chunk], key, dtype, missing))
+        columns["dates"].append(_date_column([payload.get("date") for payload in chunk]))
+
+        lib_ids = [
+            first_seen_ids.setdefault(package, len(first_seen_ids))
+            for payload in chunk for package in payload["imports"]
+        ]
+        columns["import_ids"].append(np.array(lib_ids, dtype=np.int32))
+        import_offsets.append(
+            n_imports + np.cumsum([len(payload["imports"]) for payload in chunk], dtype=np.int64))
+        n_imports += len(lib_ids)
+
+    # lib ids in the order of the sorted names, as lib_stats.intern_posts() gives them
+    names = sorted(first_seen_ids)
+    sorted_ids = np.empty(len(names), dtype=np.int32)
+    sorted_ids[[first_seen_ids[name] for name in names]] = np.arange(len(names), dtype=np.int32)
+    encoded = [name.encode("utf-8") for name in names]
+    name_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(name) for name in encoded], out=name_offsets[1:])
+
+    arrays = {
+        column: _concatenate(columns[column], dtype) for _, column, dtype, _ in _INT_COLUMNS
+    }
+    arrays["dates"] = _concatenate(columns["dates"], np.int64)
+    arrays["import_offsets"] = np.concatenate(import_offsets)
+    arrays["import_ids"] = sorted_ids[_concatenate(columns["import_ids"], np.int32)]
+    arrays["lib_name_bytes"] = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    arrays["lib_name_offsets"] = name_offsets
+
+    tmp_directory = f"{directory}.tmp"
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    os.makedirs(tmp_directory)
+    for column, values in arrays.items():
+        np.save(os.path.join(tmp_directory, f"{column}.npy"), values)
+    if os.path.isdir(directory):
+        shutil.rmtree(directory)
+    os.replace(tmp_directory, directory)
+    return len(arrays["ids"])
+
+
+class PostStore:
+    """
+    The posts of a post store, every column memory-mapped (opening one
+    reads the headers and the lib names only). iter_payloads() yields the
+    post stats payloads, interned() the numpy engine's input.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        for column in COLUMNS:
+            setattr(self, column, np.load(os.path.join(directory, f"{column}.npy"), mmap_mode="r"))
+        n_posts = len(self.ids)
+        if (
+            any(len(getattr(self, column)) != n_posts for column in [
+                "dates", "poster_ids", "post_types", "scores"]) or
+            len(self.import_offsets) != n_posts + 1 or
+            self.import_offsets[-1] != len(self.import_ids) or
+            self.lib_name_offsets[-1] != len(self.lib_name_bytes)
+        ):
+            raise ValueError(f"Corrupt post store in {directory}!")
+        name_bytes = self.lib_name_bytes.tobytes()
+        name_offsets = self.lib_name_offsets.tolist()
+        self.lib_names = [
+            name_bytes[start:end].decode("utf-8")
+            for start, end in zip(name_offsets, name_offsets[1:])
+        ]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def imports(self, index: int) -> typing.List[str]:
+        return [
+            self.lib_names[lib_id] for lib_id in
+            self.import_ids[self.import_offsets[index]:self.import_offsets[index + 1]].tolist()
+        ]
+
+    def iter_payloads(self, start: int = 0, stop: typing.Optional[int] = None) -> typing.Iterator[typing.Dict]:
+        """
+        Yields the payloads of posts start..stop as the post stats file
+        holds them.
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        names = self.lib_names
+        for chunk_start in range(start, stop, _CHUNK_SIZE):
+            rows = slice(chunk_start, min(chunk_start + _CHUNK_SIZE, stop))
+            offsets = self.import_offsets[rows.start:rows.stop + 1].tolist()
+            lib_ids = self.import_ids[offsets[0]:offsets[-1]].tolist()
+            imports = [names[lib_id] for lib_id in lib_ids]
+            for post_id, post_type, start_offset, end_offset, date, poster_id, score in zip(
+                _render_ints(self.ids[rows], None),
+                _render_ints(self.post_types[rows], MISSING_ID),
+                offsets, offsets[1:],
+                _render_dates(self.dates[rows]),
+                _render_ints(self.poster_ids[rows], MISSING_ID),
+                _render_ints(self.scores[rows], MISSING_SCORE),
+            ):
+                yield {
+                    "id": post_id,
+                    "post_type": post_type,
+                    "imports": imports[start_offset - offsets[0]:end_offset - offsets[0]],
+                    "date": date,
+                    "poster_id": poster_id,
+                    "score": score,
+                }
+
+    def interned(self) -> lib_stats.InternedPosts:
+        """
+        The posts as lib_stats.intern_posts() would read them from the
+        payloads, without decoding a single import.
+        """
+        return lib_stats.InternedPosts(
+            self.lib_names,
+            np.asarray(self.import_ids),
+            np.asarray(self.import_offsets),
+            (np.asarray(self.dates) // _MS_PER_DAY + _EPOCH_ORDINAL).astype(np.int32),
+            _render_ints(self.ids, None),
+            _render_ints(self.poster_ids, MISSING_ID),
+        )
@@ -48,6 +48,11 @@ alternative_code_block_marker_regex = re.compile(r"```")
 
 contains_letter_or_digit_regex = re.compile(r"[a-zA-Z0-9]")
 
+# code blocks of the rendered HTML body of a post (as found in the dumps)
+html_code_block_regex = re.compile(
+    r"<pre[^>]*>\s*<code[^>]*>(.*?)</code>\s*</pre>", re.IGNORECASE | re.DOTALL
+)
+
 job_name_regex = re.compile(r"[^-a-z0-9]+")
 
 
@@ -76,4 +81,24 @@ import_pattern_by_language = {
     'c#': re.compile(r'^using\s+([a-zA-Z_]\w*(\.[a-zA-Z_]\w*)*)\s*;\s*$', re.MULTILINE),
 }
 
+# a snippet can only match import_pattern_by_language[language] if it
+# contains one of these (the patterns are case sensitive)
+import_keywords_by_language = {
+    'python': ('import', 'from'),
+    'ruby': ('require',),
+    'rust': ('use',),
+    'r': ('library', 'require'),
+    'julia': ('using', 'import'),
+    'c': ('#include',),
+    'javascript': ('require', 'import'),
+    'java': ('import',),
+    'perl': ('use',),
+    'php': ('require', 'include'),
+    'matlab': ('import',),
+    'objectivec': ('import',),
+    'swift': ('import',),
+    'cpp': ('include',),
+    'c#': ('using',),
+}
+
 
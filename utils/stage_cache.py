@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import typing
+
+_READ_SIZE = 1 << 20
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(_READ_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _load_record(path: str) -> typing.Optional[typing.Dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def _save_record(path: str, record: typing.Dict):
+    # replaced atomically, an interrupted run leaves the previous record
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as handle:
+        json.dump(record, handle)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp_path, path)
+
+
+class StageCache:
+    """
+    Remembers which outputs a pipeline stage wrote for which inputs: a
+    stage's key hashes its name, its parameters and the content of its
+    input files, and the stage can be skipped while the key and the
+    content of its outputs are what the last run recorded. Outputs feed
+    the keys of the next stages by content, so a stage that rewrites the
+    same files does not invalidate them.
+
+    File digests are remembered by (size, mtime), unchanged files are not
+    read again.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._digests = _load_record(self._record_path("digests")) or {}
+
+    def _record_path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.json")
+
+    def digest(self, path: str) -> typing.Optional[str]:
+        """
+        Content digest of a file, or of a directory's files and their
+        relative paths; None if there is nothing at path.
+        """
+        if os.path.isdir(path):
+            digest = hashlib.blake2b(digest_size=16)
+            for root, directories, files in os.walk(path):
+                directories.sort()
+                for name in sorted(files):
+                    file_path = os.path.join(root, name)
+                    digest.update(os.path.relpath(file_path, path).encode("utf-8"))
+                    digest.update(self.digest(file_path).encode("ascii"))
+            return digest.hexdigest()
+        if not os.path.exists(path):
+            return None
+
+        stat = os.stat(path)
+        absolute_path = os.path.abspath(path)
+        known = self._digests.get(absolute_path)
+        if known and known[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return known[2]
+        digest = _file_digest(path)
+        self._digests[absolute_path] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    def stage_key(
+        self, name: str, inputs: typing.List[str], params: typing.Dict,
+    ) -> str:
+        content = json.dumps({
+            "stage": name,
+            "inputs": {path: self.digest(path) for path in inputs},
+            "params": params,
+        }, sort_keys=True)
+        return hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
+
+    def is_valid(self, name: str, key: str, outputs: typing.List[str]) -> bool:
+        record = _load_record(self._record_path(name))
+        return (
+            record is not None and record["key"] == key and
+            record["outputs"] == {path: self.digest(path) for path in outputs} and
+            None not in record["outputs"].values()
+        )
+
+    def record(self, name: str, key: str, outputs: typing.List[str]):
+        _save_record(self._record_path(name), {
+            "key": key,
+            "outputs": {path: self.digest(path) for path in outputs},
+        })
+        self.save()
+
+    def save(self):
+        _save_record(self._record_path("digests"), self._digests)
@@ -0,0 +1,248 @@
+import array
+import collections
+import itertools
+import json
+import logging
+import os
+import re
+import typing
+
+import numpy as np
+
+import utils.models as models
+
+logger = logging.getLogger(__name__)
+
+
+def recognized_language(tags: str) -> typing.Optional[str]:
+    """
+    A post belongs to a language if that language is the only recognized
+    language among its tags.
+    """
+    tokenized_tags = set(re.findall("<(.+?)>", tags))
+    recognized_tags = tokenized_tags & models.LANGUAGES
+    if len(recognized_tags) != 1:
+        return None
+    return next(iter(recognized_tags))
+
+
+class TagSetTable:
+    """
+    Interns raw Tags strings (e.g. "<python><django>") into small integer
+    ids. The recognized language is computed once per distinct tag set.
+    """
+
+    def __init__(self):
+        self.tags = []
+        self.languages = []
+        self._ids = {}
+
+    def __len__(self):
+        return len(self.tags)
+
+    def intern(self, tags: str) -> int:
+        tag_set_id = self._ids.get(tags)
+        if tag_set_id is None:
+            tag_set_id = len(self.tags)
+            self._ids[tags] = tag_set_id
+            self.tags.append(tags)
+            self.languages.append(recognized_language(tags))
+        return tag_set_id
+
+
+class TagIndex:
+    """
+    Read-only post Id -> tag set id map backed by a sorted int64 id array.
+    """
+
+    def __init__(
+        self,
+        post_ids: np.ndarray,
+        tag_set_ids: np.ndarray,
+        table: TagSetTable,
+    ):
+        self.post_ids = post_ids
+        self.tag_set_ids = tag_set_ids
+        self.table = table
+
+    def __len__(self):
+        return len(self.post_ids)
+
+    def lookup(self, post_id: int) -> int:
+        """
+        Returns the tag set id of the post or -1 if the post is unknown.
+        """
+        i = int(np.searchsorted(self.post_ids, post_id))
+        if i < len(self.post_ids) and self.post_ids[i] == post_id:
+            return int(self.tag_set_ids[i])
+        return -1
+
+
+def _keep_last_per_id(
+    ids: np.ndarray, values: np.ndarray
+) -> typing.Tuple[np.ndarray, np.ndarray]:
+    # Same semantics as repeatedly assigning into a dict: the last write wins.
+    if not len(ids):
+        return ids, values
+    order = np.argsort(ids, kind="stable")
+    ids, values = ids[order], values[order]
+    is_last = np.append(ids[1:] != ids[:-1], True)
+    return ids[is_last], values[is_last]
+
+
+class TagIndexBuilder:
+    """
+    Collects questions (Id, tag set) and answers (Id, ParentId) in compact
+    typed arrays while scanning the dump. build() resolves the answers to
+    the tag set of their question.
+    """
+
+    def __init__(self):
+        self.table = TagSetTable()
+        self.question_ids = array.array("q")
+        self.question_tag_set_ids = array.array("i")
+        self.answer_ids = array.array("q")
+        self.parent_ids = array.array("q")
+
+    def add_question(self, post_id: int, tags: str):
+        self.question_ids.append(post_id)
+        self.question_tag_set_ids.append(self.table.intern(tags))
+
+    def add_answer(self, post_id: int, parent_id: int):
+        self.answer_ids.append(post_id)
+        self.parent_ids.append(parent_id)
+
+    def merge(self, other: "TagIndexBuilder"):
+        """
+        Appends the content of other (e.g. the builder of a later shard),
+        translating its tag set ids into this builder's table.
+        """
+        mapping = np.array(
+            [self.table.intern(tags) for tags in other.table.tags] or [0],
+            dtype=np.int32,
+        )
+        other_tag_set_ids = np.frombuffer(other.question_tag_set_ids, dtype=np.int32)
+        self.question_ids.extend(other.question_ids)
+        self.question_tag_set_ids.frombytes(mapping[other_tag_set_ids].tobytes())
+        self.answer_ids.extend(other.answer_ids)
+        self.parent_ids.extend(other.parent_ids)
+
+    def build(self) -> TagIndex:
+        question_ids, question_tag_set_ids = _keep_last_per_id(
+            np.frombuffer(self.question_ids, dtype=np.int64),
+            np.frombuffer(self.question_tag_set_ids, dtype=np.int32),
+        )
+        answer_ids, parent_ids = _keep_last_per_id(
+            np.frombuffer(self.answer_ids, dtype=np.int64),
+            np.frombuffer(self.parent_ids, dtype=np.int64),
+        )
+
+        # answers inherit the tags of their question, if it has any
+        has_tags = np.array([bool(tags) for tags in self.table.tags] + [False])
+        positions = np.searchsorted(question_ids, parent_ids)
+        positions = np.minimum(positions, max(len(question_ids) - 1, 0))
+        if len(question_ids):
+            resolved = (
+                (question_ids[positions] == parent_ids) &
+                has_tags[question_tag_set_ids[positions]]
+            )
+            answer_tag_set_ids = question_tag_set_ids[positions]
+        else:
+            resolved = np.zeros(len(parent_ids), dtype=bool)
+            answer_tag_set_ids = np.zeros(len(parent_ids), dtype=np.int32)
+
+        stats = collections.defaultdict(int)
+        stats["questions"] = len(question_ids)
+        stats["success"] = int(resolved.sum())
+        stats["key error"] = int(len(resolved) - resolved.sum())
+        logger.info(f"Tag index populated. Stats: {dict(stats)}")
+
+        post_ids, tag_set_ids = _keep_last_per_id(
+            np.concatenate([question_ids, answer_ids[resolved]]),
+            np.concatenate([question_tag_set_ids, answer_tag_set_ids[resolved]]),
+        )
+        return TagIndex(post_ids, tag_set_ids, self.table)
+
+
+_SPILL_ARRAYS = ["question_ids", "question_tag_set_ids", "answer_ids", "parent_ids"]
+# the files spill_builder() and save_index() write into a checkpoint directory
+SPILL_FILES = [f"{name}.bin" for name in _SPILL_ARRAYS] + ["tag_sets.jsonl"]
+INDEX_FILES = ["index_post_ids.npy", "index_tag_set_ids.npy", "index_tag_sets.json"]
+
+
+def spill_builder(
+    builder: TagIndexBuilder,
+    directory: str,
+    counts: typing.Optional[typing.Dict[str, int]] = None,
+) -> typing.Dict[str, int]:
+    """
+    Appends what the builder collected since the previous spill (described by
+    counts) to files in directory and returns the new counts.
+    """
+    counts = dict(counts or {})
+    for name in _SPILL_ARRAYS:
+        values = getattr(builder, name)
+        with open(os.path.join(directory, f"{name}.bin"), "ab") as handle:
+            handle.write(values[counts.get(name, 0):].tobytes())
+            handle.flush()
+            os.fsync(handle.fileno())
+        counts[name] = len(values)
+    with open(os.path.join(directory, "tag_sets.jsonl"), "a") as handle:
+        for tags in builder.table.tags[counts.get("tag_sets", 0):]:
+            handle.write(json.dumps(tags) + "\n")
+        handle.flush()
+        os.fsync(handle.fileno())
+    counts["tag_sets"] = len(builder.table)
+    return counts
+
+
+def _load_tag_sets(directory: str, count: int) -> TagSetTable:
+    table = TagSetTable()
+    if not count:
+        return table
+    with open(os.path.join(directory, "tag_sets.jsonl")) as handle:
+        for tags in itertools.islice(handle, count):
+            table.intern(json.loads(tags))
+    return table
+
+
+def restore_builder(directory: str, counts: typing.Dict[str, int]) -> TagIndexBuilder:
+    """
+    Rebuilds a builder from spilled files, ignoring what was appended after
+    the spill that returned counts (the files are truncated accordingly).
+    """
+    builder = TagIndexBuilder()
+    builder.table = _load_tag_sets(directory, counts.get("tag_sets", 0))
+    for name in _SPILL_ARRAYS:
+        values = getattr(builder, name)
+        path = os.path.join(directory, f"{name}.bin")
+        size = counts.get(name, 0) * values.itemsize
+        if os.path.exists(path):
+            with open(path, "r+b") as handle:
+                handle.truncate(size)
+                values.frombytes(handle.read())
+    # the tag set file is only ever appended to, keep it in line as well
+    spilled_tags = counts.get("tag_sets", 0)
+    with open(os.path.join(directory, "tag_sets.jsonl"), "w") as handle:
+        for tags in builder.table.tags[:spilled_tags]:
+            handle.write(json.dumps(tags) + "\n")
+    return builder
+
+
+def save_index(index: TagIndex, directory: str):
+    np.save(os.path.join(directory, "index_post_ids.npy"), index.post_ids)
+    np.save(os.path.join(directory, "index_tag_set_ids.npy"), index.tag_set_ids)
+    with open(os.path.join(directory, "index_tag_sets.json"), "w") as handle:
+        json.dump(index.table.tags, handle)
+
+
+def load_index(directory: str) -> TagIndex:
+    table = TagSetTable()
+    with open(os.path.join(directory, "index_tag_sets.json")) as handle:
+        for tags in json.load(handle):
+            table.intern(tags)
+    return TagIndex(
+        np.load(os.path.join(directory, "index_post_ids.npy")),
+        np.load(os.path.join(directory, "index_tag_set_ids.npy")),
+        table,
+    )
@@ -1,8 +1,33 @@
+import os
+import typing
+
+import utils.package_snapshot as package_snapshot
 from utils.valid_python_packages import get_all_package_names as python_get_all_package_names
 from utils.valid_ruby_packages import get_all_package_names as ruby_get_all_package_names
 
+# Directory of the package registry snapshots (see generate_package_snapshots.py).
+# If a language has a snapshot there, it is used instead of the live registry.
+SNAPSHOT_DIR = os.environ.get("PACKAGE_SNAPSHOT_DIR")
 
-def get_valid_packages(target_language: str):
+SNAPSHOTS = {}
+
+
+def set_snapshot_dir(snapshot_dir: typing.Optional[str]):
+    global SNAPSHOT_DIR
+    SNAPSHOT_DIR = snapshot_dir
+    SNAPSHOTS.clear()
+
+
+def get_package_snapshot(target_language: str) -> typing.Optional[package_snapshot.PackageSnapshot]:
+    if target_language not in SNAPSHOTS:
+        if not SNAPSHOT_DIR or not package_snapshot.has_snapshot(SNAPSHOT_DIR, target_language):
+            return None
+        SNAPSHOTS[target_language] = package_snapshot.PackageSnapshot(
+            SNAPSHOT_DIR, target_language)
+    return SNAPSHOTS[target_language]
+
+
+def get_live_packages(target_language: str):
     target_getter = {
         "python": python_get_all_package_names,
         "ruby": ruby_get_all_package_names,
@@ -11,3 +36,27 @@ def get_valid_packages(target_language: str):
         return None
 
     return target_getter()
+
+
+def get_valid_packages(target_language: str):
+    snapshot = get_package_snapshot(target_language)
+    if snapshot is not None:
+        return snapshot
+    return get_live_packages(target_language)
+
+
+def share_live_packages(target_language: str, directory: str) -> bool:
+    """
+    Makes get_valid_packages() return a memory-mapped snapshot of the live
+    registry, written to directory, so that forked workers share one index
+    instead of touching (and thus copying) the pages of the live set.
+    Returns False if there is nothing to validate against.
+    """
+    if get_package_snapshot(target_language) is not None:
+        return True
+    live_packages = get_live_packages(target_language)
+    if live_packages is None:
+        return False
+    package_snapshot.write_snapshot(directory, target_language, live_packages)
+    SNAPSHOTS[target_language] = package_snapshot.PackageSnapshot(directory, target_language)
+    return True
@@ -1,12 +1,21 @@
 import collections
 import json
 import logging
-import re
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
 import typing
 
 import lxml.etree
 
+import utils.checkpoint as checkpoint
+import utils.compressed_io as compressed_io
+import utils.jsonl_writer as jsonl_writer
 import utils.models as models
+import utils.post_filters as post_filters
+import utils.tag_index as tag_index
 
 logging.basicConfig(level=logging.DEBUG, format='%(message)s')
 logger = logging.getLogger(__name__)
@@ -35,76 +44,603 @@ def fast_iter(context, func, *args, **kwargs):
     del context
 
 
-def link_a_to_q_tags(
-    row, questions_to_tags: typing.Dict, answers_to_questions: typing.Dict
-):
-    if row.attrib.get("PostTypeId", "") == "1":
-        questions_to_tags[row.attrib["Id"]] = row.attrib.get("Tags", "")
-    elif row.attrib.get("PostTypeId", "") == "2":
-        answers_to_questions[row.attrib["Id"]] = row.attrib["ParentId"]
+def iter_rows(xml_path: str, stats: typing.Optional[typing.Dict] = None):
+    """
+    Yields the <row> elements of a dump file one by one.
+    Only the end events of <row> tags are reported by lxml and each row is
+    detached from the root after it has been consumed, so the tree never holds
+    more than one previous sibling (no XPath walk needed).
+    If provided, stats is filled with the row count, rows/sec and peak RSS.
+    Compressed dumps (.gz, .bz2, .xz) are decompressed on the fly.
+    """
+    t0 = time.perf_counter()
+    n_rows = 0
+    with compressed_io.open_input(xml_path, "rb") as source:
+        context = lxml.etree.iterparse(source, events=("end",), tag="row")
+        for _, elem in context:
+            n_rows += 1
+            yield elem
+            elem.clear(keep_tail=True)
+            parent = elem.getparent()
+            while elem.getprevious() is not None:
+                del parent[0]
+        del context
+
+    elapsed = time.perf_counter() - t0
+    if stats is not None:
+        stats["rows"] += n_rows
+        stats["seconds"] += elapsed
+        stats["rows/sec"] = stats["rows"] / stats["seconds"] if stats["seconds"] else 0.0
+        # ru_maxrss is reported in kilobytes on Linux
+        stats["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def apply_to_rows(xml_path: str, func, *args, **kwargs) -> typing.Dict:
+    """
+    Calls func on every row of the dump. Exceptions are logged per row and
+    do not stop the scan (same contract as fast_iter).
+    """
+    stats = collections.defaultdict(float)
+    for row in iter_rows(xml_path, stats):
+        try:
+            func(row, *args, **kwargs)
+        except Exception as exc:
+            logger.error(f"Exception! {str(exc)}")
+    logger.info(
+        f"Scanned {int(stats['rows'])} rows at {stats['rows/sec']:.0f} rows/sec, "
+        f"peak RSS {stats['peak_rss_mb']:.0f} MB"
+    )
+    return stats
+
+
+def link_a_to_q_tags(row, tag_index_builder: tag_index.TagIndexBuilder):
+    post_type = row.attrib.get("PostTypeId", "")
+    if post_type == "1":
+        tag_index_builder.add_question(
+            int(row.attrib["Id"]), row.attrib.get("Tags", ""))
+    elif post_type == "2":
+        tag_index_builder.add_answer(
+            int(row.attrib["Id"]), int(row.attrib["ParentId"]))
+
+
+def _build_post_dict(row, tags: str) -> typing.Dict:
+    post_dict = {}
+    post_dict[row.attrib.get("Id", "")] = [
+        row.attrib.get(
+            # Tags are only persisted for questions. We need to manually insert them
+            x, (tags if x == "Tags" else "")
+        ) for x in models.POSTS_COLS
+    ]
+    return post_dict
 
 
 def get_row_data_json(
     row,
-    target_language: str,
-    posts_to_tags: typing.Dict,
-    output_path: str,
+    posts_to_tags: tag_index.TagIndex,
+    writers: typing.Dict[str, jsonl_writer.JsonlWriter],
+    post_filter: typing.Optional[post_filters.PostFilter] = None,
+):
+    post_id = row.attrib.get("Id", "")
+    if not post_id:
+        return
+    tag_set_id = posts_to_tags.lookup(int(post_id))
+    if tag_set_id < 0:
+        return
+    writer = writers.get(posts_to_tags.table.languages[tag_set_id])
+    if writer is not None and (post_filter is None or post_filter.accepts_row(row)):
+        writer.write(_build_post_dict(row, posts_to_tags.table.tags[tag_set_id]))
+
+
+def emit_row_single_pass(
+    row,
+    questions_to_tags: typing.Dict[int, int],
+    tag_sets: tag_index.TagSetTable,
+    writers: typing.Dict[str, jsonl_writer.JsonlWriter],
+    pending_file: typing.TextIO,
+    stats: typing.Dict,
+    post_filter: typing.Optional[post_filters.PostFilter] = None,
 ):
-    with open(output_path, "a") as outfile:
-        tags = posts_to_tags.get(row.attrib.get("Id", ""), "")
-        tokenized_tags = set(re.findall("<(.+?)>", tags))
+    """
+    Writes the row right away if its tags are known, otherwise parks it in
+    the pending store. Only answers can be parked: their tags live on the
+    parent question, which may show up later in the dump.
+    Rows rejected by post_filter are not written; parked answers are
+    replaced by the rejection reason, which is counted once it is known
+    whether the answer would have been written at all.
+    """
+    post_type = row.attrib.get("PostTypeId", "")
+    if post_type == "1":
+        tag_set_id = tag_sets.intern(row.attrib.get("Tags", ""))
+        questions_to_tags[int(row.attrib["Id"])] = tag_set_id
+    elif post_type == "2":
+        parent_id = int(row.attrib["ParentId"])
+        if parent_id not in questions_to_tags:
+            rejection_reason = (
+                post_filter.rejection_reason_of_row(row) if post_filter is not None else None)
+            # Keep the whole row, tags get patched in once the parent is known.
+            json.dump([
+                parent_id,
+                _build_post_dict(row, "") if rejection_reason is None else rejection_reason,
+            ], pending_file)
+            pending_file.write("\n")
+            stats["pending"] += 1
+            return
+        tag_set_id = questions_to_tags[parent_id]
+    else:
+        return
 
-        recognized_tags = tokenized_tags & models.LANGUAGES
-        if recognized_tags == {target_language}:
-            post_dict = {}
-            post_dict[row.attrib.get("Id", "")] = [
-                row.attrib.get(
-                    # Tags are only persisted for questions. We need to manually insert them
-                    x, (tags if x == "Tags" else "")
-                ) for x in models.POSTS_COLS
-            ]
+    writer = writers.get(tag_sets.languages[tag_set_id])
+    if writer is not None and (post_filter is None or post_filter.accepts_row(row)):
+        writer.write(_build_post_dict(row, tag_sets.tags[tag_set_id]))
+        stats["written"] += 1
 
 
-            json.dump(post_dict, outfile)
-            outfile.write("\n")
+def resolve_pending_answers(
+    questions_to_tags: typing.Dict[int, int],
+    tag_sets: tag_index.TagSetTable,
+    pending_file: typing.TextIO,
+    writers: typing.Dict[str, jsonl_writer.JsonlWriter],
+    stats: typing.Dict,
+    post_filter: typing.Optional[post_filters.PostFilter] = None,
+):
+    tags_index = models.POSTS_COLS.index("Tags")
+    pending_file.seek(0)
+    for line in pending_file:
+        parent_id, post_dict = json.loads(line)
+        tag_set_id = questions_to_tags.get(parent_id)
+        if tag_set_id is None or not tag_sets.tags[tag_set_id]:
+            stats["key error"] += 1
+            continue
+        stats["resolved"] += 1
+        writer = writers.get(tag_sets.languages[tag_set_id])
+        if writer is not None and isinstance(post_dict, str):
+            # rejected by the post filter when it was parked
+            post_filter.rejected[post_dict] += 1
+        elif writer is not None:
+            for values in post_dict.values():
+                values[tags_index] = tag_sets.tags[tag_set_id]
+            writer.write(post_dict)
+            stats["written"] += 1
 
 
-def parse_xml_source_and_generate_output(
-        target_language:str, xml_path: str, output_path: str
+def parse_xml_source_single_pass(
+        xml_path: str,
+        writers: typing.Dict[str, jsonl_writer.JsonlWriter],
+        pending_dir: str,
+        post_filter: typing.Optional[post_filters.PostFilter] = None,
 ) -> None:
+    """
+    Single scan over the XML source. Questions (and answers whose question
+    was already seen) are written immediately; the remaining answers are
+    spilled to a temporary file in pending_dir and resolved at the end.
+    """
+    # question Id -> interned tag set id
     questions_to_tags = {}
-    answers_to_questions = {}
-    posts_to_tags = {}
-
-    logging.info("Starting parsing...")
-    context = lxml.etree.iterparse(xml_path)
-    fast_iter(context, link_a_to_q_tags,
-              questions_to_tags, answers_to_questions)
-
-    logging.info("Posts_to_tags population (questions) started.")
-    stats_posts_to_tags_questions = collections.defaultdict(int)
-    for question, tags in questions_to_tags.items():
-        if question in posts_to_tags:
-            stats_posts_to_tags_questions["overwrite"] += 1
-        posts_to_tags[question] = tags
-        stats_posts_to_tags_questions["success"] = 1
-    logging.info(
-        "Posts_to_tags population (questions) finished. "
-        f"Stats: {stats_posts_to_tags_questions}"
-    )
+    tag_sets = tag_index.TagSetTable()
+    stats = collections.defaultdict(int)
+
+    with tempfile.TemporaryFile(
+        "w+", dir=pending_dir, prefix="pending_answers_", suffix=".jsonl",
+    ) as pending_file:
+        apply_to_rows(xml_path, emit_row_single_pass,
+                      questions_to_tags, tag_sets, writers, pending_file, stats,
+                      post_filter)
+        logging.info(
+            f"Single pass scan finished, resolving {stats['pending']} "
+            "pending answers."
+        )
+        resolve_pending_answers(
+            questions_to_tags, tag_sets, pending_file, writers, stats, post_filter)
+
+    logging.info(f"Single pass stats: {dict(stats)}")
+
+
+def parse_xml_source_two_pass(
+        xml_path: str,
+        writers: typing.Dict[str, jsonl_writer.JsonlWriter],
+        post_filter: typing.Optional[post_filters.PostFilter] = None,
+) -> None:
+    tag_index_builder = tag_index.TagIndexBuilder()
+    apply_to_rows(xml_path, link_a_to_q_tags, tag_index_builder)
+
+    posts_to_tags = tag_index_builder.build()
+    del tag_index_builder
+    apply_to_rows(xml_path, get_row_data_json, posts_to_tags, writers, post_filter)
+
+
+def split_into_row_ranges(
+        xml_path: str, n_shards: int
+) -> typing.List[typing.Tuple[int, int]]:
+    """
+    Splits the dump into at most n_shards [start, end) byte ranges. Every
+    boundary is moved forward to the beginning of the next line starting with
+    <row, so no row is cut in half (the dump stores one <row/> per line).
+    """
+    file_size = os.path.getsize(xml_path)
+    boundaries = [0]
+    with open(xml_path, "rb") as handle:
+        for i in range(1, n_shards):
+            handle.seek(max(file_size * i // n_shards, boundaries[-1]))
+            handle.readline()  # skip the (potentially partial) current line
+            while True:
+                position = handle.tell()
+                line = handle.readline()
+                if not line or line.lstrip().startswith(b"<row"):
+                    break
+            if position > boundaries[-1]:
+                boundaries.append(position)
+    boundaries.append(file_size)
+    return [
+        (start, end) for start, end in zip(boundaries, boundaries[1:])
+        if end > start
+    ]
+
+
+def iter_rows_with_offsets(
+    xml_path: str, start: int = 0, end: typing.Optional[int] = None
+):
+    """
+    Yields (offset after the row's line, <row> element) for the lines
+    starting within [start, end). Header/footer lines (<?xml ...?>, <posts>,
+    </posts>) are skipped. Compressed dumps are supported, but seeking into
+    them means decompressing everything before start.
+    """
+    with compressed_io.open_input(xml_path, "rb") as handle:
+        handle.seek(start)
+        position = start
+        while end is None or position < end:
+            line = handle.readline()
+            if not line:
+                break
+            position += len(line)
+            line = line.strip()
+            if not line.startswith(b"<row"):
+                continue
+            try:
+                yield position, lxml.etree.fromstring(line)
+            except lxml.etree.XMLSyntaxError as exc:
+                logger.error(f"Exception! {str(exc)}")
 
-    logging.info("Posts_to_tags population (answers) started")
-    stats_posts_to_tags_answers = collections.defaultdict(int)
-    for answer, question in answers_to_questions.items():
-        if questions_to_tags.get(question):
-            posts_to_tags[answer] = questions_to_tags[question]
-            stats_posts_to_tags_answers["success"] += 1
+
+def iter_rows_in_range(xml_path: str, start: int, end: int):
+    """
+    Yields the <row> elements of the lines starting within [start, end).
+    """
+    for _, row in iter_rows_with_offsets(xml_path, start, end):
+        yield row
+
+
+def _apply_to_rows_in_range(xml_path: str, start: int, end: int, func, *args):
+    for row in iter_rows_in_range(xml_path, start, end):
+        try:
+            func(row, *args)
+        except Exception as exc:
+            logger.error(f"Exception! {str(exc)}")
+
+
+def _link_tags_in_range(
+    shard: typing.Tuple[str, int, int]
+) -> tag_index.TagIndexBuilder:
+    xml_path, start, end = shard
+    tag_index_builder = tag_index.TagIndexBuilder()
+    _apply_to_rows_in_range(
+        xml_path, start, end, link_a_to_q_tags, tag_index_builder)
+    return tag_index_builder
+
+
+# Set by the parent right before forking the pass-two pool so that the workers
+# inherit the (large) tag map instead of receiving a pickled copy each.
+_SHARED_POSTS_TO_TAGS = None
+
+
+def _write_rows_in_range(
+    shard: typing.Tuple[
+        str, int, int, typing.List[str], str,
+        typing.Optional[post_filters.PostFilter],
+    ]
+) -> typing.Tuple[typing.Dict[str, str], typing.Dict[str, int]]:
+    xml_path, start, end, languages, shard_dir, post_filter = shard
+    if post_filter is not None:
+        # the copy may carry the counts the parent merged so far
+        post_filter.rejected = collections.defaultdict(int)
+    writers = {
+        language: jsonl_writer.JsonlWriter(
+            os.path.join(shard_dir, f"{start}_{i}.jsonl"), mode="w"
+        )
+        for i, language in enumerate(languages)
+    }
+    try:
+        _apply_to_rows_in_range(xml_path, start, end, get_row_data_json,
+                                _SHARED_POSTS_TO_TAGS, writers, post_filter)
+    finally:
+        for writer in writers.values():
+            writer.close()
+    # the filter is a copy in the worker, its counts are sent back
+    rejected = dict(post_filter.rejected) if post_filter is not None else {}
+    return {language: writer.output_path for language, writer in writers.items()}, rejected
+
+
+def parse_xml_source_parallel(
+        xml_path: str,
+        writers: typing.Dict[str, jsonl_writer.JsonlWriter],
+        workers: int,
+        n_shards: typing.Optional[int] = None,
+        post_filter: typing.Optional[post_filters.PostFilter] = None,
+) -> None:
+    """
+    Two-pass ingest on a process pool. The dump is split into row aligned
+    byte ranges; the tag maps are built per shard and merged, then every
+    shard writes its rows to a temporary file. The shard files are appended
+    to the final outputs in file (i.e. Id) order, so the result is the same
+    as the one of parse_xml_source_two_pass.
+    """
+    global _SHARED_POSTS_TO_TAGS
+
+    shards = split_into_row_ranges(xml_path, n_shards or workers * 4)
+    logging.info(f"Parsing {len(shards)} shards with {workers} workers.")
+    context = multiprocessing.get_context("fork")
+
+    tag_index_builder = tag_index.TagIndexBuilder()
+    with context.Pool(workers) as pool:
+        for shard_builder in pool.imap(
+            _link_tags_in_range,
+            [(xml_path, start, end) for start, end in shards],
+        ):
+            tag_index_builder.merge(shard_builder)
+
+    _SHARED_POSTS_TO_TAGS = tag_index_builder.build()
+    del tag_index_builder
+
+    shard_dir_root = os.path.dirname(
+        os.path.abspath(next(iter(writers.values())).output_path))
+    languages = sorted(writers)
+    try:
+        with (
+            tempfile.TemporaryDirectory(
+                dir=shard_dir_root, prefix="xml_shards_") as shard_dir,
+            context.Pool(workers) as pool,
+        ):
+            # imap keeps the shard order, outputs are merged as they arrive
+            for shard_outputs, rejected in pool.imap(
+                _write_rows_in_range,
+                [
+                    (xml_path, start, end, languages, shard_dir, post_filter)
+                    for start, end in shards
+                ],
+            ):
+                for reason, count in rejected.items():
+                    post_filter.rejected[reason] += count
+                for language, shard_path in shard_outputs.items():
+                    with open(shard_path) as handle:
+                        for line in handle:
+                            writers[language].write_serialized(line)
+                    os.remove(shard_path)
+    finally:
+        _SHARED_POSTS_TO_TAGS = None
+
+
+def _scan_with_checkpoints(
+    xml_path: str,
+    start: int,
+    func,
+    args: typing.Tuple,
+    checkpoint_every: int,
+    save_checkpoint: typing.Callable[[int], None],
+):
+    """
+    Applies func to the rows after byte start and calls save_checkpoint with
+    the input offset every checkpoint_every rows.
+    """
+    for n_rows, (offset, row) in enumerate(
+            iter_rows_with_offsets(xml_path, start), 1):
+        try:
+            func(row, *args)
+        except Exception as exc:
+            logger.error(f"Exception! {str(exc)}")
+        if n_rows % checkpoint_every == 0:
+            save_checkpoint(offset)
+
+
+def parse_xml_source_checkpointed(
+        xml_path: str,
+        writers: typing.Dict[str, jsonl_writer.JsonlWriter],
+        checkpoints: checkpoint.CheckpointDir,
+        resume: bool = False,
+        checkpoint_every: int = 1_000_000,
+        post_filter: typing.Optional[post_filters.PostFilter] = None,
+) -> None:
+    """
+    Two-pass ingest that can be resumed after a crash. The rows are read
+    line by line (one <row/> per line, as in the dumps) so that the input
+    byte offset is known. Every checkpoint_every rows the state is saved:
+      - pass one: input offset, tag arrays collected so far (appended to
+        sidecar files in the checkpoint directory),
+      - pass two: input offset, the outputs' paths/offsets and row counts
+        (and the rejection counts of post_filter).
+    On resume, both the sidecars and the outputs are truncated back to the
+    last saved state, so no row is duplicated or lost.
+    """
+    state = checkpoints.load("xml") if resume else None
+    if state is not None:
+        logging.info(
+            f"Resuming XML ingest: phase {state['phase']}, "
+            f"input offset {state['input_offset']}."
+        )
+
+    if state is None or state["phase"] == "link":
+        if state is None:
+            tag_index_builder = tag_index.TagIndexBuilder()
+            spill_counts, start = None, 0
         else:
-            stats_posts_to_tags_answers["key error"] += 1
+            spill_counts, start = state["tag_index"], state["input_offset"]
+            tag_index_builder = tag_index.restore_builder(
+                checkpoints.path, spill_counts)
+
+        def save_link_checkpoint(offset: int):
+            nonlocal spill_counts
+            spill_counts = tag_index.spill_builder(
+                tag_index_builder, checkpoints.path, spill_counts)
+            checkpoints.save("xml", {
+                "phase": "link",
+                "input_offset": offset,
+                "tag_index": spill_counts,
+            })
+
+        _scan_with_checkpoints(
+            xml_path, start, link_a_to_q_tags, (tag_index_builder,),
+            checkpoint_every, save_link_checkpoint,
+        )
+        posts_to_tags = tag_index_builder.build()
+        del tag_index_builder
+        tag_index.save_index(posts_to_tags, checkpoints.path)
+        state = None
+    else:
+        posts_to_tags = tag_index.load_index(checkpoints.path)
+
+    if state is None:
+        start = 0
+    else:
+        start = state["input_offset"]
+        for language, writer_state in state["outputs"].items():
+            writers[language].restore(writer_state)
+        if post_filter is not None:
+            post_filter.rejected.update(state.get("rejected", {}))
+
+    def save_emit_checkpoint(offset: int):
+        checkpoints.save("xml", {
+            "phase": "emit",
+            "input_offset": offset,
+            "outputs": {
+                language: writer.checkpoint_state()
+                for language, writer in writers.items()
+            },
+            "rejected": dict(post_filter.rejected) if post_filter is not None else {},
+        })
+
+    # the outputs' starting point must be on record before anything is written
+    save_emit_checkpoint(start)
+    _scan_with_checkpoints(
+        xml_path, start, get_row_data_json, (posts_to_tags, writers, post_filter),
+        checkpoint_every, save_emit_checkpoint,
+    )
+
+
+def language_output_path(output_path: str, language: str) -> str:
+    path, compression_ext = compressed_io.split_compression_ext(output_path)
+    root, ext = os.path.splitext(path)
+    return f"{root}_{language}{ext}{compression_ext}"
+
+
+def parse_xml_source_and_generate_output(
+        target_language: typing.Optional[str],
+        xml_path: str,
+        output_path: str,
+        single_pass: bool = False,
+        max_rows_per_file: typing.Optional[int] = None,
+        max_bytes_per_file: typing.Optional[int] = None,
+        workers: int = 1,
+        row_filter: typing.Optional[typing.Callable[[typing.Dict], bool]] = None,
+        checkpoints: typing.Optional[checkpoint.CheckpointDir] = None,
+        resume: bool = False,
+        checkpoint_every: int = 1_000_000,
+        post_filter: typing.Optional[post_filters.PostFilter] = None,
+) -> typing.Dict[str, typing.List[str]]:
+    """
+    Extracts the posts of target_language into output_path.
+    If target_language is None, every language in models.LANGUAGES is routed
+    to its own output (<root>_<language><ext>) within the same scan.
+
+    Returns the files written per language: [output_path] unless a per-file
+    row or byte limit is given, in which case the output is sharded.
+    With workers > 1, the dump is parsed on a process pool (two-pass only).
+    row_filter (e.g. incremental.PostManifest.observe) is applied to every
+    curated row right before it is written.
+    With checkpoints, the serial two-pass ingest saves its progress there
+    and, if resume is set, continues from the last saved state.
+    post_filter is checked on the attributes of the rows, the rejected ones
+    are never serialized (nor seen by row_filter).
+    """
+    if single_pass and workers > 1:
+        raise ValueError("Single pass ingest cannot run on multiple workers!")
+    if checkpoints is not None and (single_pass or workers > 1 or row_filter):
+        raise ValueError(
+            "Checkpoints are only supported by the serial two-pass ingest "
+            "without row filter!"
+        )
+    if resume and checkpoints is not None:
+        state = checkpoints.load("xml")
+        if state is not None and state["phase"] == "done":
+            logging.info("XML ingest already finished according to the checkpoint.")
+            if post_filter is not None:
+                post_filter.rejected.update(state.get("rejected", {}))
+            return state["output_paths"]
+    if workers > 1 and compressed_io.is_compressed(xml_path):
+        # byte range shards need random access to the raw file
+        logging.warning(
+            "Compressed XML input cannot be split into shards, parsing serially.")
+        workers = 1
+
+    if target_language is None:
+        writers = {
+            language: jsonl_writer.JsonlWriter(
+                language_output_path(output_path, language),
+                max_rows_per_file=max_rows_per_file,
+                max_bytes_per_file=max_bytes_per_file,
+                row_filter=row_filter,
+            )
+            for language in sorted(models.LANGUAGES)
+        }
+    else:
+        writers = {
+            target_language: jsonl_writer.JsonlWriter(
+                output_path,
+                max_rows_per_file=max_rows_per_file,
+                max_bytes_per_file=max_bytes_per_file,
+                row_filter=row_filter,
+            )
+        }
+
     logging.info(
-        "Posts_to_tags population (answers)finished. "
-        f"Stats: {stats_posts_to_tags_answers}"
+        f"Starting parsing (single_pass={single_pass}, workers={workers}, "
+        f"languages={sorted(writers)})..."
     )
+    if post_filter is not None and not post_filter.is_active:
+        post_filter = None
+    t0 = time.perf_counter()
+    try:
+        if single_pass:
+            parse_xml_source_single_pass(
+                xml_path, writers,
+                pending_dir=os.path.dirname(os.path.abspath(output_path)),
+                post_filter=post_filter,
+            )
+        elif workers > 1:
+            parse_xml_source_parallel(
+                xml_path, writers, workers, post_filter=post_filter)
+        elif checkpoints is not None:
+            parse_xml_source_checkpointed(
+                xml_path, writers, checkpoints, resume, checkpoint_every, post_filter)
+        else:
+            parse_xml_source_two_pass(xml_path, writers, post_filter)
+    finally:
+        for writer in writers.values():
+            writer.close()
+    elapsed = time.perf_counter() - t0
 
-    context = lxml.etree.iterparse(xml_path)
-    fast_iter(context, get_row_data_json, target_language, posts_to_tags, output_path)
+    logging.info(f"XML ingest took {elapsed:.1f} seconds.")
+    for language, writer in writers.items():
+        logging.info(
+            f"\t{language}: {writer.n_rows} rows ({writer.n_filtered} filtered) "
+            f"({writer.n_rows / elapsed if elapsed else 0.0:.0f} rows/sec) "
+            f"written to {len(writer.paths)} file(s)."
+        )
+    if post_filter is not None:
+        logging.info(f"Rows rejected by the post filter: {dict(post_filter.rejected)}")
+    output_paths = {language: writer.paths for language, writer in writers.items()}
+    if checkpoints is not None:
+        checkpoints.save("xml", {
+            "phase": "done",
+            "output_paths": output_paths,
+            "rejected": dict(post_filter.rejected) if post_filter is not None else {},
+        })
+    return output_paths